@@ -98,4 +98,93 @@ CACHES = {
 INTERNAL_IPS = ['127.0.0.1']
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# NEW: Ingestion tuning for news.utils.scraper.fetch_articles
+SCRAPER_WORKERS = 1  # 1 = serial; override per run with `manage.py fetch_articles --workers N`
+SCRAPER_STAGE_LIMITS = {
+    'feed': 4,       # concurrent RSS downloads
+    'extract': 6,    # concurrent article downloads/parses
+    'summarize': 2,  # concurrent Gemini calls
+    'tts': 2,        # concurrent gTTS calls
+    'db': 1,         # serialize database access (SQLite allows one writer)
+}
+SCRAPER_HOST_DELAY = 2.0  # seconds between two article downloads from the same host
+SCRAPER_ENTRIES_PER_FEED = 7
+SCRAPER_JOB_MAX_ATTEMPTS = 3    # attempts per pipeline job before it is marked failed
+SCRAPER_JOB_RETRY_DELAY = 30    # seconds before the first retry; doubles on every attempt
+SCRAPER_JOB_RETRY_WAIT = 120    # a run waits for retries due within this many seconds before exiting
+SCRAPER_JOB_LEASE = 600         # running jobs older than this are assumed orphaned and requeued
+
+# NEW: Gemini summarization (news.utils.summarizer)
+GEMINI_MODEL = 'gemini-1.5-flash-latest'
+GEMINI_CLIENT = 'news.utils.summarizer.GeminiClient'  # 'news.utils.fakes.FakeModelClient' works offline
+GEMINI_CLIENT_OPTIONS = {}  # keyword arguments for GEMINI_CLIENT, e.g. {'latency': 0.5, 'error_rate': 0.05} for the fake
+GEMINI_RATE_LIMIT = {
+    'requests_per_minute': 15,
+    'tokens_per_minute': 1_000_000,
+    'max_in_flight': 4,   # concurrent Gemini calls per process
+    'shared': False,      # True: also count quota in CACHES['default'] (cross-process with a shared cache)
+}
+GEMINI_MAX_RETRIES = 4
+GEMINI_BACKOFF_BASE = 2.0   # seconds; jittered and doubled on every quota error
+GEMINI_BACKOFF_CAP = 60.0
+GEMINI_WEB_MAX_WAIT = 5     # web views give up waiting for quota after this many seconds
+SUMMARY_INPUT_TOKEN_BUDGET = 3000  # longer articles are summarized in chunks and merged (map-reduce)
+SUMMARY_MAX_CHUNKS = 6             # chunks beyond this are dropped, bounding cost per article
+SUMMARY_BATCH_SIZE = 5                  # articles packed into one Gemini request in batch mode
+SUMMARY_BATCH_TOKEN_BUDGET = 6000       # input tokens per batch request
+SUMMARY_BATCH_MAX_ARTICLE_TOKENS = 1500 # longer articles are never batched
+SUMMARY_BATCH_BACKLOG = 10              # ingestion switches to batch mode at this many pending summaries
+SUMMARY_EXTRACTIVE_SENTENCES = 3        # sentences in the local provisional / fallback summary
+DEDUP_SIMILARITY_THRESHOLD = 0.6        # estimated shingle overlap (Jaccard) at which two articles are the same story
+DEDUP_WINDOW_DAYS = 14                  # near-duplicates are only looked for among articles this recent
+HTTP_TIMEOUT = (5, 15)                  # connect / read seconds for outbound article and feed downloads
+HTTP_RETRIES = 2                        # retries on connection errors and 429/5xx answers
+HTTP_POOL_MAXSIZE = 10                  # keep-alive connections kept per host
+SCRAPER_PARSE_WORKERS = 2               # processes that run newspaper3k parsing; 0 parses in the ingest thread
+SCRAPER_PARSE_MAX_TASKS_PER_CHILD = 200 # a parse process is replaced after this many pages, bounding its memory
+HTML_ARCHIVE_DIR = BASE_DIR / 'html_archive'  # compressed raw HTML of every article download, by content hash
+SCRAPER_WRITE_BATCH = 20                # finished articles written per transaction by the ingest pipeline
+
+# Text-to-speech (news.utils.tts): MP3s are stored under MEDIA_ROOT/news_audio by hash of text and voice
+TTS_LANG = 'en'
+TTS_SLOW = False
+TTS_WORKERS = 2                         # threads per process that call gTTS
+TTS_QUEUE_SIZE = 100                    # queued audio requests; web requests beyond this get a 503
+
+# On-demand summaries and audio are generated once per article however many readers ask (news.utils.singleflight).
+# The lock is a RunLock row per article or audio text, so it spans every process and node.
+SINGLEFLIGHT_TTL = 120                  # seconds a generation lock is held at most (frees keys of crashed workers)
+SINGLEFLIGHT_WAIT = 5                   # seconds a concurrent request waits for the first before answering "pending"
+
+# Pre-generation of summaries and audio readers are likely to ask for (news.utils.pregen, manage.py pregenerate)
+PREGEN_DAILY_LIMITS = {'summary': 100, 'audio': 100}  # attempts per day; the rest of the queue waits for tomorrow
+PREGEN_WEIGHTS = {'freshness': 1.0, 'preference': 1.0, 'likes': 0.5, 'engagement': 0.5}
+PREGEN_WINDOW_HOURS = 48                # only articles published this recently are queued
+PREGEN_HALF_LIFE_HOURS = 6              # freshness halves every this many hours
+PREGEN_MIN_PRIORITY = 0.1               # the long tail below this is never pre-generated
+PREGEN_MAX_ATTEMPTS = 2
+
+# Article search. 'index': the in-process BM25 index (news.utils.search_index, built by manage.py build_bm25_index
+# and caught up with Article.updated_at by ingestion and by searches); 'database': SQLite FTS5 / PostgreSQL tsvector
+# (news.utils.search, repaired by manage.py rebuild_fts_index), also the fallback.
+SEARCH_BACKEND = 'index'
+SEARCH_INDEX_PATH = BASE_DIR / 'search_index' / 'articles.idx'  # memory-mapped by every process
+SEARCH_INDEX_MAX_LOG = 5000             # changes journaled next to the index before it is rewritten
+SEARCH_INDEX_CATCH_UP = 500             # a search indexes up to this many changed articles, else uses the database
+SEARCH_INDEX_SYNC_MARGIN = 60           # seconds re-read before each catch-up, for transactions that committed late
+SEARCH_PREFIX_EXPANSIONS = 10           # words the last, possibly unfinished, query word expands to
+SEARCH_PREFIX_MAX_POSTINGS = 100000     # bounds the work of an unselective prefix (its first word is always kept)
+SEARCH_SNIPPET_CHARS = 200
+
+# Feed registry (news.models.Feed): each feed's poll interval adapts to how often it publishes
+FEED_MIN_INTERVAL = 300                 # seconds; busiest feeds are polled at most this often
+FEED_MAX_INTERVAL = 86400               # seconds; quiet feeds are still polled once a day
+FEED_TARGET_NEW_PER_POLL = 3            # new entries per poll the interval is tuned towards
+FEED_MAX_BACKOFF = 86400                # seconds; cap on the doubling wait after failed polls
+
+# Ingest scheduler (manage.py run_ingest_scheduler) and the deployment-wide ingest lock (news.utils.locks)
+INGEST_SCHEDULER_INTERVAL = 300         # seconds between scheduler ticks
+INGEST_SCHEDULER_JITTER = 0.2           # each wait is interval x random(1 - jitter, 1 + jitter)
+INGEST_LOCK_TTL = 120                   # seconds a node keeps the lock without renewing it (renewed every TTL/3)
@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.db.models import Count, Sum, Max, Avg, F, Q # Import Avg and Q
-from django.utils.html import format_html
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
 from django.contrib.admin import RelatedOnlyFieldListFilter 
-from .models import FAQ, Article, Category, UserPreference, ReadingHistory, SummaryFeedback, ArticleLike, Bookmark, Comment, UserArticleMetrics
+from news.utils.pregen import budget_left, spent_today
+from .models import FAQ, Article, Feed, IngestJob, IngestRun, PregenSpend, PregenTask, RunLock, SummaryCache, Category, UserPreference, ReadingHistory, SummaryFeedback, ArticleLike, Bookmark, Comment, UserArticleMetrics
 
 class ArticleAdmin(admin.ModelAdmin):
     list_display = ('title', 'source', 'published_at', 'author', 'approved_status', 'total_likes', 'total_comments')
@@ -16,6 +18,7 @@ class ArticleAdmin(admin.ModelAdmin):
 )
     search_fields = ('title', 'content', 'author')
     readonly_fields = ('published_at',)
+    raw_id_fields = ('canonical',)
     date_hierarchy = 'published_at'
     change_list_template = "admin/news/article/change_list.html"
 
@@ -37,14 +40,14 @@ class ArticleAdmin(admin.ModelAdmin):
     set_as_spotlight.short_description = "Set as Article of the Week"
 
     def make_approved(self, request, queryset):
-        updated = queryset.update(approved=True)
+        updated = queryset.update(approved=True, updated_at=timezone.now())
         self.message_user(
             request, f"{updated} articles marked as approved.", level='success'
         )
     make_approved.short_description = "Mark selected articles as approved"
 
     def make_pending(self, request, queryset):
-        updated = queryset.update(approved=False)
+        updated = queryset.update(approved=False, updated_at=timezone.now())
         self.message_user(
             request, f"{updated} articles marked as pending.", level='warning'
         )
@@ -164,6 +167,133 @@ class FAQAdmin(admin.ModelAdmin):
     list_display = ('keywords', 'answer', 'created_at')
     search_fields = ('keywords', 'answer')
 
+class FeedAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'is_active', 'poll_interval', 'next_poll_at', 'error_streak', 'last_success_at', 'last_failure_at')
+    list_filter = ('is_active', 'category')
+    search_fields = ('name', 'url')
+    readonly_fields = ('last_polled_at', 'last_success_at', 'last_failure_at', 'last_error', 'etag', 'last_modified', 'entries_hash')
+    actions = ['poll_now', 'activate', 'deactivate']
+
+    def poll_now(self, request, queryset):
+        updated = queryset.update(next_poll_at=None, error_streak=0)
+        self.message_user(request, f"{updated} feeds will be polled on the next run.", level='success')
+    poll_now.short_description = "Poll selected feeds on the next run"
+
+    def activate(self, request, queryset):
+        updated = queryset.update(is_active=True)
+        self.message_user(request, f"{updated} feeds activated.", level='success')
+    activate.short_description = "Activate selected feeds"
+
+    def deactivate(self, request, queryset):
+        updated = queryset.update(is_active=False)
+        self.message_user(request, f"{updated} feeds deactivated.", level='warning')
+    deactivate.short_description = "Deactivate selected feeds"
+
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'stage', 'state', 'url', 'attempts', 'worker', 'started_at', 'finished_at')
+    list_filter = ('stage', 'state')
+    search_fields = ('url', 'last_error')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'worker')
+    raw_id_fields = ('article',)
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(state=IngestJob.RUNNING).update(
+            state=IngestJob.PENDING, attempts=0, available_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f"{updated} jobs queued for retry.", level='success')
+    retry_jobs.short_description = "Retry selected jobs"
+
+class IngestRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'trigger', 'state', 'started_by', 'feeds_queued', 'articles_created', 'run_duration', 'slowest_stage', 'started_at')
+    list_filter = ('trigger', 'state')
+    readonly_fields = (
+        'trigger', 'state', 'started_by', 'worker', 'feeds_queued', 'articles_created', 'run_duration',
+        'stage_timings', 'counter_table', 'error', 'started_at', 'finished_at',
+    )
+    exclude = ('counters', 'timings')
+
+    def run_duration(self, obj):
+        return f"{obj.duration:.1f}s" if obj.duration is not None else "-"
+    run_duration.short_description = "Duration"
+
+    def slowest_stage(self, obj):
+        # Where the run spent its time: the stage with the largest total, excluding waits that overlap it.
+        stages = {name: t for name, t in (obj.timings or {}).items() if name not in ('db', 'retry_wait')}
+        if not stages:
+            return "-"
+        name, t = max(stages.items(), key=lambda item: item[1]['total_ms'])
+        return f"{name} ({t['total_ms'] / 1000:.1f}s)"
+    slowest_stage.short_description = "Slowest stage"
+
+    def stage_timings(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (name, t['count'], t['mean_ms'], t['p50_ms'], t['p95_ms'], t['max_ms'], t['total_ms'])
+                for name, t in (obj.timings or {}).items()
+            ),
+        )
+        return format_html(
+            '<table><tr><th>Stage</th><th>Count</th><th>Mean ms</th><th>p50 ms</th><th>p95 ms</th><th>Max ms</th><th>Total ms</th></tr>{}</table>',
+            rows,
+        )
+    stage_timings.short_description = "Stage timings"
+
+    def counter_table(self, obj):
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td></tr>', sorted((obj.counters or {}).items()))
+        return format_html('<table>{}</table>', rows)
+    counter_table.short_description = "Counters"
+
+class SummaryCacheAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'model_name', 'prompt_version', 'hits', 'created_at', 'last_used_at')
+    list_filter = ('model_name', 'prompt_version')
+    search_fields = ('content_hash', 'summary')
+    readonly_fields = ('created_at', 'last_used_at', 'hits')
+
+class RunLockAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'acquired_at', 'expires_at')
+    readonly_fields = ('name', 'acquired_at')
+    actions = ['force_release']
+
+    def force_release(self, request, queryset):
+        # For a node that died holding the lock when waiting out INGEST_LOCK_TTL is not an option.
+        updated = queryset.update(owner='', expires_at=timezone.now())
+        self.message_user(request, f"{updated} locks released.", level='warning')
+    force_release.short_description = "Release selected locks"
+
+class PregenTaskAdmin(admin.ModelAdmin):
+    list_display = ('article', 'kind', 'state', 'priority', 'score_breakdown', 'attempts', 'scored_at', 'finished_at')
+    list_filter = ('kind', 'state')
+    search_fields = ('article__title', 'last_error')
+    raw_id_fields = ('article',)
+    readonly_fields = ('score_breakdown', 'created_at', 'scored_at', 'started_at', 'finished_at')
+    exclude = ('score',)
+    actions = ['requeue']
+
+    def score_breakdown(self, obj):
+        return ', '.join(f"{name} {value:.2f}" for name, value in (obj.score or {}).items()) or "-"
+    score_breakdown.short_description = "Score"
+
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(state=PregenTask.RUNNING).update(state=PregenTask.PENDING, attempts=0, last_error='')
+        self.message_user(request, f"{updated} tasks queued again.", level='success')
+    requeue.short_description = "Queue selected tasks again"
+
+    def changelist_view(self, request, extra_context=None):
+        # Today's spend against PREGEN_DAILY_LIMITS, above the queue
+        spent, left = spent_today(), budget_left()
+        extra_context = extra_context or {}
+        extra_context['subtitle'] = 'Today: ' + ', '.join(
+            f"{kind} {spent[kind]} spent / {left[kind]} left" for kind in spent
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
+class PregenSpendAdmin(admin.ModelAdmin):
+    list_display = ('day', 'kind', 'attempts')
+    list_filter = ('kind',)
+    date_hierarchy = 'day'
+
 admin.site.register(Article, ArticleAdmin)
 admin.site.register(Category)
 admin.site.register(UserPreference)
@@ -172,4 +302,11 @@ admin.site.register(SummaryFeedback, SummaryFeedbackAdmin)
 admin.site.register(ArticleLike, ArticleLikeAdmin)
 admin.site.register(Bookmark, BookmarkAdmin)
 admin.site.register(Comment, CommentAdmin)
-admin.site.register(UserArticleMetrics, UserArticleMetricsAdmin)
\ No newline at end of file
+admin.site.register(UserArticleMetrics, UserArticleMetricsAdmin)
+admin.site.register(Feed, FeedAdmin)
+admin.site.register(IngestJob, IngestJobAdmin)
+admin.site.register(IngestRun, IngestRunAdmin)
+admin.site.register(SummaryCache, SummaryCacheAdmin)
+admin.site.register(RunLock, RunLockAdmin)
+admin.site.register(PregenTask, PregenTaskAdmin)
+admin.site.register(PregenSpend, PregenSpendAdmin)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    # A migration that rebuilt news_article on SQLite dropped the full-text index triggers.
+    from news.utils.search import restore_index
+    restore_index(using)
 
 
 class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
+
+    def ready(self):
+        post_migrate.connect(restore_search_index, sender=self)
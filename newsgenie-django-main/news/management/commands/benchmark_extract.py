@@ -0,0 +1,88 @@
+import os
+import time
+
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand
+
+from news.utils.extract import extract_article_text, reset_winners
+from news.utils.scraper import clean_html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks', 'html')
+
+
+def legacy_extract(html):
+    """The html.parser + repeated soup.select extractor that fetch_full_article_content_fallback used before lxml."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for tag in ['script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe']:
+        for element in soup.find_all(tag):
+            element.decompose()
+
+    content_blocks = []
+    selectors = [
+        '[data-component="text-block"]',
+        '.ssrcss-1q0x1qg-Paragraph',
+        '.story-body__inner p',
+        '.zn-body__paragraph',
+        '.el__leafmedia--sourced-paragraph',
+        '.StandardArticleBody_body p',
+        'article p',
+        '.article-content p',
+        '.entry-content p',
+        '.post-content p',
+        'p'
+    ]
+
+    for selector in selectors:
+        elements = soup.select(selector)
+        if len(elements) >= 3:
+            for el in elements:
+                text = el.get_text(strip=True)
+                if len(text) > 40:
+                    content_blocks.append(text)
+            if content_blocks:
+                break
+
+    full_content = '\n\n'.join(content_blocks[:12])
+    full_content = clean_html(full_content)
+    return full_content if len(full_content) > 200 else None
+
+
+def _best_ms(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark: the lxml fallback extractor against the old BeautifulSoup one on saved HTML pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per page; the best time is reported.')
+        parser.add_argument('--fixtures', default=FIXTURE_DIR, help='Directory of saved .html pages.')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        names = sorted(name for name in os.listdir(options['fixtures']) if name.endswith('.html'))
+        self.stdout.write(f"{'page':<20} {'soup ms':>9} {'lxml cold':>10} {'lxml warm':>10} {'speedup':>8}  same text")
+        for name in names:
+            with open(os.path.join(options['fixtures'], name), 'rb') as f:
+                html = f.read()
+            url = f"https://{os.path.splitext(name)[0]}.example.com/story"
+
+            legacy_ms, legacy_text = _best_ms(lambda: legacy_extract(html), repeat)
+
+            def cold():
+                reset_winners()
+                return extract_article_text(html, url)
+            cold_ms, text = _best_ms(cold, repeat)
+            warm_ms, _ = _best_ms(lambda: extract_article_text(html, url), repeat)
+
+            same = 'yes' if legacy_text == text else 'no'
+            self.stdout.write(
+                f"{name:<20} {legacy_ms:>9.2f} {cold_ms:>10.2f} {warm_ms:>10.2f} {legacy_ms / warm_ms:>7.1f}x  {same}"
+            )
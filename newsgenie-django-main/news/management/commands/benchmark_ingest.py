@@ -0,0 +1,338 @@
+import glob
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from xml.sax.saxutils import escape
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.test.utils import override_settings
+
+from news.models import Category, Feed
+from news.utils import dedup, http, parsing, summarizer, tts
+from news.utils.fakes import FakeGTTS
+from news.utils.pipeline import enqueue_feeds, run_pipeline
+from news.utils.report import IngestReport
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks')
+# Body text blocks: plain <p>s and the paragraph <div>s some publishers (CNN) use instead.
+PARAGRAPH_RE = re.compile(r'(<p\b[^>]*>|<div class="[^"]*paragraph[^"]*">)([^<]*)(</p>|</div>)', re.S)
+ITEM_RE = re.compile(r'<item>.*?</item>', re.S)
+TAG_RE = re.compile(r'<(title|description|pubDate)>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</\1>', re.S)
+
+
+class ReplaySite:
+    """
+    Local HTTP server replaying the recorded feed and article pages in
+    news/benchmarks. Feed /feeds/<n>.xml lists `entries` items linking to
+    /articles/<n>-<i>.html; each article is a recorded page with the words of
+    every paragraph shuffled by a per-article seed, so no two articles are
+    near-duplicates of each other.
+    """
+
+    def __init__(self, feeds, entries, latency=0.0, seed=0):
+        self.feeds = feeds
+        self.entries = entries
+        self.latency = latency
+        self.seed = seed
+        with open(os.path.join(BENCHMARK_DIR, 'rss', 'world.xml'), encoding='utf-8') as f:
+            self.feed_items = [dict(TAG_RE.findall(item)) for item in ITEM_RE.findall(f.read())]
+        self.pages = []
+        for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, 'html', '*.html'))):
+            with open(path, encoding='utf-8') as f:
+                self.pages.append(f.read())
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if site.latency:
+                    time.sleep(site.latency)
+                body, content_type = site.render(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def feed_urls(self):
+        return [f"{self.base_url}/feeds/{n}.xml" for n in range(self.feeds)]
+
+    def render(self, path):
+        feed = re.fullmatch(r'/feeds/(\d+)\.xml', path)
+        if feed:
+            return self.render_feed(int(feed.group(1))).encode('utf-8'), 'application/rss+xml'
+        article = re.fullmatch(r'/articles/(\d+)-(\d+)\.html', path)
+        if article:
+            return self.render_article(int(article.group(1)), int(article.group(2))).encode('utf-8'), 'text/html; charset=utf-8'
+        return None, None
+
+    def render_feed(self, n):
+        items = []
+        for i in range(self.entries):
+            recorded = self.feed_items[i % len(self.feed_items)]
+            items.append(
+                f"<item><title>{escape(recorded['title'])} ({n}-{i})</title>"
+                f"<description>{escape(recorded['description'])}</description>"
+                f"<link>{self.base_url}/articles/{n}-{i}.html</link>"
+                f"<pubDate>{recorded['pubDate']}</pubDate></item>"
+            )
+        return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Replay {n}</title>{"".join(items)}</channel></rss>'
+
+    def render_article(self, n, i):
+        rng = random.Random(f"{self.seed}-{n}-{i}")
+
+        def fill(match):
+            words = match.group(2).split()
+            if len(words) < 10:  # captions and bylines keep their recorded text
+                return match.group(0)
+            rng.shuffle(words)  # same words (and stopword density, which the parser scores) in a new order
+            return f"{match.group(1)}{' '.join(words)}{match.group(3)}"
+        return PARAGRAPH_RE.sub(fill, self.pages[(n + i) % len(self.pages)])
+
+
+def _rss_bytes(pid='self'):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _tree_rss():
+    """RSS of this process plus its children (the parse pool), from /proc."""
+    total = _rss_bytes()
+    for children in glob.glob('/proc/self/task/*/children'):
+        try:
+            with open(children) as f:
+                total += sum(_rss_bytes(pid) for pid in f.read().split())
+        except OSError:
+            pass
+    return total
+
+
+class PeakRss:
+    """Samples the RSS of the process tree in a background thread; `peak` is the highest value seen."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, _tree_rss())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak:  # no /proc: fall back to the lifetime peak of this process
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays recorded feeds and article pages from a local HTTP server through the whole ingestion '
+        'pipeline, with fake Gemini and gTTS backends, and reports articles/second, per-stage p50/p95 '
+        'latency and peak RSS for each worker count. Needs no network; runs against a scratch test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, action='append', help='Worker count to measure (repeatable). Default: 1, 4 and 8.')
+        parser.add_argument('--feeds', type=int, default=4)
+        parser.add_argument('--entries', type=int, default=20, help='Articles per feed.')
+        parser.add_argument('--http-latency', type=float, default=0.02, help='Seconds the local server waits per request.')
+        parser.add_argument('--model-latency', type=float, default=0.3, help='Seconds per fake Gemini call.')
+        parser.add_argument('--model-error-rate', type=float, default=0.0, help='Share of fake Gemini calls answered with a quota error.')
+        parser.add_argument('--tts-latency', type=float, default=0.2, help='Seconds per fake gTTS save.')
+        parser.add_argument('--tts-error-rate', type=float, default=0.0, help='Share of fake gTTS saves that fail.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--format', choices=['text', 'json'], default='text')
+        parser.add_argument('--output', help='Also write the JSON results to this file.')
+        parser.add_argument('--baseline', help='JSON results of an earlier run; fail if throughput dropped.')
+        parser.add_argument(
+            '--max-regression', type=float, default=0.2,
+            help='Allowed drop in articles/second against --baseline, as a fraction (default 0.2).'
+        )
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Run in the configured database instead of a scratch test database. It is flushed, so this '
+                 'is refused unless that database is itself a test database (as under manage.py test).'
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help='Do not ask before flushing the database given by --use-current-db.'
+        )
+
+    def handle(self, *args, **options):
+        worker_counts = options['workers'] or [1, 4, 8]
+        scratch = None
+        if options['use_current_db']:
+            self.check_current_db(options['interactive'])
+        else:
+            scratch = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        tmp = tempfile.mkdtemp(prefix='benchmark-ingest-')
+        try:
+            with ReplaySite(options['feeds'], options['entries'], options['http_latency'], options['seed']) as site:
+                results = [self.run_once(site, workers, options, tmp) for workers in worker_counts]
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if scratch is not None:
+                connection.creation.destroy_test_db(scratch, verbosity=0)
+
+        document = {
+            'config': {
+                name: options[name] for name in (
+                    'feeds', 'entries', 'http_latency', 'model_latency', 'model_error_rate',
+                    'tts_latency', 'tts_error_rate', 'seed',
+                )
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(document, f, indent=2)
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(document, indent=2))
+        else:
+            self.write_table(document)
+        if options['baseline']:
+            self.check_baseline(results, options['baseline'], options['max_regression'])
+
+    def check_current_db(self, interactive):
+        """Refuses to flush anything but a test database, and asks first unless --noinput was given."""
+        name = str(connection.settings_dict['NAME'])
+        test_name = connection.settings_dict.get('TEST', {}).get('NAME')
+        is_test_db = (
+            name.startswith(TEST_DATABASE_PREFIX) or (test_name is not None and name == str(test_name))
+            or name == ':memory:' or 'mode=memory' in name
+        )
+        if not is_test_db:
+            raise CommandError(
+                f"--use-current-db would flush '{name}', which is not a test database. "
+                "Run without it to benchmark in a scratch database."
+            )
+        if interactive:
+            confirm = input(f"This flushes every table of the test database '{name}' before each round.\n"
+                            "Type 'yes' to continue, or 'no' to cancel: ")
+            if confirm != 'yes':
+                raise CommandError("Benchmark cancelled.")
+
+    def run_once(self, site, workers, options, tmp):
+        call_command('flush', interactive=False, verbosity=0)
+        dedup.reset_index()
+        for n, url in enumerate(site.feed_urls()):
+            category, _ = Category.objects.get_or_create(name=f'Replay {n}')
+            Feed.objects.create(name=f'Replay {n}', url=url, category=category)
+
+        FakeGTTS.reset(latency=options['tts_latency'], error_rate=options['tts_error_rate'], seed=options['seed'])
+        settings_override = override_settings(
+            GEMINI_CLIENT='news.utils.fakes.FakeModelClient',
+            GEMINI_CLIENT_OPTIONS={
+                'latency': options['model_latency'], 'error_rate': options['model_error_rate'], 'seed': options['seed'],
+            },
+            # Quota is the fake's error rate; the limiter must not be what is measured.
+            GEMINI_RATE_LIMIT={'requests_per_minute': 1_000_000, 'tokens_per_minute': 10 ** 12, 'max_in_flight': 16},
+            GEMINI_BACKOFF_BASE=0.05, GEMINI_BACKOFF_CAP=0.5,
+            SCRAPER_ENTRIES_PER_FEED=options['entries'], SCRAPER_HOST_DELAY=0,
+            SCRAPER_JOB_RETRY_DELAY=0, SCRAPER_JOB_RETRY_WAIT=5,
+            # A fresh media dir per round: audio is content-addressed and would otherwise be reused.
+            HTML_ARCHIVE_DIR=os.path.join(tmp, 'archive'), MEDIA_ROOT=tempfile.mkdtemp(prefix='media-', dir=tmp),
+        )
+        with settings_override, patch.object(tts, 'gTTS', FakeGTTS):
+            summarizer.reset_summarizer()
+            tts.shutdown_tts_pool()
+            http.reset_session()
+            report = IngestReport()
+            with PeakRss() as rss:
+                started = time.perf_counter()
+                enqueue_feeds()
+                finished = run_pipeline(workers=workers, report=report)
+                elapsed = time.perf_counter() - started
+            summarizer.reset_summarizer()
+            parsing.shutdown_parse_pool()
+            tts.shutdown_tts_pool()
+
+        timings = report.as_dict()['timings']
+        return {
+            'workers': workers,
+            'articles': len(finished),
+            'seconds': round(elapsed, 3),
+            'articles_per_s': round(len(finished) / elapsed, 2) if elapsed else 0.0,
+            'peak_rss_mb': round(rss.peak / 2 ** 20, 1),
+            'stages': {
+                name: {'count': t['count'], 'p50_ms': t['p50_ms'], 'p95_ms': t['p95_ms']}
+                for name, t in timings.items()
+            },
+            'counters': report.as_dict()['counters'],
+        }
+
+    def write_table(self, document):
+        config = document['config']
+        self.stdout.write(
+            f"{config['feeds']} feeds x {config['entries']} articles, offline replay "
+            f"(model {config['model_latency']}s, {config['model_error_rate']:.0%} errors; "
+            f"tts {config['tts_latency']}s, {config['tts_error_rate']:.0%} errors)"
+        )
+        self.stdout.write(f"{'workers':>7} {'articles':>8} {'seconds':>8} {'art/s':>7} {'peak RSS MB':>12}")
+        for result in document['results']:
+            self.stdout.write(
+                f"{result['workers']:>7} {result['articles']:>8} {result['seconds']:>8} "
+                f"{result['articles_per_s']:>7} {result['peak_rss_mb']:>12}"
+            )
+        for result in document['results']:
+            self.stdout.write(f"\nworkers={result['workers']}: {'stage':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9}")
+            for name, stage in result['stages'].items():
+                self.stdout.write(f"{'':>11}{name:<16} {stage['count']:>6} {stage['p50_ms']:>9} {stage['p95_ms']:>9}")
+
+    def check_baseline(self, results, path, max_regression):
+        with open(path) as f:
+            baseline = {result['workers']: result for result in json.load(f)['results']}
+        regressions = []
+        for result in results:
+            before = baseline.get(result['workers'])
+            if before and result['articles_per_s'] < before['articles_per_s'] * (1 - max_regression):
+                regressions.append(
+                    f"workers={result['workers']}: {result['articles_per_s']} articles/s, baseline {before['articles_per_s']}"
+                )
+        if regressions:
+            raise CommandError("Throughput regressed by more than {:.0%}: {}".format(max_regression, '; '.join(regressions)))
+        self.stdout.write(self.style.SUCCESS(f"No regression beyond {max_regression:.0%} against {path}."))
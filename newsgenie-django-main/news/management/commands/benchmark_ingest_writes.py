@@ -0,0 +1,96 @@
+import random
+from collections import Counter
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from feedparser import FeedParserDict
+
+from news.models import Category, Feed
+from news.utils import dedup, pipeline, scraper
+from news.utils.report import IngestReport
+
+FEED_URL = 'https://feeds.benchmark.invalid/world'
+WORDS = (
+    "council river flood crews mayor residents water levels rain storm bridge road police homes shelter school "
+    "officials forecast weekend damage insurance farmers fields power outage volunteers hospital minister funding"
+).split()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _StatementCounter:
+    """execute_wrapper that counts statements by their first SQL keyword."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.counts[sql.lstrip().split(None, 1)[0].upper()] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def writes(self):
+        return self.counts['INSERT'] + self.counts['UPDATE'] + self.counts['DELETE']
+
+
+def _article_text(index):
+    rng = random.Random(index)  # distinct stories, so near-duplicate detection keeps them all
+    return ' '.join(rng.choice(WORDS) for _ in range(300))
+
+
+class Command(BaseCommand):
+    help = (
+        'Counts database writes per ingested article with one article per transaction '
+        'and with batched writes. Runs offline in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=100)
+        parser.add_argument('--batch', type=int, default=20, help='SCRAPER_WRITE_BATCH for the batched run.')
+
+    def handle(self, *args, **options):
+        count = options['articles']
+        self.stdout.write(f"{count} articles, feed -> extract -> summarize -> tts, all network faked")
+        self.stdout.write(f"{'mode':<22} {'writes':>7} {'per article':>12} {'queries':>8} {'per article':>12}")
+        for label, batch in (('one per transaction', 1), (f'batches of {options["batch"]}', options['batch'])):
+            counter = self.run_once(count, batch)
+            total = sum(counter.counts.values())
+            self.stdout.write(
+                f"{label:<22} {counter.writes:>7} {counter.writes / count:>12.2f} {total:>8} {total / count:>12.2f}"
+            )
+
+    def run_once(self, count, batch):
+        feed = FeedParserDict(status=200, entries=[
+            FeedParserDict(link=f'https://news.benchmark.invalid/story-{i}', title=f'Story {i}', author='Wire')
+            for i in range(count)
+        ])
+        counter = _StatementCounter()
+        dedup.reset_index()
+        patches = [
+            override_settings(SCRAPER_ENTRIES_PER_FEED=count, SCRAPER_HOST_DELAY=0, SCRAPER_WRITE_BATCH=batch,
+                              SUMMARY_BATCH_BACKLOG=count + 1),
+            patch('news.utils.feeds.download_feed', return_value=feed),
+            patch.object(scraper, 'fetch_article', side_effect=lambda url, **kw: (_article_text(int(url.rsplit('-', 1)[1])), None)),
+            patch.object(scraper, 'get_summary_from_gemini', return_value='A summary.'),
+            patch.object(scraper, 'generate_audio', return_value=None),
+        ]
+        for p in patches:
+            p.start() if hasattr(p, 'start') else p.enable()
+        try:
+            with transaction.atomic():
+                category, _ = Category.objects.get_or_create(name='World')
+                pipeline.enqueue_feeds(feeds=[Feed.objects.create(name='World', url=FEED_URL, category=category)])
+                with connection.execute_wrapper(counter):
+                    pipeline.run_pipeline(workers=1, report=IngestReport())
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            for p in reversed(patches):
+                p.stop() if hasattr(p, 'stop') else p.disable()
+            dedup.reset_index()
+        return counter
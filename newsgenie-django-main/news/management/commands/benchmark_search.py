@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from news.utils.search_index import SearchIndex, write_index
+
+
+def synthetic_index(path, docs, terms_per_doc, vocab_size, seed=7):
+    """Writes an index of `docs` documents whose words follow a Zipf distribution, like news text."""
+    rng = np.random.default_rng(seed)
+    vocab = [f"term{i:07d}" for i in range(vocab_size)]  # zero-padded, so sorted order is rank order
+    ranks = np.minimum(rng.zipf(1.1, size=docs * terms_per_doc), vocab_size) - 1
+    docnums = np.repeat(np.arange(docs, dtype=np.int64), terms_per_doc)
+    pairs, tfs = np.unique(ranks.astype(np.int64) * docs + docnums, return_counts=True)
+    term_ids, docnums = pairs // docs, pairs % docs
+    lengths = np.bincount(docnums, weights=tfs, minlength=docs)
+    write_index(path, vocab, term_ids, docnums, tfs, np.arange(1, docs + 1), lengths)
+    return vocab
+
+
+def _timings(index, query, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total, _ = index.search(query, limit=20)
+        times.append((time.perf_counter() - started) * 1000)
+    return total, np.percentile(times, 50), np.percentile(times, 95)
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark: BM25 query latency of the in-process search index on a synthetic corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=1_000_000)
+        parser.add_argument('--terms-per-doc', type=int, default=40, help='Words drawn per document (before de-duplication).')
+        parser.add_argument('--vocab', type=int, default=200_000)
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query; p50 and p95 are reported.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.idx')
+            started = time.perf_counter()
+            vocab = synthetic_index(path, options['docs'], options['terms_per_doc'], options['vocab'])
+            build_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            index = SearchIndex(path)
+            index.refresh()
+            load_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f"{len(index)} documents, {len(vocab)} terms, {os.path.getsize(path) / 2 ** 20:.1f} MiB; "
+                f"built in {build_s:.1f}s, mapped in {load_ms:.1f}ms"
+            )
+
+            queries = [
+                ('frequent term (rank 20)', vocab[20]),
+                ('mid term (rank 2,000)', vocab[2_000]),
+                ('rare term (rank 20,000)', vocab[20_000]),
+                ('two frequent terms', f"{vocab[20]} {vocab[50]}"),
+                ('frequent + rare', f"{vocab[20]} {vocab[20_000]}"),
+                ('prefix, frequent (term00005*)', 'term00005'),
+                ('prefix, unselective (term000*)', 'term000'),
+                ('prefix (term0012*)', 'term0012'),
+            ]
+            self.stdout.write(f"{'query':<32} {'matches':>9} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, query in queries:
+                total, p50, p95 = _timings(index, query, options['repeat'])
+                self.stdout.write(f"{label:<32} {total:>9} {p50:>8.2f} {p95:>8.2f}")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.utils.search_index import get_search_index, sync_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds or updates the in-process BM25 search index file (SEARCH_INDEX_PATH): adds approved articles it is '
+        'missing, re-indexes edited ones and drops unpublished ones. The database full-text index is rebuilt by rebuild_fts_index instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Re-index every approved article from scratch.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        added, updated, removed = sync_index(rebuild=options['rebuild'])
+        index = get_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {added} articles, re-indexed {updated}, removed {removed}; the index holds {len(index)} articles "
+            f"({time.perf_counter() - started:.1f}s, {index.path})."
+        ))
@@ -1,5 +1,12 @@
+import json
+
 from django.core.management.base import BaseCommand
-from news.utils.scraper import fetch_articles # This is the most important import
+from news.models import IngestRun
+from news.utils.pipeline import STAGES, enqueue_feeds, queue_progress, worker_id # This is the most important import
+from news.utils.runs import begin_run, work_run
+from news.utils.locks import INGEST_LOCK, Lease, LockHeld
+from news.utils.summary_cache import cache_stats
+from news.utils.http import http_stats
 import logging
 
 # This sets up logging so you can see messages in your terminal
@@ -8,19 +15,110 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Fetches news articles, generates summaries and audio, and saves them to the database.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Size of the ingestion thread pool. 1 runs serially; defaults to settings.SCRAPER_WORKERS.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Ignore stored ETag/Last-Modified state and process every feed.'
+        )
+        parser.add_argument(
+            '--enqueue-only', action='store_true',
+            help='Only queue feed jobs; leave the work to another worker.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Do not queue new feed jobs; only finish the jobs already in the queue.'
+        )
+        parser.add_argument(
+            '--stage', action='append', choices=STAGES,
+            help='Only work jobs of this stage (repeatable). Defaults to every stage.'
+        )
+        parser.add_argument(
+            '--report', choices=['text', 'json'], default='text',
+            help='json prints only the run record (counters and per-stage timings) as JSON on stdout.'
+        )
+
     def handle(self, *args, **options):
         """This is the main function that runs when you call the command."""
-        
-        self.stdout.write(self.style.SUCCESS("Starting the news fetching process..."))
-        
+        as_json = options['report'] == 'json'
+        if not as_json:
+            self.stdout.write(self.style.SUCCESS("Starting the news fetching process..."))
+
         try:
-            # Here, we call the main function from your scraper.py file
-            new_articles = fetch_articles()
-            
-            success_message = f"Successfully fetched and created {len(new_articles)} new articles."
+            if options['enqueue_only']:
+                # NEW: one ingestion run per deployment; the scheduler and the scraper view take the same lock
+                with Lease(INGEST_LOCK, worker_id()):
+                    queued = enqueue_feeds(force=options['force'])
+                if as_json:
+                    self.stdout.write(json.dumps({'feeds_queued': queued}))
+                else:
+                    self.stdout.write(f"Queued {queued} feed jobs.")
+                    self.write_progress()
+                return
+
+            # --resume only drains jobs already queued, and job claims are atomic, so it runs without the lock.
+            ingest_run, lease = begin_run(IngestRun.COMMAND, lock=not options['resume'])
+            work_run(
+                ingest_run, lease, workers=options['workers'], force=options['force'],
+                stages=options['stage'], enqueue=not options['resume'],
+            )
+
+            if as_json:
+                self.stdout.write(json.dumps(self.run_record(ingest_run), indent=2))
+                return
+            if not options['resume']:
+                self.stdout.write(f"Queued {ingest_run.feeds_queued} feed jobs.")
+            success_message = f"Successfully fetched and created {ingest_run.articles_created} new articles."
             self.stdout.write(self.style.SUCCESS(success_message))
-            
+            self.stdout.write(f"Run report: {', '.join(f'{k}={v}' for k, v in sorted(ingest_run.counters.items()))}")
+            self.write_timings(ingest_run.timings)
+            stats = cache_stats()
+            self.stdout.write(f"Summary cache: hits={stats['hits']}, misses={stats['misses']}")
+            self.write_http_stats()
+            self.write_progress()
+
+        except LockHeld as e:
+            self.stderr.write(self.style.WARNING(f"Another ingestion run is in progress ({e}). Try again later."))
         except Exception as e:
             # If something goes wrong, this will print a helpful error message
             logger.error(f"The script failed unexpectedly: {e}")
-            self.stderr.write(self.style.ERROR("The script failed. Check the logs for more details."))
\ No newline at end of file
+            self.stderr.write(self.style.ERROR("The script failed. Check the logs for more details."))
+
+    def run_record(self, ingest_run):
+        return {
+            'run': ingest_run.pk,
+            'state': ingest_run.state,
+            'started_at': ingest_run.started_at.isoformat(),
+            'finished_at': ingest_run.finished_at.isoformat() if ingest_run.finished_at else None,
+            'duration_s': ingest_run.duration,
+            'feeds_queued': ingest_run.feeds_queued,
+            'articles_created': ingest_run.articles_created,
+            'counters': ingest_run.counters,
+            'timings': ingest_run.timings,
+            'queue': queue_progress(),
+        }
+
+    def write_timings(self, timings):
+        self.stdout.write("Stage timings (ms):")
+        self.stdout.write(f"  {'stage':<16} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9} {'total':>11}")
+        for stage, t in timings.items():
+            self.stdout.write(
+                f"  {stage:<16} {t['count']:>6} {t['mean_ms']:>9} {t['p50_ms']:>9} {t['p95_ms']:>9} {t['max_ms']:>9} {t['total_ms']:>11}"
+            )
+
+    def write_progress(self):
+        self.stdout.write("Job queue:")
+        for stage, states in queue_progress().items():
+            counts = ', '.join(f"{state}={count}" for state, count in states.items())
+            self.stdout.write(f"  {stage:<10} {counts}")
+
+    def write_http_stats(self):
+        self.stdout.write("HTTP hosts:")
+        for host, stats in http_stats().items():
+            self.stdout.write(
+                f"  {host:<30} requests={stats['requests']} bytes={stats['bytes']} retries={stats['retries']} reused={stats['reused_connections']} "
+                f"new={stats['new_connections']} errors={stats['errors']} avg={stats['avg_ms']}ms max={stats['max_ms']}ms"
+            )
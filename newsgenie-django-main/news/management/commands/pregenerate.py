@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from news.models import PregenTask
+from news.utils.pregen import budget_left, refresh_queue, run_pregeneration
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates summaries and audio for the recent articles readers are most likely to open, '
+        'highest priority first, within the daily PREGEN_DAILY_LIMITS. Run it from cron or with '
+        '`run_ingest_scheduler --pregenerate`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max', type=int, default=None, help='Stop after this many tasks.')
+        parser.add_argument('--show', type=int, nargs='?', const=20, default=None, metavar='N',
+                            help='Only refresh the queue and print its top N tasks (default 20).')
+
+    def handle(self, *args, **options):
+        if options['show'] is not None:
+            pending = refresh_queue()
+            self.stdout.write(f"{pending} tasks pending; budget left today: {budget_left()}")
+            tasks = PregenTask.objects.filter(state=PregenTask.PENDING).select_related('article')[:options['show']]
+            for task in tasks:
+                components = ', '.join(f"{name}={value}" for name, value in task.score.items())
+                self.stdout.write(f"{task.priority:>7.3f}  {task.kind:<8} {task.article.title[:60]}  ({components})")
+            return
+
+        result = run_pregeneration(max_tasks=options['max'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Pre-generated {result['done']} outputs ({result['failed']} failed attempts); "
+            f"{result['pending']} tasks pending, budget left today: {result['budget_left']}."
+        ))
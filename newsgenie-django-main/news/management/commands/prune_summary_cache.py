@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from news.utils import summary_cache
+from news.utils.summarizer import SUMMARY_PROMPT_VERSION, model_name
+
+
+class Command(BaseCommand):
+    help = 'Deletes cached summaries made with an old prompt version or model (and optionally unused ones).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=None, metavar='DAYS',
+            help='Also delete entries that have not been used for this many days.'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many entries would be deleted.')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['older_than']) if options['older_than'] else None
+        count = summary_cache.prune(SUMMARY_PROMPT_VERSION, model_name(), older_than=older_than, dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {count} cached summaries (current prompt {SUMMARY_PROMPT_VERSION}, model {model_name()})."
+        ))
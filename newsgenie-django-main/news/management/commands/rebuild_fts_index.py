@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from news.utils import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Recreates the database full-text index of articles (SQLite FTS5, PostgreSQL tsvector) and refills it. '
+        'Triggers dropped by a migration are restored after migrate on their own; this also repairs an index '
+        'that went out of sync otherwise. The in-process BM25 index is built by build_bm25_index.'
+    )
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            search.uninstall_index(schema_editor)
+            search.install_index(schema_editor)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the article full-text index ({connection.vendor})."))
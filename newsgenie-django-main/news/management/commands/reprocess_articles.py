@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from news.models import Article, RawPage
+from news.utils import archive, dedup, parsing
+from news.utils.extractive import extractive_summary
+from news.utils.generation import has_final_summary
+from news.utils.summarizer import summarize_batch
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('extract', 'summarize', 'reading-time')
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-runs extraction, summarization or reading-time computation for stored articles from the '
+        'raw-HTML archive, without network access: publisher pages are never refetched, and summarize '
+        'writes provisional extractive summaries for articles without a final one unless --use-gemini.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stage', action='append', choices=STAGES, help='What to recompute (repeatable).')
+        parser.add_argument('--article', action='append', type=int, help='Only this article id (repeatable).')
+        parser.add_argument('--source', help='Only articles from this source/category name.')
+        parser.add_argument('--since-days', type=int, help='Only articles published in the last N days.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Articles loaded and saved per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without saving.')
+        parser.add_argument(
+            '--use-gemini', action='store_true',
+            help='summarize: call the model (through the summary cache) for final summaries of every article.',
+        )
+
+    def handle(self, *args, **options):
+        stages = options['stage']
+        if not stages:
+            raise CommandError(f"Choose at least one --stage ({', '.join(STAGES)}).")
+
+        articles = Article.objects.all()
+        if options['article']:
+            articles = articles.filter(pk__in=options['article'])
+        if options['source']:
+            articles = articles.filter(source__iexact=options['source'])
+        if options['since_days'] is not None:
+            articles = articles.filter(published_at__gte=timezone.now() - timedelta(days=options['since_days']))
+        ids = list(articles.order_by('pk').values_list('pk', flat=True))
+
+        totals = {stage: 0 for stage in stages}
+        missing = 0
+        size = max(options['batch_size'], 1)
+        for start in range(0, len(ids), size):
+            batch = list(Article.objects.filter(pk__in=ids[start:start + size]).order_by('pk'))
+            changed = set()
+            if 'extract' in stages:
+                updated, not_archived = self.reextract(batch)
+                totals['extract'] += len(updated)
+                missing += not_archived
+                changed.update(updated)
+            if 'summarize' in stages:
+                updated = self.resummarize(batch) if options['use_gemini'] else self.summarize_offline(batch)
+                totals['summarize'] += len(updated)
+                changed.update(updated)
+            if 'reading-time' in stages:
+                updated = self.recompute_reading_time(batch)
+                totals['reading-time'] += len(updated)
+                changed.update(updated)
+            if changed and not options['dry_run']:
+                now = timezone.now()
+                for article in changed:
+                    article.updated_at = now  # bulk_update skips auto_now
+                Article.objects.bulk_update(
+                    changed,
+                    ['content', 'content_signature', 'summary', 'summary_provisional', 'audio_file', 'reading_time', 'updated_at'],
+                    batch_size=size,
+                )
+
+        verb = "Would update" if options['dry_run'] else "Updated"
+        for stage, count in totals.items():
+            self.stdout.write(f"{verb} {count}/{len(ids)} articles ({stage}).")
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} articles have no archived HTML and were not re-extracted."))
+
+    def reextract(self, batch):
+        pages = {}
+        for page in RawPage.objects.filter(article__in=batch).order_by('article_id', '-fetched_at'):
+            pages.setdefault(page.article_id, page)  # newest download per article
+
+        loaded = []
+        for article in batch:
+            page = pages.get(article.pk)
+            if page is None:
+                continue
+            try:
+                loaded.append((article, (archive.load_html(page.content_hash), article.url, page.encoding or None)))
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Archived HTML for article {article.pk} unreadable: {e}")
+                pages.pop(article.pk)
+
+        updated = []
+        texts = parsing.parse_many(args for _, args in loaded)
+        for (article, _), text in zip(loaded, texts):
+            if len(text) >= 200 and text != article.content:
+                article.content = text
+                article.content_signature = dedup.signature(text)
+                article.reading_time = Article.compute_reading_time(text)
+                updated.append(article)
+        return updated, len(batch) - len(pages)
+
+    def resummarize(self, batch):
+        summaries = summarize_batch([article.content for article in batch])
+        updated = []
+        for article, summary in zip(batch, summaries):
+            if summary is not None and (summary != article.summary or article.summary_provisional):
+                if summary != article.summary:
+                    article.audio_file = None  # it narrates the old summary; voiced again on request or by pre-generation
+                article.summary, article.summary_provisional = summary, False
+                updated.append(article)
+        return updated
+
+    def summarize_offline(self, batch):
+        updated = []
+        for article in batch:
+            if has_final_summary(article):
+                continue  # the model's summary beats an extractive one
+            summary = extractive_summary(article.content)
+            if summary and summary != article.summary:
+                article.audio_file = None
+                article.summary, article.summary_provisional = summary, True  # pre-generation upgrades it later
+                updated.append(article)
+        return updated
+
+    def recompute_reading_time(self, batch):
+        updated = []
+        for article in batch:
+            reading_time = Article.compute_reading_time(article.content)
+            if reading_time != article.reading_time:
+                article.reading_time = reading_time
+                updated.append(article)
+        return updated
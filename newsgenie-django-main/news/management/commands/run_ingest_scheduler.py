@@ -0,0 +1,112 @@
+import random
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from news.models import IngestRun
+from news.utils.locks import LockHeld
+from news.utils.pipeline import worker_id
+from news.utils.pregen import run_pregeneration
+from news.utils.runs import begin_run, work_run
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs ingestion on a jittered schedule until stopped. Every tick takes the deployment-wide ingest '
+        'lock, queues the feeds that are due and works the job queue. SIGTERM or Ctrl-C finishes the jobs '
+        'in progress and hands the rest back to the queue; a second signal stops immediately.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between ticks; defaults to settings.INGEST_SCHEDULER_INTERVAL.'
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=None,
+            help='Random spread of each wait as a fraction of the interval; defaults to settings.INGEST_SCHEDULER_JITTER.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Size of the ingestion thread pool; defaults to settings.SCRAPER_WORKERS.'
+        )
+        parser.add_argument('--once', action='store_true', help='Run a single tick and exit.')
+        parser.add_argument(
+            '--pregenerate', action='store_true',
+            help='After each run, pre-generate summaries and audio for the likeliest reads (see manage.py pregenerate).'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'INGEST_SCHEDULER_INTERVAL', 300)
+        jitter = options['jitter'] if options['jitter'] is not None else getattr(settings, 'INGEST_SCHEDULER_JITTER', 0.2)
+        self.shutdown = threading.Event()  # stop the scheduler
+        self.halt = threading.Event()      # stop the current tick's run
+        self.owner = worker_id()
+        restore = self.install_signal_handlers()
+
+        self.stdout.write(self.style.SUCCESS(f"Ingest scheduler {self.owner} started (every {interval:g}s ±{jitter:.0%})."))
+        try:
+            if not options['once']:
+                # Nodes started together would otherwise keep ticking in step and contend for the lock.
+                self.shutdown.wait(random.uniform(0, interval * jitter))
+            while not self.shutdown.is_set():
+                self.tick(options['workers'])
+                if options['pregenerate'] and not self.shutdown.is_set():
+                    self.pregenerate()
+                if options['once']:
+                    break
+                self.shutdown.wait(max(interval * random.uniform(1 - jitter, 1 + jitter), 1))
+        finally:
+            restore()
+            connections.close_all()
+        self.stdout.write("Ingest scheduler stopped.")
+
+    def tick(self, workers):
+        self.halt.clear()
+        try:
+            ingest_run, lease = begin_run(IngestRun.SCHEDULER, on_lost=self.halt.set)
+            work_run(ingest_run, lease, workers=workers, stop=self.halt)
+            self.stdout.write(
+                f"Run {ingest_run.pk}: queued {ingest_run.feeds_queued} feeds, "
+                f"completed {ingest_run.articles_created} articles."
+            )
+        except LockHeld as e:
+            self.stdout.write(f"Skipping this tick: {e}.")
+        except Exception as e:
+            # One bad run must not take the scheduler down; the queue keeps its state for the next tick.
+            logger.error(f"Scheduled ingestion run failed: {e}")
+
+    def pregenerate(self):
+        self.halt.clear()
+        try:
+            result = run_pregeneration(stop=self.halt)
+            self.stdout.write(f"Pre-generated {result['done']} outputs, {result['pending']} tasks pending.")
+        except Exception as e:
+            logger.error(f"Pre-generation failed: {e}")
+
+    def install_signal_handlers(self):
+        """Returns a function that puts the previous handlers back."""
+        if threading.current_thread() is not threading.main_thread():
+            return lambda: None  # signal handlers can only be installed from the main thread
+        previous = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+
+        def request_stop(signum, frame):
+            if self.shutdown.is_set():
+                raise KeyboardInterrupt  # second signal: stop now, run_pipeline still releases our jobs
+            self.stdout.write("Stopping after the jobs in progress (signal again to stop now)...")
+            self.shutdown.set()
+            self.halt.set()
+
+        for sig in previous:
+            signal.signal(sig, request_stop)
+
+        def restore():
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        return restore
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0016_commentreaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(unique=True)),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('last_modified', models.CharField(blank=True, default='', help_text='Last-Modified header from the previous poll', max_length=100)),
+                ('last_polled_at', models.DateTimeField(blank=True, null=True)),
+                ('entries_hash', models.CharField(blank=True, default='', help_text='SHA-256 of the entry ids seen on the previous poll', max_length=64)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0017_feedstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('feed', 'Feed download'), ('extract', 'Article extraction'), ('summarize', 'Summary'), ('tts', 'Audio')], max_length=20)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('url', models.URLField(db_index=True, help_text='Feed URL for feed jobs, article URL otherwise', max_length=500)),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Feed entry metadata carried between stages')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('worker', models.CharField(blank=True, default='', help_text='host:pid of the worker that last claimed the job', max_length=100)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not claimed before this time (retry backoff)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('article', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ingest_jobs', to='news.article')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['stage', 'state', 'available_at'], name='news_ingest_stage_bbe9a6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0018_ingestjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('prompt_version', models.CharField(max_length=32)),
+                ('model_name', models.CharField(max_length=100)),
+                ('summary', models.TextField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Summary cache entry',
+                'verbose_name_plural': 'Summary cache entries',
+                'unique_together': {('content_hash', 'prompt_version', 'model_name')},
+            },
+        ),
+    ]
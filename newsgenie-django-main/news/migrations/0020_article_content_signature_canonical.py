@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:33
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_signatures(apps, schema_editor):
+    # Recent articles become canonical entries of the near-duplicate index; older ones are never looked up.
+    from news.utils.dedup import signature
+    Article = apps.get_model('news', 'Article')
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'DEDUP_WINDOW_DAYS', 14))
+    for article in Article.objects.filter(published_at__gte=cutoff).only('pk', 'content').iterator():
+        Article.objects.filter(pk=article.pk).update(content_signature=signature(article.content))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0019_summarycache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='canonical',
+            field=models.ForeignKey(blank=True, help_text='The article this one is a near-duplicate of', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='news.article'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='content_signature',
+            field=models.BinaryField(blank=True, help_text='MinHash signature of the content', null=True),
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0020_article_content_signature_canonical'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500)),
+                ('content_hash', models.CharField(db_index=True, help_text='sha256 of the raw HTML bytes', max_length=64)),
+                ('encoding', models.CharField(blank=True, max_length=50)),
+                ('size', models.PositiveIntegerField(default=0, help_text='Raw HTML bytes')),
+                ('compressed_size', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('article', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='raw_pages', to='news.article')),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+                'indexes': [models.Index(fields=['url', 'fetched_at'], name='news_rawpag_url_e81744_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The feeds and categories that used to be hard-coded in news/utils/scraper.py.
+INITIAL_FEEDS = [
+    ("Technology", "https://feeds.bbci.co.uk/news/technology/rss.xml"),
+    ("World", "https://feeds.bbci.co.uk/news/world/rss.xml"),
+    ("Business", "https://feeds.bbci.co.uk/news/business/rss.xml"),
+    ("Science", "https://feeds.bbci.co.uk/news/science_and_environment/rss.xml"),
+    ("Health", "https://feeds.bbci.co.uk/news/health/rss.xml"),
+    ("Sports", "http://feeds.bbci.co.uk/sport/rss.xml"),
+    ("Entertainment", "https://feeds.bbci.co.uk/news/entertainment/rss.xml"),
+    ("Politics", "https://feeds.bbci.co.uk/news/politics/rss.xml"),
+    ("Lifestyle", "https://feeds.bbci.co.uk/news/lifestyle/rss.xml"),
+    ("Environment", "https://feeds.bbci.co.uk/news/environment/rss.xml"),
+    ("Education", "https://feeds.bbci.co.uk/news/education/rss.xml"),
+    ("Gaming", "https://feeds.bbci.co.uk/news/gaming/rss.xml"),
+]
+
+
+def seed_feeds(apps, schema_editor):
+    Category = apps.get_model('news', 'Category')
+    Feed = apps.get_model('news', 'Feed')
+    for name, url in INITIAL_FEEDS:
+        category = Category.objects.filter(name=name).first() or Category.objects.create(name=name)
+        feed, _ = Feed.objects.get_or_create(url=url)  # keeps the conditional-GET state of existing rows
+        feed.name = name
+        feed.category = category
+        feed.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0021_rawpage'),
+    ]
+
+    operations = [
+        migrations.RenameModel('FeedState', 'Feed'),
+        migrations.AlterModelOptions(
+            name='feed',
+            options={'ordering': ['name']},
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='name',
+            field=models.CharField(default='', help_text="Stored as the source of the feed's articles", max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feeds', to='news.category'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='max_entries',
+            field=models.PositiveIntegerField(blank=True, help_text='Entries read per poll; empty uses SCRAPER_ENTRIES_PER_FEED', null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='poll_interval',
+            field=models.PositiveIntegerField(default=1800, help_text='Seconds between polls, adapted to the publication rate'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='next_poll_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Empty means due now', null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='last_success_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='last_failure_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='error_streak',
+            field=models.PositiveIntegerField(default=0, help_text='Consecutive failed polls'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(seed_feeds, migrations.RunPython.noop),
+    ]
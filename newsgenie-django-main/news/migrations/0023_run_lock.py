@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0022_feed_registry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('owner', models.CharField(blank=True, default='', help_text='Empty when the lock is free', max_length=150)),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='ingestjob',
+            name='worker',
+            field=models.CharField(blank=True, default='', help_text='host:pid:run of the worker that last claimed the job', max_length=100),
+        ),
+    ]
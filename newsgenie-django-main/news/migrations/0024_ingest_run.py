@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0023_run_lock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigger', models.CharField(choices=[('view', 'Scraper page'), ('scheduler', 'Scheduler')], max_length=20)),
+                ('state', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('stopped', 'Stopped'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('worker', models.CharField(blank=True, default='', help_text='Owner of the ingest lock during the run', max_length=150)),
+                ('feeds_queued', models.PositiveIntegerField(default=0)),
+                ('articles_created', models.PositiveIntegerField(default=0, help_text='Articles of this run that completed every stage')),
+                ('counters', models.JSONField(blank=True, default=dict, help_text='IngestReport counters at the end of the run')),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='run',
+            field=models.ForeignKey(blank=True, help_text='Run that queued the feed this job came from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='news.ingestrun'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0024_ingest_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestrun',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Per-stage latency histograms (milliseconds) from the IngestReport'),
+        ),
+        migrations.AlterField(
+            model_name='ingestrun',
+            name='trigger',
+            field=models.CharField(choices=[('view', 'Scraper page'), ('scheduler', 'Scheduler'), ('command', 'fetch_articles')], max_length=20),
+        ),
+    ]
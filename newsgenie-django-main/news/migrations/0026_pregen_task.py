@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0025_ingest_run_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PregenTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('summary', 'Summary'), ('audio', 'Audio')], max_length=20)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('priority', models.FloatField(db_index=True, default=0.0, help_text='Weighted sum of the score components; highest first')),
+                ('score', models.JSONField(blank=True, default=dict, help_text='Priority components: freshness, preference, likes, engagement')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('scored_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pregen_tasks', to='news.article')),
+            ],
+            options={
+                'verbose_name': 'Pre-generation task',
+                'ordering': ['-priority'],
+                'unique_together': {('article', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0026_pregen_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='summary_provisional',
+            field=models.BooleanField(default=False, help_text='The summary is a quick extract, to be replaced by the LLM summary'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:05
+#
+# The full-text index of news.utils.search, frozen here: the app module may
+# change (or grow imports) later, a migration must not.
+
+from django.db import migrations
+
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS news_article_fts USING fts5(
+        title, summary, content, content='news_article', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS news_article_fts_ai AFTER INSERT ON news_article BEGIN
+        INSERT INTO news_article_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, coalesce(new.summary, ''), new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS news_article_fts_ad AFTER DELETE ON news_article BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, coalesce(old.summary, ''), old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS news_article_fts_au AFTER UPDATE OF title, summary, content ON news_article BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, coalesce(old.summary, ''), old.content);
+        INSERT INTO news_article_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, coalesce(new.summary, ''), new.content);
+    END""",
+    "INSERT INTO news_article_fts(news_article_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS news_article_fts_ai",
+    "DROP TRIGGER IF EXISTS news_article_fts_ad",
+    "DROP TRIGGER IF EXISTS news_article_fts_au",
+    "DROP TABLE IF EXISTS news_article_fts",
+]
+
+POSTGRES_INSTALL = [
+    """ALTER TABLE news_article ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(summary, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(content, '')), 'C')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS news_article_search_vector ON news_article USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS news_article_search_vector",
+    "ALTER TABLE news_article DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def install(apps, schema_editor):
+    # Other backends have no index; search falls back to icontains there.
+    _run(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL})
+
+
+def uninstall(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0027_article_summary_provisional'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
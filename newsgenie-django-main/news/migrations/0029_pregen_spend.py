@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0028_article_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PregenSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('kind', models.CharField(choices=[('summary', 'Summary'), ('audio', 'Audio')], max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Pre-generation spend',
+                'verbose_name_plural': 'Pre-generation spend',
+                'ordering': ['-day', 'kind'],
+                'unique_together': {('day', 'kind')},
+            },
+        ),
+    ]
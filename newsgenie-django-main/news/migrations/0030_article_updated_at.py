@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:03
+#
+# On SQLite, adding the column rebuilds news_article, which drops the
+# triggers of the full-text index (0028); news.apps restores them after
+# migrate.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0029_pregen_spend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True),
+        ),
+    ]
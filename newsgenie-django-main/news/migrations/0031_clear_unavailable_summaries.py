@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:05
+
+from django.db import migrations
+from django.utils import timezone
+
+# Placeholders the summarizer used to store as final summaries (short articles, Gemini errors, rate limits).
+PLACEHOLDERS = [
+    'Summary not available.',
+    'Summary could not be generated.',
+    'Summary could not be generated due to API rate limits.',
+]
+
+
+def clear_unavailable_summaries(apps, schema_editor):
+    # Cleared, these articles get a provisional summary on their next view and are summarized again like any
+    # other; audio voiced from the placeholder text goes with it.
+    Article = apps.get_model('news', 'Article')
+    Article.objects.filter(summary__in=PLACEHOLDERS).update(
+        summary='', summary_provisional=False, audio_file='', updated_at=timezone.now(),
+    )
+    apps.get_model('news', 'SummaryCache').objects.filter(summary__in=PLACEHOLDERS).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0030_article_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_unavailable_summaries, migrations.RunPython.noop),
+    ]
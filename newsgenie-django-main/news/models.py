@@ -17,6 +17,8 @@ class Article(models.Model):
     source = models.CharField(max_length=100)
     published_at = models.DateTimeField()
     summary = models.TextField(blank=True, null=True)
+    # NEW: a local extractive summary stands in until the LLM summary replaces it
+    summary_provisional = models.BooleanField(default=False, help_text="The summary is a quick extract, to be replaced by the LLM summary")
     category = models.ManyToManyField(Category, related_name='articles')
     approved = models.BooleanField(default=False)
     audio_file = models.FileField(upload_to='news_audio/', blank=True, null=True)
@@ -25,13 +27,27 @@ class Article(models.Model):
     # NEW FEATURE: Field to mark the Article of the Week
     is_spotlighted = models.BooleanField(default=False, help_text="Check this to feature this article on the articles page.")
 
-    def save(self, *args, **kwargs):
-        if self.content:
-            word_count = len(self.content.split())
+    # NEW: near-duplicate detection. Rewrites of a story already stored point at it and are never summarized or voiced.
+    content_signature = models.BinaryField(null=True, blank=True, editable=False, help_text="MinHash signature of the content")
+    canonical = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates',
+        help_text="The article this one is a near-duplicate of"
+    )
+
+    # NEW: when the text or approval last changed; the BM25 search index re-reads articles changed since its last sync.
+    # QuerySet.update() and bulk_update() skip auto_now: those callers set it themselves.
+    updated_at = models.DateTimeField(auto_now=True, null=True, db_index=True)
+
+    @staticmethod
+    def compute_reading_time(content):
+        if content:
+            word_count = len(content.split())
             time_to_read = math.ceil(word_count / 225)
-            self.reading_time = max(1, time_to_read)
-        else:
-            self.reading_time = 0
+            return max(1, time_to_read)
+        return 0
+
+    def save(self, *args, **kwargs):
+        self.reading_time = self.compute_reading_time(self.content)
         super().save(*args, **kwargs)
 
     @property
@@ -165,4 +181,253 @@ class CommentReaction(models.Model):
         unique_together = ('comment', 'user', 'reaction_type')
 
     def __str__(self):
-        return f'{self.user.username} reacted with {self.reaction_type} to comment {self.comment.id}'
\ No newline at end of file
+        return f'{self.user.username} reacted with {self.reaction_type} to comment {self.comment.id}'
+class Feed(models.Model):
+    """
+    One RSS feed in the ingestion registry: what to poll, how often, and the
+    conditional-GET state kept between polls. The poll interval follows the
+    feed's publication rate; failing feeds back off exponentially.
+    """
+    name = models.CharField(max_length=100, help_text="Stored as the source of the feed's articles")
+    url = models.URLField(unique=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='feeds')
+    is_active = models.BooleanField(default=True)
+    max_entries = models.PositiveIntegerField(null=True, blank=True, help_text="Entries read per poll; empty uses SCRAPER_ENTRIES_PER_FEED")
+
+    # Schedule
+    poll_interval = models.PositiveIntegerField(default=1800, help_text="Seconds between polls, adapted to the publication rate")
+    next_poll_at = models.DateTimeField(blank=True, null=True, db_index=True, help_text="Empty means due now")
+    last_success_at = models.DateTimeField(blank=True, null=True)
+    last_failure_at = models.DateTimeField(blank=True, null=True)
+    error_streak = models.PositiveIntegerField(default=0, help_text="Consecutive failed polls")
+    last_error = models.TextField(blank=True, default='')
+
+    # Conditional-GET state
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=100, blank=True, default='', help_text="Last-Modified header from the previous poll")
+    last_polled_at = models.DateTimeField(blank=True, null=True)
+    entries_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 of the entry ids seen on the previous poll")
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name or self.url
+
+class IngestRun(models.Model):
+    """
+    One ingestion run: the feeds it queued and, through IngestJob.run, every
+    job that followed from them. Read by the scraper status page.
+    """
+    VIEW = 'view'
+    SCHEDULER = 'scheduler'
+    COMMAND = 'command'
+    TRIGGER_CHOICES = [
+        (VIEW, 'Scraper page'),
+        (SCHEDULER, 'Scheduler'),
+        (COMMAND, 'fetch_articles'),
+    ]
+
+    RUNNING = 'running'
+    DONE = 'done'
+    STOPPED = 'stopped'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (STOPPED, 'Stopped'),
+        (FAILED, 'Failed'),
+    ]
+
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=RUNNING)
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    worker = models.CharField(max_length=150, blank=True, default='', help_text="Owner of the ingest lock during the run")
+    feeds_queued = models.PositiveIntegerField(default=0)
+    articles_created = models.PositiveIntegerField(default=0, help_text="Articles of this run that completed every stage")
+    counters = models.JSONField(default=dict, blank=True, help_text="IngestReport counters at the end of the run")
+    timings = models.JSONField(default=dict, blank=True, help_text="Per-stage latency histograms (milliseconds) from the IngestReport")
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    @property
+    def duration(self):
+        if self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+    def __str__(self):
+        return f"{self.get_trigger_display()} run {self.pk} ({self.state})"
+
+class IngestJob(models.Model):
+    """
+    One durable unit of ingestion work. A feed job discovers entries and queues
+    extract jobs; each later stage queues the next one for the same article.
+    """
+    FEED = 'feed'
+    EXTRACT = 'extract'
+    SUMMARIZE = 'summarize'
+    TTS = 'tts'
+    STAGE_CHOICES = [
+        (FEED, 'Feed download'),
+        (EXTRACT, 'Article extraction'),
+        (SUMMARIZE, 'Summary'),
+        (TTS, 'Audio'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (SKIPPED, 'Skipped'),
+        (FAILED, 'Failed'),
+    ]
+
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=PENDING)
+    url = models.URLField(max_length=500, db_index=True, help_text="Feed URL for feed jobs, article URL otherwise")
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, blank=True, null=True, related_name='ingest_jobs')
+    run = models.ForeignKey(IngestRun, on_delete=models.SET_NULL, blank=True, null=True, related_name='jobs', help_text="Run that queued the feed this job came from")
+    payload = models.JSONField(default=dict, blank=True, help_text="Feed entry metadata carried between stages")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='', help_text="host:pid:run of the worker that last claimed the job")
+    available_at = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time (retry backoff)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['stage', 'state', 'available_at'])]
+
+    @property
+    def duration(self):
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+    def __str__(self):
+        return f"{self.get_stage_display()} job for {self.url} ({self.state})"
+
+class RunLock(models.Model):
+    """
+    A named lease shared by every node of the deployment. The holder renews it
+    while it works; a lease that is not renewed expires, so a crashed node
+    never blocks the others for longer than its TTL.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=150, blank=True, default='', help_text="Empty when the lock is free")
+    acquired_at = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.owner or 'free'})"
+
+class SummaryCache(models.Model):
+    """A generated summary keyed by the hash of the normalized article text and the prompt/model that produced it."""
+    content_hash = models.CharField(max_length=64)
+    prompt_version = models.CharField(max_length=32)
+    model_name = models.CharField(max_length=100)
+    summary = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'prompt_version', 'model_name')
+        verbose_name = "Summary cache entry"
+        verbose_name_plural = "Summary cache entries"
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.model_name}, prompt {self.prompt_version})"
+
+
+class RawPage(models.Model):
+    """One download of an article page; the compressed HTML lives in the content-addressed archive on disk."""
+    url = models.URLField(max_length=500)
+    content_hash = models.CharField(max_length=64, db_index=True, help_text="sha256 of the raw HTML bytes")
+    encoding = models.CharField(max_length=50, blank=True)
+    size = models.PositiveIntegerField(default=0, help_text="Raw HTML bytes")
+    compressed_size = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    article = models.ForeignKey(Article, on_delete=models.SET_NULL, null=True, blank=True, related_name='raw_pages')
+
+    class Meta:
+        ordering = ['-fetched_at']
+        indexes = [models.Index(fields=['url', 'fetched_at'])]
+
+    def __str__(self):
+        return f"{self.url} @ {self.fetched_at:%Y-%m-%d %H:%M}"
+
+
+class PregenTask(models.Model):
+    """
+    An article's summary or audio to generate before any reader asks for it.
+    Worked in priority order (predicted demand, see news.utils.pregen) within
+    the daily PREGEN_DAILY_LIMITS.
+    """
+    SUMMARY = 'summary'
+    AUDIO = 'audio'
+    KIND_CHOICES = [
+        (SUMMARY, 'Summary'),
+        (AUDIO, 'Audio'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (SKIPPED, 'Skipped'),
+        (FAILED, 'Failed'),
+    ]
+
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='pregen_tasks')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=PENDING)
+    priority = models.FloatField(default=0.0, db_index=True, help_text="Weighted sum of the score components; highest first")
+    score = models.JSONField(default=dict, blank=True, help_text="Priority components: freshness, preference, likes, engagement")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    scored_at = models.DateTimeField(blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        unique_together = ('article', 'kind')
+        ordering = ['-priority']
+        verbose_name = "Pre-generation task"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.article} ({self.state}, {self.priority:.2f})"
+
+
+class PregenSpend(models.Model):
+    """Pre-generation attempts of one kind on one (local) day: what counts against PREGEN_DAILY_LIMITS."""
+    day = models.DateField()
+    kind = models.CharField(max_length=20, choices=PregenTask.KIND_CHOICES)
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'kind')
+        ordering = ['-day', 'kind']
+        verbose_name = "Pre-generation spend"
+        verbose_name_plural = "Pre-generation spend"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} on {self.day}: {self.attempts}"
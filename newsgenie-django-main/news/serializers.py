@@ -9,7 +9,7 @@ class ArticleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Article
-        fields = ['id', 'title', 'summary', 'url', 'published_at', 'author', 'source', 'categories', 'audio_file']
+        fields = ['id', 'title', 'summary', 'summary_provisional', 'url', 'published_at', 'author', 'source', 'categories', 'audio_file']
 
 
 # Corrected UserPreferenceSerializer
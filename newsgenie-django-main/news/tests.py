@@ -1,11 +1,31 @@
-from django.test import TestCase, Client
+from django.apps import apps
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth import get_user_model
-from news.models import Article, Category, UserPreference
-from django.core.management import call_command
+from news.models import Article, ArticleLike, Category, UserPreference, UserArticleMetrics, Feed, IngestJob, IngestRun, PregenSpend, PregenTask, RunLock, SummaryCache
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+import gzip
+import io
+from importlib import import_module
+import json
 import os
+import random
+import tempfile
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, MagicMock
+from feedparser import FeedParserDict
+from news.utils import archive, dedup, extract, extractive, generation, http, locks, parsing, pipeline, pregen, runs, scraper, search, search_index, singleflight, summarizer, tts
+from news.utils.fakes import FakeGTTS, FakeModelClient
+from news.utils.feeds import download_feed, due_feeds, next_interval, poll_feed
+from news.utils.ratelimit import RateLimiter, RateLimitTimeout
+from news.utils.report import IngestReport
+from news.utils.urls import normalize_url
 
 User = get_user_model()
 
@@ -174,4 +194,1453 @@ class IntegrationTests(TestCase):
         
         self.assertNotIn(self.unapproved_article.title.encode(), response.content)
         
-        self.assertIn(self.approved_article.title.encode(), response.content)
\ No newline at end of file
+        self.assertIn(self.approved_article.title.encode(), response.content)
+
+
+def _fake_feed(prefix, count=3):
+    entries = [
+        FeedParserDict(link=f'https://example.com/{prefix}/{i}', title=f'{prefix} story {i}', author='Wire')
+        for i in range(count)
+    ]
+    return FeedParserDict(entries=entries, status=200, etag=f'"{prefix}-v1"')
+
+
+TEST_FEEDS = {'Technology': 'https://feeds.example.com/tech', 'World': 'https://feeds.example.com/world'}
+
+
+def _register_test_feeds():
+    """Replaces the seeded feed registry with TEST_FEEDS, all due now."""
+    Feed.objects.all().delete()
+    for name, url in TEST_FEEDS.items():
+        category, _ = Category.objects.get_or_create(name=name)
+        Feed.objects.create(name=name, url=url, category=category)
+
+
+def _patch_ingestion(summary=None):
+    """Registers TEST_FEEDS and patches the network-facing scraper helpers with offline fakes."""
+    _register_test_feeds()
+    summary = summary or MagicMock(return_value='A summary.')
+    return [
+        patch('news.utils.feeds.download_feed', side_effect=lambda url, **kw: _fake_feed(url.rsplit('/', 1)[-1])),
+        patch.object(scraper, 'fetch_article', side_effect=lambda url, **kw: (f'Body of {url}. ' * 20, None)),
+        patch.object(scraper, 'get_summary_from_gemini', summary),
+        patch.object(scraper, 'generate_audio', return_value=None),
+    ]
+
+
+@override_settings(SCRAPER_HOST_DELAY=0, SCRAPER_ENTRIES_PER_FEED=7)
+class FetchArticlesConcurrencyTests(TransactionTestCase):
+
+    def _run(self, workers):
+        patches = _patch_ingestion()
+        for p in patches:
+            p.start()
+        try:
+            return scraper.fetch_articles(workers=workers)
+        finally:
+            for p in patches:
+                p.stop()
+
+    def _snapshot(self):
+        return sorted(
+            (a.url, a.title, a.source, a.summary, a.approved, tuple(a.category.values_list('name', flat=True)))
+            for a in Article.objects.all()
+        )
+
+    def test_concurrent_mode_writes_same_rows_as_serial(self):
+        """
+        Test that --workers N stores exactly the articles and categories the serial path stores.
+        """
+        serial = self._run(workers=1)
+        serial_rows = self._snapshot()
+        Article.objects.all().delete()
+        Feed.objects.all().delete()
+        IngestJob.objects.all().delete()
+
+        concurrent = self._run(workers=4)
+        self.assertEqual(len(serial), 6)
+        self.assertEqual(len(concurrent), 6)
+        self.assertEqual(self._snapshot(), serial_rows)
+
+    def test_second_run_skips_known_articles(self):
+        self._run(workers=4)
+        self.assertEqual(self._run(workers=4), [])
+        self.assertEqual(Article.objects.count(), 6)
+
+
+class ConditionalFeedPollTests(TestCase):
+
+    def test_not_modified_feed_skips_processing(self):
+        """
+        Test that the stored ETag is sent back and a 304 answer yields no entries.
+        """
+        url = 'https://feeds.example.com/tech'
+        with patch('news.utils.feeds.download_feed', return_value=_fake_feed('tech')):
+            self.assertIsNotNone(poll_feed(url))
+
+        with patch('news.utils.feeds.download_feed', return_value=FeedParserDict(entries=[], status=304)) as parse:
+            self.assertIsNone(poll_feed(url))
+        parse.assert_called_once_with(url, etag='"tech-v1"', modified=None)
+
+    def test_unchanged_entry_set_is_skipped(self):
+        url = 'https://feeds.example.com/world'
+        with patch('news.utils.feeds.download_feed', return_value=_fake_feed('world')):
+            self.assertIsNotNone(poll_feed(url))
+            self.assertIsNone(poll_feed(url))
+            self.assertIsNotNone(poll_feed(url, force=True))
+
+
+class UrlDeduplicationTests(TestCase):
+
+    def test_normalize_url_strips_tracking_scheme_and_trailing_slash(self):
+        self.assertEqual(
+            normalize_url('http://www.BBC.co.uk/news/world-123/?at_medium=RSS&at_campaign=rss#comments'),
+            normalize_url('https://bbc.co.uk/news/world-123'),
+        )
+        self.assertNotEqual(normalize_url('https://bbc.co.uk/news/1'), normalize_url('https://bbc.co.uk/news/2'))
+
+    def test_known_candidates_are_dropped_in_one_query(self):
+        """
+        Test that a feed's candidates are checked with a single query and matched across URL spellings.
+        """
+        Article.objects.create(
+            title='Stored', content='...', url='https://www.bbc.co.uk/news/world-1',
+            source='World', published_at=timezone.now(),
+        )
+        entries = [
+            FeedParserDict(link='http://www.bbc.co.uk/news/world-1?at_medium=RSS', title='Old'),
+            FeedParserDict(link='https://www.bbc.co.uk/news/world-2', title='New'),
+            FeedParserDict(link='https://www.bbc.co.uk/news/world-2/', title='New again'),
+        ]
+        report = IngestReport()
+        with self.assertNumQueries(1):
+            fresh = pipeline.select_new_entries(entries, report)
+        self.assertEqual([entry.title for entry in fresh], ['New'])
+        self.assertEqual(report.counters['known_skipped'], 2)
+
+
+@override_settings(SCRAPER_HOST_DELAY=0, SCRAPER_JOB_RETRY_DELAY=0, SCRAPER_JOB_RETRY_WAIT=0)
+class IngestPipelineTests(TestCase):
+
+    def _start(self, summary=None):
+        for p in _patch_ingestion(summary):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_articles_stay_hidden_until_last_stage(self):
+        """
+        Test that an article is stored unapproved after extraction and approved once its audio stage ran.
+        """
+        self._start()
+        pipeline.enqueue_feeds()
+        pipeline.run_pipeline(workers=1, stages=[IngestJob.FEED, IngestJob.EXTRACT])
+        self.assertEqual(Article.objects.count(), 6)
+        self.assertFalse(Article.objects.filter(approved=True).exists())
+
+        finished = pipeline.run_pipeline(workers=1)
+        self.assertEqual(len(finished), 6)
+        self.assertEqual(Article.objects.filter(approved=True, summary='A summary.').count(), 6)
+
+    @override_settings(SCRAPER_WRITE_BATCH=20)
+    def test_extracted_articles_are_written_in_one_batch(self):
+        """
+        Test that a batch of extracted articles costs one article insert and one category-link insert.
+        """
+        self._start()
+        pipeline.enqueue_feeds()
+        with CaptureQueriesContext(connection) as queries:
+            pipeline.run_pipeline(workers=1, stages=[IngestJob.FEED, IngestJob.EXTRACT])
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(sum('"news_article" ' in sql for sql in inserts), 1)
+        self.assertEqual(sum('"news_article_category"' in sql for sql in inserts), 1)
+        self.assertEqual(Article.objects.filter(category__isnull=False).count(), 6)
+        self.assertTrue(all(a.reading_time > 0 for a in Article.objects.all()))
+
+    def test_feed_removed_while_queued_is_skipped(self):
+        self._start()
+        pipeline.enqueue_feeds()
+        Feed.objects.filter(name='World').delete()
+        pipeline.run_pipeline(workers=1, stages=[IngestJob.FEED])
+        job = IngestJob.objects.get(stage=IngestJob.FEED, url=TEST_FEEDS['World'])
+        self.assertEqual((job.state, job.attempts), (IngestJob.SKIPPED, 1))
+        self.assertFalse(Feed.objects.filter(url=TEST_FEEDS['World']).exists())  # not registered again by the poll
+
+    def test_rate_limited_summary_is_retried_not_stored(self):
+        summary = MagicMock(side_effect=[scraper.SummaryError('quota')] + ['A summary.'] * 10)
+        self._start(summary)
+        pipeline.enqueue_feeds()
+        pipeline.run_pipeline(workers=1)
+
+        self.assertEqual(Article.objects.filter(approved=True).count(), 6)
+        retried = IngestJob.objects.get(stage=IngestJob.SUMMARIZE, attempts=2)
+        self.assertEqual(retried.state, IngestJob.DONE)
+
+    @override_settings(SCRAPER_JOB_MAX_ATTEMPTS=2, SCRAPER_JOB_RETRY_DELAY=0)
+    def test_article_is_published_with_its_provisional_summary_when_gemini_keeps_failing(self):
+        self._start(MagicMock(side_effect=scraper.SummaryError('quota')))
+        words = 'council budget river school market bridge station harbour museum library festival tram park clinic'.split()
+
+        def fetch(url, **kw):
+            rng = random.Random(url)  # distinct stories, so none is linked away as a near-duplicate
+            return ' '.join(f"The {' '.join(rng.sample(words, 8))} reopened on Monday." for _ in range(8)), None
+        scraper.fetch_article.side_effect = fetch
+        pipeline.enqueue_feeds()
+        finished = pipeline.run_pipeline(workers=1)
+
+        self.assertEqual(len(finished), 6)
+        self.assertEqual(IngestJob.objects.filter(stage=IngestJob.SUMMARIZE, state=IngestJob.FAILED, attempts=2).count(), 6)
+        article = Article.objects.get(url='https://example.com/world/1')
+        self.assertTrue(article.approved and article.summary_provisional)
+        self.assertEqual(article.summary, extractive.extractive_summary(fetch(article.url)[0]))
+        self.client.force_login(User.objects.create_user(username='reader', password='password'))
+        self.assertContains(self.client.get(reverse('news:detail', args=[article.pk])), article.summary)
+
+    def test_restart_picks_up_orphaned_jobs(self):
+        self._start()
+        pipeline.enqueue_feeds()
+        job = pipeline.claim_jobs(IngestJob.FEED, 1, 'crashed-worker')[0]
+        IngestJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timezone.timedelta(hours=1))
+
+        pipeline.run_pipeline(workers=1)
+        self.assertFalse(IngestJob.objects.exclude(state__in=[IngestJob.DONE]).exists())
+        self.assertEqual(Article.objects.filter(approved=True).count(), 6)
+
+    def test_stop_finishes_current_job_and_hands_back_the_rest(self):
+        """
+        Test that setting the stop event ends the run after the job in progress, with nothing left claimed.
+        """
+        self._start()
+        stop = threading.Event()
+        scraper.fetch_article.side_effect = lambda url, **kw: (stop.set(), (f'Body of {url}. ' * 20, None))[1]
+        pipeline.enqueue_feeds()
+        pipeline.run_pipeline(workers=1, stop=stop)
+
+        self.assertEqual(Article.objects.count(), 1)
+        self.assertFalse(IngestJob.objects.filter(state=IngestJob.RUNNING).exists())
+        self.assertTrue(IngestJob.objects.filter(stage=IngestJob.FEED, state=IngestJob.PENDING).exists())
+
+        scraper.fetch_article.side_effect = lambda url, **kw: (f'Body of {url}. ' * 20, None)
+        pipeline.run_pipeline(workers=1)
+        self.assertEqual(Article.objects.filter(approved=True).count(), 6)
+
+    def test_interrupted_job_is_handed_back_without_counting_the_attempt(self):
+        self._start()
+        scraper.fetch_article.side_effect = KeyboardInterrupt
+        pipeline.enqueue_feeds()
+        with self.assertRaises(KeyboardInterrupt):
+            pipeline.run_pipeline(workers=1)
+
+        extract_jobs = IngestJob.objects.filter(stage=IngestJob.EXTRACT)
+        self.assertEqual(extract_jobs.count(), 3)
+        self.assertEqual(extract_jobs.filter(state=IngestJob.PENDING, attempts=0, worker='', last_error='').count(), 3)
+        self.assertFalse(IngestJob.objects.filter(state=IngestJob.RUNNING).exists())
+
+    def test_scraper_page_does_not_start_a_run(self):
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.client.force_login(staff)
+        _register_test_feeds()
+        response = self.client.get(reverse('news:scraper'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['status'])
+        self.assertFalse(IngestJob.objects.exists())
+
+    def test_scraper_post_is_refused_during_a_run(self):
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.client.force_login(staff)
+        _register_test_feeds()
+        locks.acquire(locks.INGEST_LOCK, 'other-node:1', ttl=60)
+        response = self.client.post(reverse('news:scraper'), follow=True)
+        self.assertContains(response, 'already in progress')
+        self.assertFalse(IngestRun.objects.exists())
+        self.assertFalse(IngestJob.objects.exists())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@override_settings(GEMINI_BACKOFF_BASE=0.001, GEMINI_BACKOFF_CAP=0.01, GEMINI_MAX_RETRIES=4)
+class GeminiRateLimitTests(TestCase):
+
+    LONG_TEXT = 'The council approved the new budget after a long debate. ' * 10
+
+    def setUp(self):
+        summarizer.reset_summarizer()
+        self.addCleanup(summarizer.reset_summarizer)
+
+    def test_token_bucket_spaces_requests_to_the_rpm_quota(self):
+        """
+        Test that the limiter hands out the per-minute quota and then makes callers wait for refill.
+        """
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=3, tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            limiter.acquire(10)
+        self.assertEqual(clock.now, 0.0)
+        limiter.acquire(10)
+        self.assertAlmostEqual(clock.now, 20.0)
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(10, timeout=1)
+
+    def test_full_shared_window_does_not_spend_local_tokens(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=3, tokens_per_minute=1000, shared=True, clock=clock, sleep=clock.sleep)
+        with patch.object(limiter, '_shared_wait', side_effect=[1.0, 1.0, 0.0]):
+            limiter.acquire(10)
+        self.assertEqual(clock.now, 2.0)
+        self.assertEqual((limiter.requests.tokens, limiter.tokens.tokens), (2.0, 990.0))  # one grant, counted once
+
+    def test_quota_errors_are_retried_with_backoff(self):
+        client = FakeModelClient(fail_times=2)
+        summary = summarizer.get_summary_from_gemini(self.LONG_TEXT, client=client)
+        self.assertTrue(summary.startswith('Summary:'))
+        self.assertEqual(client.calls, 3)
+
+    def test_exhausted_quota_raises_busy_within_max_wait(self):
+        client = FakeModelClient(fail_times=100)
+        with self.assertRaises(summarizer.SummaryBusy):
+            summarizer.get_summary_from_gemini(self.LONG_TEXT, raise_on_failure=True, client=client, max_wait=1)
+
+    def test_summarize_many_keeps_input_order(self):
+        client = FakeModelClient(latency=0.01)
+        texts = [f"Story {i}. " + self.LONG_TEXT for i in range(5)]
+        summaries = summarizer.summarize_many(texts, client=client, use_cache=False)
+        self.assertEqual([s.split('.')[0] for s in summaries], [f"Summary: Story {i}" for i in range(5)])
+
+
+class SummaryCacheTests(TestCase):
+
+    TEXT = 'Markets rallied on Friday as inflation cooled for a third month. ' * 6
+
+    def setUp(self):
+        summarizer.reset_summarizer()
+        self.addCleanup(summarizer.reset_summarizer)
+
+    def test_identical_text_is_summarized_once(self):
+        """
+        Test that a re-syndicated copy with different whitespace/case is served from the cache.
+        """
+        client = FakeModelClient()
+        first = summarizer.get_summary_from_gemini(self.TEXT, client=client)
+        second = summarizer.get_summary_from_gemini('  ' + self.TEXT.upper().replace(' ', '\n '), client=client)
+        self.assertEqual(first, second)
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(SummaryCache.objects.get().hits, 1)
+
+    def test_prune_drops_old_prompt_versions(self):
+        SummaryCache.objects.create(content_hash='a' * 64, prompt_version='old', model_name=summarizer.model_name(), summary='x')
+        SummaryCache.objects.create(content_hash='b' * 64, prompt_version=summarizer.SUMMARY_PROMPT_VERSION, model_name=summarizer.model_name(), summary='y')
+        call_command('prune_summary_cache', stdout=io.StringIO())
+        self.assertEqual(list(SummaryCache.objects.values_list('prompt_version', flat=True)), [summarizer.SUMMARY_PROMPT_VERSION])
+
+
+@override_settings(SUMMARY_INPUT_TOKEN_BUDGET=100, SUMMARY_MAX_CHUNKS=4)
+class MapReduceSummaryTests(TestCase):
+
+    def setUp(self):
+        summarizer.reset_summarizer()
+        self.addCleanup(summarizer.reset_summarizer)
+
+    def test_boilerplate_and_repeated_paragraphs_are_trimmed(self):
+        text = "The vote passed.\nShare this page\nImage source, Getty Images\nThe vote passed.\nTurnout was high."
+        self.assertEqual(summarizer.trim_boilerplate(text), "The vote passed.\n\nTurnout was high.")
+
+    def test_long_article_is_chunked_within_budget_and_reduced(self):
+        """
+        Test that an article over the input budget costs one call per chunk plus one merge call.
+        """
+        paragraphs = [f"Paragraph {i} reports another detail of the flood response in the region." * 3 for i in range(12)]
+        text = "\n\n".join(paragraphs)
+        chunks = summarizer.split_into_chunks(text, 100)
+        self.assertTrue(all(summarizer.estimate_tokens(chunk) <= 100 for chunk in chunks))
+
+        client = FakeModelClient()
+        summary = summarizer.get_summary_from_gemini(text, client=client, use_cache=False)
+        self.assertTrue(summary.startswith('Summary:'))
+        self.assertEqual(client.calls, 4 + 1)
+
+
+@override_settings(SUMMARY_BATCH_SIZE=5, SUMMARY_BATCH_BACKLOG=4)
+class BatchSummaryTests(TestCase):
+
+    def setUp(self):
+        summarizer.reset_summarizer()
+        self.addCleanup(summarizer.reset_summarizer)
+        self.contents = [f"Article {i} covers the council budget vote in some detail. " * 6 for i in range(7)]
+
+    def test_short_articles_share_requests_and_map_back_in_order(self):
+        """
+        Test that seven short articles cost two batch requests and each summary lands on its own article.
+        """
+        client = FakeModelClient()
+        summaries = summarizer.summarize_batch(self.contents, client=client, use_cache=False)
+        self.assertEqual(client.calls, 2)
+        for i, summary in enumerate(summaries):
+            self.assertTrue(summary.startswith(f"Summary: Article {i} covers"))
+
+    def test_malformed_reply_falls_back_to_single_requests(self):
+        client = FakeModelClient(malformed_batches=True)
+        summaries = summarizer.summarize_batch(self.contents[:3], client=client, use_cache=False)
+        self.assertEqual(client.calls, 1 + 3)
+        self.assertTrue(all(summary.startswith('Summary: Article') for summary in summaries))
+
+    @override_settings(GEMINI_CLIENT='news.utils.fakes.FakeModelClient')
+    def test_pipeline_batches_summaries_when_backlog_is_large(self):
+        """
+        Test that a summarize backlog over SUMMARY_BATCH_BACKLOG is worked in batch requests.
+        """
+        for i, content in enumerate(self.contents):
+            article = Article.objects.create(title=f"Story {i}", content=content, url=f"https://example.com/{i}",
+                                             published_at=timezone.now(), approved=False)
+            IngestJob.objects.create(stage=IngestJob.SUMMARIZE, url=article.url, article=article)
+
+        report = IngestReport()
+        pipeline.run_pipeline(workers=1, stages=[IngestJob.SUMMARIZE], report=report)
+
+        # five jobs in one batch request; the two left are under the backlog threshold and go singly
+        self.assertEqual(summarizer.get_model_client().calls, 1 + 2)
+        self.assertEqual(report.counters['summary_batches'], 1)
+        self.assertEqual(IngestJob.objects.filter(stage=IngestJob.TTS).count(), 7)
+        self.assertTrue(Article.objects.get(title='Story 3').summary.startswith('Summary: Article 3 covers'))
+
+
+WIRE_STORY = (
+    "Floodwater reached the centre of Ashford on Tuesday after the river burst its banks near the old mill. "
+    "Emergency crews evacuated about two hundred homes overnight and opened a shelter at the leisure centre. "
+    "The mayor said the council had asked the army for sandbags and that schools would stay closed until Friday. "
+    "Forecasters expect another band of heavy rain on Thursday, and the Environment Agency has issued six flood warnings. "
+    "Farmers on the valley floor moved cattle to higher ground, while the power company reported outages in three villages. "
+    "Insurers urged residents to photograph damage before starting repairs, and the minister promised emergency funding."
+)
+
+
+@override_settings(SCRAPER_HOST_DELAY=0, SCRAPER_ENTRIES_PER_FEED=7)
+class NearDuplicateTests(TestCase):
+
+    def setUp(self):
+        dedup.reset_index()
+        self.addCleanup(dedup.reset_index)
+
+    def test_rewrite_is_found_and_unrelated_story_is_not(self):
+        index = dedup.MinHashIndex(threshold=0.6)
+        index.add(1, dedup.signature(WIRE_STORY), timezone.now())
+        rewrite = "ASHFORD (Wire) - " + WIRE_STORY.replace("on Tuesday", "early on Tuesday") + " Updated at noon."
+        self.assertEqual(index.find(dedup.signature(rewrite)), 1)
+        other = "Stocks rallied on Tuesday after the central bank held rates and signalled cuts later in the year."
+        self.assertIsNone(index.find(dedup.signature(other)))
+
+    def test_duplicates_link_to_canonical_and_skip_summary(self):
+        """
+        Test that the same wire story from several feeds is summarized once and the copies point at it.
+        """
+        summary = MagicMock(return_value='A summary.')
+        patches = _patch_ingestion(summary) + [patch.object(scraper, 'fetch_article', return_value=(WIRE_STORY, None))]
+        for p in patches:
+            p.start()
+        try:
+            report = IngestReport()
+            scraper.fetch_articles(workers=1, report=report)
+        finally:
+            for p in reversed(patches):
+                p.stop()
+
+        canonical = Article.objects.get(canonical__isnull=True)
+        self.assertTrue(canonical.approved)
+        self.assertEqual(canonical.duplicates.count(), 5)
+        self.assertFalse(canonical.duplicates.filter(approved=True).exists())
+        self.assertEqual(summary.call_count, 1)
+        self.assertEqual(report.counters['near_duplicates'], 5)
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = gzip.compress(
+            b'<?xml version="1.0"?><rss version="2.0"><channel><title>T</title>'
+            b'<item><title>One</title><link>https://example.com/one</link></item></channel></rss>'
+        )
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SharedHttpSessionTests(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FeedHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        http.reset_session()
+        self.addCleanup(http.reset_session)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/rss.xml'
+
+    def test_feed_downloads_reuse_one_connection(self):
+        """
+        Test that repeated downloads from one host share a keep-alive connection and honour the ETag.
+        """
+        feed = download_feed(self.url)
+        self.assertEqual(feed.status, 200)
+        self.assertEqual(feed.etag, '"v1"')
+        self.assertEqual(feed.entries[0].link, 'https://example.com/one')
+        self.assertEqual(download_feed(self.url, etag='"v1"').status, 304)
+        download_feed(self.url)
+
+        stats = http.http_stats()['127.0.0.1']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['new_connections'], 1)
+        self.assertEqual(stats['reused_connections'], 2)
+
+
+class FallbackExtractorTests(TestCase):
+
+    def setUp(self):
+        extract.reset_winners()
+        self.addCleanup(extract.reset_winners)
+
+    def test_matches_soup_extractor_and_remembers_selector(self):
+        """
+        Test that the lxml extractor returns the old extractor's text on the saved pages and caches the winning selector.
+        """
+        from news.management.commands.benchmark_extract import FIXTURE_DIR, legacy_extract
+        expected_winners = {
+            'bbc_article.html': '[data-component="text-block"]',
+            'cnn_article.html': '.zn-body__paragraph',
+            'blog_post.html': '.entry-content p',
+        }
+        for name, selector in expected_winners.items():
+            with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+                html = f.read()
+            url = f'https://www.{name}.example.com/story'
+            text = extract.extract_article_text(html, url)
+            self.assertEqual(text, legacy_extract(html))
+            self.assertEqual(extract.selector_winners()[f'{name}.example.com'], selector)
+            self.assertEqual(extract.extract_article_text(html, url), text)
+
+    def test_junk_tags_are_ignored(self):
+        paragraph = 'A sentence that is comfortably longer than forty characters in total.'
+        html = '<html><body><nav>' + f'<p>{paragraph}</p>' * 5 + '</nav><script>var a = 1;</script>' + f'<p>{paragraph}</p>' * 2 + '</body></html>'
+        self.assertIsNone(extract.extract_article_text(html, 'https://example.com/a'))
+
+
+class ParsePoolTests(TestCase):
+
+    def setUp(self):
+        parsing.shutdown_parse_pool()
+        self.addCleanup(parsing.shutdown_parse_pool)
+        from news.management.commands.benchmark_extract import FIXTURE_DIR
+        with open(os.path.join(FIXTURE_DIR, 'bbc_article.html'), 'rb') as f:
+            self.html = f.read()
+
+    @override_settings(SCRAPER_PARSE_WORKERS=1, SCRAPER_PARSE_MAX_TASKS_PER_CHILD=1)
+    def test_pool_returns_same_text_as_inline_parse(self):
+        """
+        Test that parsing in a recycled worker process gives the text an in-thread parse gives.
+        """
+        url = 'https://www.bbc.co.uk/news/story'
+        inline = parsing.parse_article_html(self.html, url, 'utf-8')
+        self.assertIn('council', inline)
+        for _ in range(2):  # the second page is parsed by a fresh child
+            self.assertEqual(parsing.parse_html(self.html, url, 'utf-8'), inline)
+
+    @override_settings(SCRAPER_PARSE_WORKERS=0)
+    def test_zero_workers_parses_in_thread(self):
+        self.assertIsNone(parsing.get_parse_pool())
+        self.assertIn('council', parsing.parse_html(self.html, 'https://example.com/a'))
+
+
+@override_settings(SCRAPER_PARSE_WORKERS=0)
+class HtmlArchiveTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.archive_dir = tmp.name
+        override = override_settings(HTML_ARCHIVE_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        from news.management.commands.benchmark_extract import FIXTURE_DIR
+        with open(os.path.join(FIXTURE_DIR, 'bbc_article.html'), 'rb') as f:
+            self.html = f.read()
+
+    def test_pages_are_stored_once_and_round_trip(self):
+        saved = archive.save_html(self.html)
+        self.assertEqual(archive.save_html(self.html), saved)
+        self.assertLess(saved['compressed_size'], saved['size'])
+        self.assertEqual(archive.load_html(saved['content_hash']), self.html)
+
+    def test_failed_write_leaves_no_temporary_file(self):
+        with patch.object(archive.os, 'replace', side_effect=OSError('disk full')):
+            self.assertIsNone(archive.save_html(self.html))
+        leftovers = [name for _, _, names in os.walk(self.archive_dir) for name in names]
+        self.assertEqual(leftovers, [])
+
+    def test_reprocess_re_extracts_from_archive_without_network(self):
+        """
+        Test that reprocess_articles rebuilds content and reading time from the archived HTML only.
+        """
+        article = Article.objects.create(
+            title='Flood review', content='Truncated.', url='https://www.bbc.co.uk/news/flood',
+            source='World', published_at=timezone.now(),
+        )
+        archive.record(article.url, archive.save_html(self.html), 'utf-8', article=article)
+
+        out = io.StringIO()
+        with patch.object(http, 'get', side_effect=AssertionError('network used')):
+            call_command('reprocess_articles', stage=['extract', 'reading-time'], stdout=out)
+
+        article.refresh_from_db()
+        self.assertIn('council', article.content)
+        self.assertGreater(article.reading_time, 1)
+        self.assertIsNotNone(article.content_signature)
+        self.assertIn('Updated 1/1 articles (extract)', out.getvalue())
+
+    def test_resummarize_drops_audio_of_the_old_summary(self):
+        article = Article.objects.create(
+            title='Flood review', content='Body. ' * 50, summary='Old summary.', audio_file='news_audio/aa/old.mp3',
+            url='https://www.bbc.co.uk/news/flood', source='World', published_at=timezone.now(),
+        )
+        with patch('news.management.commands.reprocess_articles.summarize_batch', return_value=['New summary.']):
+            call_command('reprocess_articles', stage=['summarize'], use_gemini=True, stdout=io.StringIO())
+        article.refresh_from_db()
+        self.assertEqual(article.summary, 'New summary.')
+        self.assertFalse(article.audio_file)
+
+    def test_summarize_stage_is_offline_and_keeps_final_summaries(self):
+        story = 'The council approved new flood barriers on Monday. ' * 3 + 'Work starts in spring. Residents welcomed the plan.'
+        missing = Article.objects.create(
+            title='Flood review', content=story, url='https://www.bbc.co.uk/news/flood', published_at=timezone.now(),
+        )
+        final = Article.objects.create(
+            title='Flood vote', content=story, summary='Written by the model.', url='https://www.bbc.co.uk/news/vote',
+            published_at=timezone.now(),
+        )
+        with patch('news.management.commands.reprocess_articles.summarize_batch') as gemini:
+            call_command('reprocess_articles', stage=['summarize'], stdout=io.StringIO())
+        gemini.assert_not_called()
+        missing.refresh_from_db()
+        final.refresh_from_db()
+        self.assertTrue(missing.summary_provisional)
+        self.assertIn('flood barriers', missing.summary)
+        self.assertEqual(final.summary, 'Written by the model.')
+
+
+@override_settings(FEED_MIN_INTERVAL=300, FEED_MAX_INTERVAL=86400, FEED_TARGET_NEW_PER_POLL=3, FEED_MAX_BACKOFF=86400)
+class FeedScheduleTests(TestCase):
+
+    def test_interval_follows_publication_rate(self):
+        self.assertLess(next_interval(1800, 12), 1800)   # busy feed: poll sooner
+        self.assertGreater(next_interval(1800, 0), 1800)  # quiet feed: poll later
+        self.assertEqual(next_interval(300, 50), 300)     # never below the minimum
+        self.assertEqual(next_interval(86400, 0), 86400)  # nor above the maximum
+
+    def test_failing_feed_backs_off_and_recovers(self):
+        """
+        Test that each failed poll doubles the wait, and a successful poll resets the error streak.
+        """
+        feed = Feed.objects.create(name='World', url='https://feeds.example.com/world', poll_interval=600)
+        broken = FeedParserDict(entries=[], bozo=1, bozo_exception=ValueError('HTTP 503'))
+        waits = []
+        for _ in range(3):
+            with patch('news.utils.feeds.download_feed', return_value=broken):
+                self.assertIsNone(poll_feed(feed.url))
+            feed.refresh_from_db()
+            waits.append(round((feed.next_poll_at - feed.last_failure_at).total_seconds()))
+        self.assertEqual(waits, [1200, 2400, 4800])
+        self.assertEqual(feed.error_streak, 3)
+        self.assertNotIn(feed, due_feeds())
+
+        with patch('news.utils.feeds.download_feed', return_value=_fake_feed('world')):
+            self.assertIsNotNone(poll_feed(feed.url, force=True))
+        feed.refresh_from_db()
+        self.assertEqual(feed.error_streak, 0)
+        self.assertIsNotNone(feed.last_success_at)
+
+    def test_only_due_feeds_are_enqueued(self):
+        _register_test_feeds()
+        Feed.objects.filter(name='World').update(next_poll_at=timezone.now() + timezone.timedelta(hours=1))
+        self.assertEqual(pipeline.enqueue_feeds(), 1)
+        self.assertEqual(IngestJob.objects.get(stage=IngestJob.FEED).url, TEST_FEEDS['Technology'])
+        self.assertEqual(set(scraper.create_categories()), {'technology', 'world'})
+
+
+@override_settings(SCRAPER_HOST_DELAY=0, SCRAPER_JOB_RETRY_WAIT=0)
+class IngestSchedulerTests(TestCase):
+
+    def test_lease_is_exclusive_until_it_expires(self):
+        self.assertTrue(locks.acquire('ingest', 'node-a', ttl=60))
+        with self.assertRaises(locks.LockHeld):
+            with locks.Lease('ingest', 'node-b'):
+                pass
+        self.assertEqual(locks.holder('ingest'), 'node-a')
+
+        RunLock.objects.filter(name='ingest').update(expires_at=timezone.now())  # node-a died
+        with locks.Lease('ingest', 'node-b'):
+            self.assertFalse(locks.renew('ingest', 'node-a', ttl=60))
+            self.assertEqual(locks.holder('ingest'), 'node-b')
+        self.assertIsNone(locks.holder('ingest'))
+
+    def test_tick_is_skipped_while_another_node_holds_the_lock(self):
+        _register_test_feeds()
+        locks.acquire(locks.INGEST_LOCK, 'other-node:1', ttl=60)
+        out = io.StringIO()
+        call_command('run_ingest_scheduler', '--once', stdout=out)
+        self.assertIn('Skipping this tick', out.getvalue())
+        self.assertFalse(IngestJob.objects.exists())
+
+    def test_tick_ingests_due_feeds_and_releases_the_lock(self):
+        for p in _patch_ingestion():
+            p.start()
+            self.addCleanup(p.stop)
+        out = io.StringIO()
+        call_command('run_ingest_scheduler', '--once', '--workers', '1', stdout=out)
+        self.assertIn('completed 6 articles', out.getvalue())
+        self.assertEqual(Article.objects.filter(approved=True).count(), 6)
+        self.assertIsNone(locks.holder(locks.INGEST_LOCK))
+        self.assertTrue(Feed.objects.filter(next_poll_at__gt=timezone.now()).exists())  # not due again yet
+
+
+@override_settings(SCRAPER_HOST_DELAY=0, SCRAPER_JOB_MAX_ATTEMPTS=1, SCRAPER_WORKERS=1)
+class BackgroundScraperRunTests(TransactionTestCase):
+
+    def test_post_returns_at_once_and_status_reports_progress(self):
+        """
+        Test that the scraper page starts the crawl in a background thread and the status endpoint reports it.
+        """
+        for p in _patch_ingestion():
+            p.start()
+            self.addCleanup(p.stop)
+        crawl_may_start = threading.Event()
+
+        def fetch(url, **kw):
+            crawl_may_start.wait(5)
+            if url.endswith('world/1'):
+                raise ValueError('publisher returned 500')
+            return f'Body of {url}. ' * 20, None
+        scraper.fetch_article.side_effect = fetch
+
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(reverse('news:scraper'))
+        # Returned while the crawl is blocked; the page itself is not fetched while the run writes
+        # (SQLite's shared in-memory test database fails concurrent access instead of waiting).
+        self.assertRedirects(response, reverse('news:scraper'), fetch_redirect_response=False)
+        ingest_run = IngestRun.objects.get()
+        self.assertEqual(ingest_run.started_by, staff)
+
+        crawl_may_start.set()
+        self.assertTrue(runs.join_run(ingest_run, timeout=30))
+        status = self.client.get(reverse('news:scraper_status', args=[ingest_run.pk])).json()['run']
+        self.assertEqual(status['state'], IngestRun.DONE)
+        self.assertEqual(status['articles_created'], 5)
+        self.assertEqual(status['failed_jobs'], 1)
+        self.assertEqual(status['failures'][0]['url'], 'https://example.com/world/1')
+        world = next(feed for feed in status['feeds'] if feed['name'] == 'World')
+        self.assertEqual((world['state'], world['entries'], world['completed'], world['failed']), ('done', 3, 2, 1))
+        self.assertIsNone(locks.holder(locks.INGEST_LOCK))
+        self.assertContains(self.client.get(reverse('news:scraper')), f'Run #{ingest_run.pk}')
+
+
+class IngestReportTests(TestCase):
+
+    def test_histogram_percentiles_come_from_buckets(self):
+        report = IngestReport()
+        for ms in [3] * 90 + [400] * 9 + [70000]:
+            report.observe('download', ms / 1000)
+        timing = report.as_dict()['timings']['download']
+        self.assertEqual(timing['count'], 100)
+        self.assertEqual(timing['p50_ms'], 5.0)       # bucket upper bound
+        self.assertEqual(timing['p95_ms'], 500.0)
+        self.assertEqual(timing['max_ms'], 70000.0)
+        self.assertEqual(timing['buckets'], {'<=5': 90, '<=500': 9, '>60000': 1})
+
+    def test_fetch_article_times_download_archive_and_parse(self):
+        report = IngestReport()
+        with tempfile.TemporaryDirectory() as tmp, override_settings(HTML_ARCHIVE_DIR=tmp, SCRAPER_PARSE_WORKERS=0), \
+                patch.object(scraper, 'download_article', return_value=(b'<html><p>Hi</p></html>', 'utf-8')):
+            scraper.fetch_article('https://example.com/a', report=report)
+        self.assertEqual(set(report.as_dict()['timings']), {'download', 'archive', 'parse'})
+
+    @override_settings(SCRAPER_HOST_DELAY=0)
+    def test_fetch_articles_json_report_is_persisted_and_shown_in_admin(self):
+        """
+        Test that `fetch_articles --report json` prints only the run record, which is stored and shown in the admin.
+        """
+        for p in _patch_ingestion():
+            p.start()
+            self.addCleanup(p.stop)
+        out = io.StringIO()
+        call_command('fetch_articles', '--workers', '1', '--report', 'json', stdout=out)
+        record = json.loads(out.getvalue())
+
+        self.assertEqual(record['articles_created'], 6)
+        self.assertEqual(record['counters']['feeds_polled'], 2)
+        self.assertEqual(record['timings']['summarize']['count'], 6)
+        self.assertEqual(record['timings']['tts']['count'], 6)
+        self.assertIn('db', record['timings'])
+        ingest_run = IngestRun.objects.get(pk=record['run'])
+        self.assertEqual((ingest_run.trigger, ingest_run.state), (IngestRun.COMMAND, IngestRun.DONE))
+        self.assertEqual(ingest_run.timings['feed']['count'], 2)
+
+        admin_user = User.objects.create_superuser(username='admin', password='password', email='a@example.com')
+        self.client.force_login(admin_user)
+        page = self.client.get(reverse('admin:news_ingestrun_change', args=[ingest_run.pk]))
+        self.assertContains(page, '<td>summarize</td>', html=False)
+
+
+class IngestBenchmarkTests(TransactionTestCase):
+    """The offline replay benchmark drives the real pipeline end to end without network access."""
+
+    def run_benchmark(self, *args):
+        out = io.StringIO()
+        call_command(
+            'benchmark_ingest', '--use-current-db', '--noinput', '--feeds', '1', '--entries', '3',
+            '--http-latency', '0', '--model-latency', '0', '--tts-latency', '0', '--format', 'json', *args,
+            stdout=out,
+        )
+        return json.loads(out.getvalue())
+
+    def test_replay_reports_throughput_and_stage_latency(self):
+        document = self.run_benchmark('--workers', '1', '--workers', '2')
+
+        self.assertEqual([result['workers'] for result in document['results']], [1, 2])
+        for result in document['results']:
+            self.assertEqual(result['articles'], 3)
+            self.assertGreater(result['articles_per_s'], 0)
+            self.assertGreater(result['peak_rss_mb'], 0)
+            self.assertEqual(result['stages']['download']['count'], 3)
+            self.assertEqual(result['stages']['tts']['count'], 3)
+            self.assertIn('p95_ms', result['stages']['parse'])
+        self.assertEqual(Article.objects.count(), 3)
+
+    def test_baseline_regression_fails_the_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'results': [{'workers': 1, 'articles_per_s': 10 ** 6}]}, f)
+        self.addCleanup(os.remove, f.name)
+
+        with self.assertRaisesMessage(CommandError, 'Throughput regressed'):
+            self.run_benchmark('--workers', '1', '--baseline', f.name)
+
+    def test_refuses_to_flush_a_database_that_is_not_a_test_database(self):
+        with patch.dict(connection.settings_dict, {'NAME': '/srv/newsgenie/db.sqlite3'}):
+            with self.assertRaisesMessage(CommandError, 'not a test database'):
+                self.run_benchmark('--workers', '1')
+
+
+class TTSPoolTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        overrides = override_settings(MEDIA_ROOT=tmp.name, TTS_WORKERS=1, TTS_QUEUE_SIZE=1)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        fake = patch.object(tts, 'gTTS', FakeGTTS)
+        fake.start()
+        self.addCleanup(fake.stop)
+        FakeGTTS.reset()
+        tts.shutdown_tts_pool()
+        self.addCleanup(tts.shutdown_tts_pool)
+
+    def test_identical_summaries_share_one_audio_file(self):
+        first = tts.generate_audio('Markets rallied today.')
+        second = tts.generate_audio('Markets  rallied\ntoday.')  # same text once cleaned
+        other = tts.generate_audio('Markets fell today.')
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('news_audio/') and first.endswith('.mp3'))
+        self.assertEqual(FakeGTTS.calls, ['Markets rallied today.', 'Markets fell today.'])
+        with override_settings(TTS_SLOW=True):  # another voice is another file
+            self.assertNotEqual(tts.generate_audio('Markets rallied today.'), first)
+
+    def test_generate_audio_does_not_voice_text_another_process_is_still_voicing(self):
+        text = 'Markets rallied today.'
+        token = singleflight.claim(tts._flight(text))
+        self.addCleanup(singleflight.release, tts._flight(text), token)
+
+        with override_settings(SINGLEFLIGHT_TTL=0.3):
+            self.assertIsNone(tts.generate_audio(text))
+        self.assertEqual(FakeGTTS.calls, [])
+
+        singleflight.release(tts._flight(text), token)  # that process failed: the next call voices it
+        self.assertTrue(tts.generate_audio(text))
+        self.assertEqual(FakeGTTS.calls, [text])
+
+    def test_generate_audio_view_returns_pending_then_the_audio(self):
+        """
+        Test that the audio endpoint answers at once with a poll URL, and the poll URL serves the audio once voiced.
+        """
+        user = User.objects.create_user(username='listener', password='password')
+        self.client.force_login(user)
+        article = Article.objects.create(
+            title='Voiced', content='Body', summary='A short summary.', url='https://example.com/voiced',
+            published_at=timezone.now(), approved=True,
+        )
+        FakeGTTS.gate = threading.Event()
+
+        response = self.client.post(reverse('news:generate_audio', args=[article.pk]))
+        self.assertEqual(response.status_code, 202)
+        poll_url = response.json()['poll_url']
+        self.assertEqual(self.client.get(poll_url).json()['status'], 'pending')
+
+        FakeGTTS.gate.set()
+        tts.get_tts_pool().submit(article.summary).result(timeout=5)
+        data = self.client.get(poll_url).json()
+        self.assertEqual(data['status'], 'success')
+        article.refresh_from_db()
+        self.assertEqual(data['audio_url'], article.audio_file.url)
+        self.assertEqual(FakeGTTS.calls, ['A short summary.'])
+
+    def test_full_queue_is_reported_busy(self):
+        FakeGTTS.gate = threading.Event()
+        self.addCleanup(FakeGTTS.gate.set)
+        pool = tts.get_tts_pool()
+        pool.submit('First summary.')
+        for _ in range(50):  # wait until the worker took the first request off the queue
+            if not pool.queued():
+                break
+            threading.Event().wait(0.01)
+        pool.submit('Second summary.')
+        self.assertIs(pool.submit('Second summary.'), pool.submit('Second summary.'))  # in flight: same future
+        with self.assertRaises(tts.TTSBusy):
+            pool.submit('Third summary.', block=False)
+
+
+@override_settings(SINGLEFLIGHT_WAIT=0)
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.client.force_login(self.user)
+        self.article = Article.objects.create(
+            title='Popular', content='Body of a popular story. ' * 20, url='https://example.com/popular',
+            published_at=timezone.now(), approved=True,
+        )
+        self.addCleanup(cache.clear)
+
+    def test_claim_is_exclusive_until_released(self):
+        token = singleflight.claim('k')
+        self.assertIsNotNone(token)
+        self.assertIsNone(singleflight.claim('k'))
+        singleflight.release('k', 'not-the-holder')
+        self.assertTrue(singleflight.in_flight('k'))
+        singleflight.release('k', token)
+        self.assertFalse(singleflight.in_flight('k'))
+        self.assertIsNotNone(singleflight.claim('k'))
+
+    def test_concurrent_summary_request_is_pending_instead_of_calling_gemini(self):
+        """
+        Test that a request arriving while another one summarizes the article gets a poll URL, not a second Gemini call.
+        """
+        token = singleflight.claim(f"summary:{self.article.pk}")  # the first reader's request
+        with patch('news.utils.generation.get_summary_from_gemini') as gemini:
+            response = self.client.post(reverse('news:generate_summary', args=[self.article.pk]))
+        gemini.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        poll_url = response.json()['poll_url']
+        self.assertEqual(self.client.get(poll_url).status_code, 202)
+
+        Article.objects.filter(pk=self.article.pk).update(summary='The first request saved this.')
+        singleflight.release(f"summary:{self.article.pk}", token)
+        data = self.client.get(poll_url).json()
+        self.assertEqual((data['status'], data['summary']), ('success', 'The first request saved this.'))
+
+    def test_summary_is_generated_once(self):
+        with patch('news.utils.generation.get_summary_from_gemini', return_value='Once.') as gemini:
+            for _ in range(3):
+                response = self.client.post(reverse('news:generate_summary', args=[self.article.pk]))
+                self.assertEqual(response.json()['summary'], 'Once.')
+        self.assertEqual(gemini.call_count, 1)
+        self.assertFalse(singleflight.in_flight(f"summary:{self.article.pk}"))
+
+    def test_audio_voiced_elsewhere_is_pending_without_queueing(self):
+        self.article.summary = 'Voiced by another process.'
+        self.article.save()
+        singleflight.claim(f"audio:{tts.audio_key(tts.clean_text_for_speech(self.article.summary))}")
+        with patch.object(tts, 'get_tts_pool') as get_pool:
+            get_pool.return_value.state.return_value = (tts.MISSING, None)
+            state, _ = tts.request_audio(self.article)
+        self.assertEqual(state, tts.PENDING)
+        get_pool.return_value.submit.assert_not_called()
+
+    def test_audio_finished_before_the_callback_leaves_the_request_connection_open(self):
+        self.article.summary = 'Voiced in a blink.'
+        self.article.save()
+        done = Future()
+        done.set_result('news_audio/ab/blink.mp3')  # the worker finished before add_done_callback
+        with patch.object(tts.TTSPool, 'submit', return_value=done), patch.object(tts, 'connection') as request_connection:
+            state, _ = tts.request_audio(self.article)
+        self.assertEqual(state, tts.PENDING)
+        self.assertFalse(singleflight.in_flight(tts._flight(self.article.summary)))
+        request_connection.close.assert_not_called()  # closing it would break the request's transaction
+
+
+class SingleFlightAcrossProcessesTests(TransactionTestCase):
+    def test_flight_is_seen_by_other_database_connections(self):
+        """
+        Test that a claim made through one connection (one worker process) holds for every other.
+        """
+        token = singleflight.claim('summary:1')
+        seen = []
+
+        def other_worker():
+            seen.extend([singleflight.in_flight('summary:1'), singleflight.claim('summary:1')])
+            connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [True, None])
+        singleflight.release('summary:1', token)
+        self.assertFalse(RunLock.objects.exists())  # released flights leave no rows behind
+
+
+@override_settings(PREGEN_DAILY_LIMITS={'summary': 2, 'audio': 0}, PREGEN_MIN_PRIORITY=0.0)
+class PregenerationTests(TestCase):
+    def setUp(self):
+        self.sport, self.tech = Category.objects.create(name='Sport'), Category.objects.create(name='Tech')
+        now = timezone.now()
+
+        def article(title, hours_old, category):
+            a = Article.objects.create(
+                title=title, content=f'{title} body. ' * 20, url=f'https://example.com/{title}',
+                published_at=now - timezone.timedelta(hours=hours_old), approved=True,
+            )
+            a.category.add(category)
+            return a
+        self.fresh = article('fresh', 1, self.tech)
+        self.followed = article('followed', 12, self.sport)
+        self.liked = article('liked', 12, self.tech)
+        self.old = article('old', 24 * 7, self.sport)  # outside the window
+
+        for n in range(3):
+            reader = User.objects.create_user(username=f'reader{n}', password='password')
+            UserPreference.objects.create(user=reader).preferred_categories.add(self.sport)
+            ArticleLike.objects.create(user=reader, article=self.liked)
+            UserArticleMetrics.objects.create(user=reader, article=self.liked, time_on_page=300, scroll_depth=0.9)
+
+    def test_queue_is_ordered_by_predicted_demand(self):
+        self.assertEqual(pregen.refresh_queue(), 6)  # summary and audio of the three recent articles
+        order = list(
+            PregenTask.objects.filter(kind=PregenTask.SUMMARY, state=PregenTask.PENDING).values_list('article__title', flat=True)
+        )
+        self.assertEqual(order, ['liked', 'followed', 'fresh'])
+        followed = PregenTask.objects.get(article=self.followed, kind=PregenTask.SUMMARY)
+        self.assertEqual(followed.score['preference'], 1.0)
+        self.assertFalse(PregenTask.objects.filter(article=self.old).exists())
+
+    def test_daily_limit_stops_pregeneration(self):
+        with patch('news.utils.generation.get_summary_from_gemini', return_value='Pre-generated.') as gemini:
+            result = pregen.run_pregeneration()
+        self.assertEqual(gemini.call_count, 2)
+        self.assertEqual((result['done'], result['budget_left']), (2, {'summary': 0, 'audio': 0}))
+        self.assertEqual(
+            set(Article.objects.filter(summary='Pre-generated.').values_list('title', flat=True)), {'liked', 'followed'}
+        )
+        self.assertEqual(pregen.spent_today()['summary'], 2)
+
+        # A reader generated the last one meanwhile: its task is skipped on the next refresh, not spent.
+        Article.objects.filter(pk=self.fresh.pk).update(summary='By a reader.')
+        pregen.refresh_queue()
+        task = PregenTask.objects.get(article=self.fresh, kind=PregenTask.SUMMARY)
+        self.assertEqual(task.state, PregenTask.SKIPPED)
+
+        admin_user = User.objects.create_superuser(username='admin', password='password', email='a@example.com')
+        self.client.force_login(admin_user)
+        page = self.client.get(reverse('admin:news_pregentask_changelist'))
+        self.assertContains(page, 'summary 2 spent / 0 left')
+
+    def test_retries_spend_the_budget_of_the_day_they_run(self):
+        pregen.refresh_queue()
+        PregenTask.objects.filter(article=self.liked, kind=PregenTask.SUMMARY).update(attempts=1)  # failed yesterday
+        pregen._spend(PregenTask.SUMMARY, now=timezone.now() - timezone.timedelta(days=1))
+
+        with patch('news.utils.generation.get_summary_from_gemini', return_value='Pre-generated.'):
+            pregen.run_pregeneration(max_tasks=1)
+        self.assertEqual(PregenTask.objects.get(article=self.liked, kind=PregenTask.SUMMARY).attempts, 2)
+        self.assertEqual(pregen.spent_today()['summary'], 1)
+        self.assertEqual(sum(PregenSpend.objects.values_list('attempts', flat=True)), 2)
+
+
+    def test_spend_counts_on_a_row_another_worker_created_first(self):
+        today = PregenSpend.objects.filter(day=timezone.localdate(), kind=PregenTask.AUDIO)
+        PregenSpend.objects.create(day=timezone.localdate(), kind=PregenTask.AUDIO, attempts=1)
+        # The first update runs just before the other worker's insert and matches nothing.
+        with patch.object(PregenSpend.objects, 'filter', side_effect=[PregenSpend.objects.none(), today]):
+            pregen._spend(PregenTask.AUDIO)
+        self.assertEqual(pregen.spent_today()['audio'], 2)
+
+class ExtractiveSummaryTests(TestCase):
+    STORY = (
+        "The city council approved a new budget for public transport on Monday evening. "
+        "The budget adds twelve electric buses and extends public transport routes to the airport. "
+        "Council members said the public transport budget was the largest in a decade. "
+        "A local bakery celebrated its fiftieth anniversary with free pastries for children. "
+        "Weather forecasters expect light rain across the region later this week.\n"
+        "Critics argued the transport budget ignores cycling lanes across the city centre. "
+        "The mayor promised the council would revisit cycling in the next budget round."
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.client.force_login(self.user)
+        self.article = Article.objects.create(
+            title='Budget', content=self.STORY * 2, url='https://example.com/budget',
+            published_at=timezone.now(), approved=True,
+        )
+        self.addCleanup(cache.clear)
+
+    def test_picks_central_sentences_in_order(self):
+        summary = extractive.extractive_summary(self.STORY, sentences=2)
+        self.assertIn('approved a new budget for public transport', summary)
+        self.assertNotIn('bakery', summary)
+        self.assertNotIn('rain', summary)
+        chosen = extractive.split_sentences(summary)
+        self.assertEqual(chosen, sorted(chosen, key=self.STORY.index))  # original order
+        self.assertEqual(extractive.extractive_summary('Too short.'), '')
+
+    def test_busy_gemini_serves_provisional_summary_then_upgrades_in_place(self):
+        url = reverse('news:generate_summary', args=[self.article.pk])
+        with patch('news.utils.generation.get_summary_from_gemini', side_effect=summarizer.SummaryBusy('quota')):
+            data = self.client.post(url).json()
+        self.assertEqual((data['status'], data['provisional']), ('success', True))
+        self.assertIn('public transport', data['summary'])
+        self.article.refresh_from_db()
+        self.assertTrue(self.article.summary_provisional)
+
+        Article.objects.filter(pk=self.article.pk).update(audio_file='news_audio/aa/provisional.mp3')
+        with patch('news.utils.generation.get_summary_from_gemini', return_value='The LLM summary.') as gemini:
+            data = self.client.post(url).json()
+            self.assertEqual((data['summary'], data['provisional']), ('The LLM summary.', False))
+            self.client.post(url)
+        self.assertEqual(gemini.call_count, 1)
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.summary, self.article.summary_provisional), ('The LLM summary.', False))
+        self.assertFalse(self.article.audio_file)  # it voiced the provisional text
+
+    def test_failed_gemini_call_falls_back_to_extractive_summary(self):
+        with patch.object(summarizer, '_summarize', side_effect=summarizer.SummaryError('boom')):
+            summary = summarizer.get_summary_from_gemini(self.STORY, use_cache=False)
+        self.assertIn('public transport', summary)
+        self.assertNotIn('could not be generated', summary)
+
+
+    def test_short_article_gets_a_provisional_summary_not_a_placeholder(self):
+        short = self.STORY.split('\n')[0][:190]
+        Article.objects.filter(pk=self.article.pk).update(content=short)
+        with patch.object(summarizer, '_summarize') as gemini:
+            data = self.client.post(reverse('news:generate_summary', args=[self.article.pk])).json()
+            self.assertEqual(summarizer.summarize_batch([short, '']), [None, None])
+        gemini.assert_not_called()
+        self.assertEqual((data['status'], data['provisional']), ('success', True))
+        self.assertIn('public transport', data['summary'])
+        self.article.refresh_from_db()
+        self.assertTrue(self.article.summary_provisional)
+
+    def test_migration_clears_every_stored_placeholder(self):
+        migration = import_module('news.migrations.0031_clear_unavailable_summaries')
+        for placeholder in (
+            'Summary not available.', 'Summary could not be generated.',
+            'Summary could not be generated due to API rate limits.',
+        ):
+            with self.subTest(placeholder=placeholder):
+                Article.objects.filter(pk=self.article.pk).update(summary=placeholder, summary_provisional=False, audio_file='news_audio/x.mp3')
+                migration.clear_unavailable_summaries(apps, None)
+                self.article.refresh_from_db()
+                self.assertEqual((self.article.summary, self.article.audio_file.name), ('', ''))
+                self.assertFalse(generation.has_final_summary(self.article))
+
+
+@override_settings(SEARCH_BACKEND='database')
+class ArticleSearchTests(TestCase):
+    def setUp(self):
+        self.politics = Category.objects.create(name='Politics')
+        self.addCleanup(cache.clear)  # article_list is cached per URL
+        now = timezone.now()
+
+        def article(title, content, hours_old=1, summary=None):
+            a = Article.objects.create(
+                title=title, content=content, summary=summary, url=f'https://example.com/{title.replace(" ", "-")}',
+                published_at=now - timezone.timedelta(hours=hours_old), approved=True,
+            )
+            a.category.add(self.politics)
+            return a
+        self.headline = article('Elections called early', 'The vote will take place in spring.', hours_old=5)
+        self.mention = article('Budget debate', 'Opposition parties said elections should wait until autumn.', hours_old=1)
+        self.unrelated = article('Football final', 'The match ended in a draw after extra time.')
+
+    def titles(self, **params):
+        response = self.client.get(reverse('news:article_list'), {'q': 'election', **params})
+        return [a.title for a in response.context['articles']]
+
+    def test_search_is_ranked_by_relevance_and_stemmed(self):
+        # Title hits outrank body hits even though the body hit is newer; "election" matches "elections".
+        self.assertEqual(self.titles(), ['Elections called early', 'Budget debate'])
+        self.assertEqual(self.titles(sort_by='-published_at'), ['Budget debate', 'Elections called early'])
+
+    def test_search_composes_with_filters(self):
+        reader = User.objects.create_user(username='reader', password='password')
+        ArticleLike.objects.create(user=reader, article=self.mention)
+        self.assertEqual(self.titles(min_likes='1'), ['Budget debate'])
+        self.assertEqual(self.titles(category='Sport'), [])
+        self.assertEqual(self.titles(sort_by='most_popular_likes'), ['Budget debate', 'Elections called early'])
+
+    def test_index_follows_bulk_writes_and_updates(self):
+        Article.objects.bulk_create([Article(
+            title='Ingested', content='Snap elections announced overnight.', url='https://example.com/ingested',
+            published_at=timezone.now(), approved=True,
+        )])
+        Article.objects.filter(pk=self.unrelated.pk).update(summary='Players wore election-themed shirts.')
+        Article.objects.filter(pk=self.headline.pk).delete()
+        self.assertEqual(set(self.titles()), {'Budget debate', 'Ingested', 'Football final'})
+
+    def test_triggers_dropped_by_a_table_rebuild_are_restored_after_migrate(self):
+        from django.core.management.sql import emit_post_migrate_signal
+        if connection.vendor != 'sqlite':
+            self.skipTest('only SQLite drops triggers on a table rebuild')
+        with connection.cursor() as cursor:
+            for trigger in search.SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {trigger}")
+        Article.objects.filter(pk=self.unrelated.pk).update(title='Election football final')
+        self.assertEqual(self.titles(), ['Elections called early', 'Budget debate'])  # the index missed it
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        cache.clear()
+        self.assertIn('Election football final', self.titles())
+        self.assertFalse(search.restore_index())  # nothing left to restore
+
+    def test_query_syntax_is_never_passed_through(self):
+        for query in ['"election', 'election AND (', 'NEAR(', '***']:
+            response = self.client.get(reverse('news:article_list'), {'q': query})
+            self.assertEqual(response.status_code, 200)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'articles.idx')
+        settings_override = override_settings(SEARCH_BACKEND='index', SEARCH_INDEX_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)  # article_list is cached per URL
+
+        now = timezone.now()
+        self.headline = Article.objects.create(
+            title='Elections called early', content='The vote will take place in spring. ' * 5,
+            url='https://example.com/elections', published_at=now, approved=True,
+        )
+        self.mention = Article.objects.create(
+            title='Budget debate', content='Opposition parties said the election should wait until autumn.',
+            url='https://example.com/budget', published_at=now, approved=True,
+        )
+        Article.objects.create(
+            title='Election draft', content='Not published yet.', url='https://example.com/draft',
+            published_at=now, approved=False,
+        )
+
+    def test_varints_round_trip(self):
+        values = [0, 1, 127, 128, 300, 2 ** 20, 2 ** 35 + 5]
+        data, sizes = search_index.encode_varints(values)
+        self.assertEqual(list(sizes), [1, 1, 1, 2, 2, 3, 6])
+        self.assertEqual(list(search_index.decode_varints(data)), values)
+
+    def test_incremental_updates_reach_other_processes_through_the_file(self):
+        self.assertEqual(search_index.sync_index(), (2, 0, 0))
+        worker = search_index.SearchIndex(self.path)  # another process mapping the same file
+        worker.refresh()
+        total, hits = worker.search('election')  # the last word also matches as a prefix: "elections"
+        self.assertEqual((total, [pk for pk, _ in hits]), (2, [self.headline.pk, self.mention.pk]))
+        self.assertEqual(worker.search('elections')[0], 1)
+
+        writer = search_index.get_search_index()
+        writer.add(99, 'Snap elections announced', '', 'Overnight.')
+        writer.remove(self.mention.pk)
+        self.assertEqual([pk for pk, _ in writer.search('elections')[1]], [99, self.headline.pk])
+        self.assertEqual(worker.search('elections')[0], 1)  # not saved yet
+        writer.save()
+        self.assertEqual([pk for pk, _ in worker.search('elections')[1]], [99, self.headline.pk])
+        self.assertEqual(len(worker), 2)
+
+    def test_sync_reindexes_articles_edited_since_the_last_sync(self):
+        search_index.sync_index()
+        self.mention.title = 'Budget vote postponed'
+        self.mention.save()
+        Article.objects.filter(pk=self.headline.pk).update(approved=False, updated_at=timezone.now())
+        self.assertEqual(search_index.sync_index(), (0, 1, 1))
+        index = search_index.get_search_index()
+        self.assertEqual([pk for pk, _ in index.search('postponed')[1]], [self.mention.pk])
+        self.assertEqual(index.search('spring')[0], 0)
+        self.assertEqual(search_index.sync_index(), (0, 0, 0))
+
+    def test_articles_approved_in_the_admin_are_found_without_a_rebuild(self):
+        search_index.sync_index()
+        Article.objects.filter(title='Election draft').update(approved=True, updated_at=timezone.now())  # make_approved
+        response = self.client.get(reverse('news:article_list'), {'q': 'draft'})
+        self.assertEqual([a.title for a in response.context['articles']], ['Election draft'])
+        self.assertIn(Article.objects.get(title='Election draft').pk, search_index.get_search_index())
+
+    def test_articles_unapproved_in_the_admin_leave_the_counts_at_once(self):
+        search_index.sync_index()
+        Article.objects.filter(pk=self.mention.pk).update(approved=False, updated_at=timezone.now())  # make_pending
+        data = self.client.get('/api/articles/search/', {'q': 'election'}).json()
+        self.assertEqual((data['count'], [r['id'] for r in data['results']]), (1, [self.headline.pk]))
+        page = self.client.get(reverse('news:article_list'), {'q': 'election'}).context['page_obj']
+        self.assertEqual((page.paginator.count, [a.title for a in page]), (1, ['Elections called early']))
+        self.assertNotIn(self.mention.pk, search_index.get_search_index())
+
+        Article.objects.filter(pk=self.headline.pk).update(title='Vote called early', updated_at=timezone.now())
+        self.assertEqual(self.client.get('/api/articles/search/', {'q': 'vote'}).json()['count'], 1)
+
+    def test_search_uses_the_database_when_the_index_is_far_behind(self):
+        search_index.sync_index()
+        Article.objects.filter(title='Election draft').update(approved=True, updated_at=timezone.now())
+        Article.objects.filter(pk=self.mention.pk).update(title='Budget election debate', updated_at=timezone.now())
+        with override_settings(SEARCH_INDEX_CATCH_UP=1), self.assertLogs('news.utils.search_index', 'WARNING'):
+            self.assertIsNone(search.search_index_in_use())
+        response = self.client.get(reverse('news:article_list'), {'q': 'draft'})
+        self.assertEqual([a.title for a in response.context['articles']], ['Election draft'])
+
+    def test_frequent_words_alone_rank_their_head_like_the_whole_list(self):
+        with patch.object(search_index, 'HEAD_MIN_DF', 4), patch.object(search_index, 'HEAD_SIZE', 3):
+            index = search_index.SearchIndex(self.path)
+            for n in range(8):
+                index.add(n + 1, 'vote ' * (1 + n % 3), '', 'ballot ' * (n * 3))
+            index.save(replace=True)
+            self.assertEqual([index._vocab[term] for term in index._head_terms], ['ballot', 'vote'])
+
+            def ranked(query, limit):
+                total, hits = index.search(query, limit=limit)
+                return total, [(pk, round(score, 5)) for pk, score in hits]
+
+            def whole(query, limit):
+                with patch.object(search_index.SearchIndex, '_head', return_value=None):
+                    return ranked(query, limit)
+
+            self.assertEqual(ranked('vot', 2), whole('vot', 2))  # a prefix expanding to that one word too
+            index.remove(ranked('vote', 1)[1][0][0])
+            index.add(9, 'vote vote vote', '', '')
+            self.assertIsNotNone(index._head('vote', 2))
+            self.assertEqual(ranked('vote', 2), whole('vote', 2))
+            self.assertEqual(ranked('vote', 2)[1][0][0], 9)
+            self.assertIsNone(index._head('vote', 3))  # past what is left of the head: the whole list is ranked
+            self.assertEqual(ranked('vote', 3), whole('vote', 3))
+
+    def test_saves_append_to_the_journal_until_it_is_compacted(self):
+        search_index.sync_index()
+        stamp = os.stat(self.path).st_mtime_ns
+        writer = search_index.get_search_index()
+        writer.add(99, 'Snap elections announced', '', 'Overnight.')
+        writer.save()
+        self.assertEqual(os.stat(self.path).st_mtime_ns, stamp)  # only the journal was written
+        worker = search_index.SearchIndex(self.path)
+        worker.refresh()
+        self.assertEqual(worker.search('snap')[0], 1)
+
+        with override_settings(SEARCH_INDEX_MAX_LOG=1):
+            writer.add(100, 'Snap polls', '', 'Overnight.')
+            writer.save()
+        self.assertNotEqual(os.stat(self.path).st_mtime_ns, stamp)
+        with open(self.path + search_index.LOG_SUFFIX, 'rb') as f:
+            self.assertEqual(len(f.readlines()), 1)  # started over
+        self.assertEqual(worker.search('snap')[0], 2)
+        self.assertEqual(search_index.SearchIndex(self.path).search('snap')[0], 2)
+
+    def test_article_list_and_api_search_the_index(self):
+        search_index.sync_index()
+        response = self.client.get(reverse('news:article_list'), {'q': 'election'})
+        self.assertEqual([a.title for a in response.context['articles']], ['Elections called early', 'Budget debate'])
+        self.assertContains(response, 'said the <mark>election</mark> should')
+        response = self.client.get(reverse('news:article_list'), {'q': 'election', 'min_likes': '0', 'sort_by': 'most_popular_likes'})
+        self.assertEqual(len(response.context['articles']), 2)  # index hits compose with the annotation filters
+
+        data = self.client.get('/api/articles/search/', {'q': 'autumn elect'}).json()
+        self.assertEqual((data['count'], data['results'][0]['id']), (1, self.mention.pk))
+        self.assertIn('<mark>election</mark> should wait until <mark>autumn</mark>', data['results'][0]['snippet'])
+        self.assertEqual(self.client.get('/api/articles/search/').status_code, 400)
+
+    def _add_updates(self):
+        world = Category.objects.create(name='World')
+        for n in range(7):
+            Article.objects.create(
+                title=f'Election update {n}', content='Election news. ' * 5, url=f'https://example.com/update-{n}',
+                published_at=timezone.now() - timezone.timedelta(hours=n), approved=True,
+            ).category.add(world)
+        search_index.sync_index()
+
+    def test_filters_apply_before_ranking_and_paging(self):
+        self.mention.category.add(Category.objects.create(name='Business'))
+        self._add_updates()
+        self.assertEqual(search_index.get_search_index().search('election', limit=1, pks=[self.mention.pk])[1][0][0], self.mention.pk)
+
+        # The weakest match of all is still found once the category narrows the candidates.
+        response = self.client.get(reverse('news:article_list'), {'q': 'election', 'category': 'Business'})
+        self.assertEqual([a.title for a in response.context['articles']], ['Budget debate'])
+
+        response = self.client.get(reverse('news:article_list'), {'q': 'election', 'page': '2'})
+        page = response.context['page_obj']
+        self.assertEqual((page.paginator.count, len(page)), (9, 3))
+        self.assertEqual(page[-1].title, 'Budget debate')
+        self.assertTrue(all(a.search_rank > 0 for a in page))
+        newest = self.client.get(reverse('news:article_list'), {'q': 'election', 'category': 'World', 'sort_by': '-published_at'})
+        self.assertEqual([a.title for a in newest.context['articles']], [f'Election update {n}' for n in range(6)])
+
+    def test_unfiltered_search_reads_no_pks_and_many_matches_are_walked_in_order(self):
+        self._add_updates()
+        restrictions = []
+        search_in_index = search_index.SearchIndex.search
+
+        def spy(index, query, *args, **kwargs):
+            restrictions.append(kwargs.get('pks'))
+            return search_in_index(index, query, *args, **kwargs)
+
+        with patch.object(search_index.SearchIndex, 'search', spy):
+            page = self.client.get(reverse('news:article_list'), {'q': 'election', 'page': '2'}).context['page_obj']
+        self.assertEqual((page.paginator.count, page[-1].title), (9, 'Budget debate'))
+        self.assertEqual(set(restrictions), {None})  # the index holds exactly the approved articles
+
+        with patch.object(search, 'PK_LIST_LIMIT', 2), patch.object(search, 'ORDERED_CHUNK', 3):
+            newest = self.client.get(reverse('news:article_list'), {'q': 'election', 'category': 'World', 'sort_by': '-published_at'})
+            oldest = self.client.get(reverse('news:article_list'), {'q': 'election', 'sort_by': 'published_at', 'page': '2'})
+        self.assertEqual(newest.context['page_obj'].paginator.count, 7)
+        self.assertEqual([a.title for a in newest.context['articles']], [f'Election update {n}' for n in range(6)])
+        page = oldest.context['page_obj']
+        self.assertEqual((page.paginator.count, page[-1].title), (9, 'Election update 0'))
+        self.assertEqual({a.title for a in page[:2]}, {'Elections called early', 'Budget debate'})
+
+    def test_ingestion_adds_published_articles_once_the_index_exists(self):
+        article = Article.objects.create(
+            title='Election night', content='Results arrive.', url='https://example.com/night',
+            published_at=timezone.now(), approved=True,
+        )
+        self.assertIsNone(search_index.update_index())  # not built: the database index answers
+        data = self.client.get('/api/articles/search/', {'q': 'night'}).json()
+        self.assertEqual((data['count'], data['results'][0]['id']), (1, article.pk))
+
+        search_index.sync_index()
+        self.assertIn(article.pk, search_index.get_search_index())
+        later = Article.objects.create(
+            title='Election recount', content='Counting again.', url='https://example.com/recount',
+            published_at=timezone.now(), approved=True,
+        )
+        runs._update_search_index([later], IngestReport())
+        self.assertEqual(search_index.get_search_index().search('recount')[1][0][0], later.pk)
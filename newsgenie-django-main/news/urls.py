@@ -14,7 +14,9 @@ urlpatterns = [
     path('comment/<int:pk>/toggle-reaction/', views.toggle_comment_reaction, name='toggle_comment_reaction'),
 
     path('article/<int:pk>/generate-summary/', views.generate_summary_view, name="generate_summary"),
+    path('article/<int:pk>/summary-status/', views.summary_status_view, name="summary_status"),
     path('article/<int:pk>/generate-audio/', views.generate_audio_view, name="generate_audio"),
+    path('article/<int:pk>/audio-status/', views.audio_status_view, name="audio_status"),
     path('article/<int:pk>/like-toggle/', views.toggle_article_like, name="like_toggle"),
     path('article/<int:pk>/bookmark-toggle/', views.toggle_article_bookmark, name="bookmark_toggle"),
     path('track-metrics/', views.track_article_metrics, name="track_metrics"),
@@ -23,4 +25,5 @@ urlpatterns = [
     path('recommendations/', views.personalized_recommendations, name="recommendations"),
     path('history/', views.reading_history, name="history"),
     path('scraper/', views.run_scraper_view, name="scraper"),
+    path('scraper/runs/<int:run_id>/status/', views.scraper_status_api, name="scraper_status"),
 ]
\ No newline at end of file
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.utils import timezone
+
+from news.models import RawPage
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used when zstandard is not installed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZSTD_SUFFIX = '.html.zst'
+ZLIB_SUFFIX = '.html.z'
+
+
+def archive_dir():
+    return str(getattr(settings, 'HTML_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'html_archive')))
+
+
+def _path(content_hash, suffix):
+    return os.path.join(archive_dir(), content_hash[:2], content_hash + suffix)
+
+
+def _compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ZSTD_SUFFIX
+    return zlib.compress(data, 6), ZLIB_SUFFIX
+
+
+def save_html(html):
+    """
+    Writes page bytes to the archive under their sha256 (identical pages are
+    stored once). Returns {'content_hash', 'size', 'compressed_size'}, or None
+    if the archive could not be written: archiving never fails a fetch.
+    """
+    content_hash = hashlib.sha256(html).hexdigest()
+    try:
+        for suffix in (ZSTD_SUFFIX, ZLIB_SUFFIX):
+            path = _path(content_hash, suffix)
+            if os.path.exists(path):
+                return {'content_hash': content_hash, 'size': len(html), 'compressed_size': os.path.getsize(path)}
+        data, suffix = _compress(html)
+        path = _path(content_hash, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a half-written file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {'content_hash': content_hash, 'size': len(html), 'compressed_size': len(data)}
+    except OSError as e:
+        logger.warning(f"Could not archive HTML {content_hash[:12]}: {e}")
+        return None
+
+
+def record(url, saved, encoding=None, article=None, fetched_at=None):
+    """Indexes an archived download by URL and fetch time. Call under the pipeline's db guard."""
+    return RawPage.objects.create(
+        url=url,
+        content_hash=saved['content_hash'],
+        encoding=encoding or '',
+        size=saved['size'],
+        compressed_size=saved['compressed_size'],
+        fetched_at=fetched_at or timezone.now(),
+        article=article,
+    )
+
+
+def record_many(pages, fetched_at=None):
+    """Bulk form of record for (url, saved, article) tuples."""
+    fetched_at = fetched_at or timezone.now()
+    return RawPage.objects.bulk_create([
+        RawPage(
+            url=url, content_hash=saved['content_hash'], encoding=saved.get('encoding') or '',
+            size=saved['size'], compressed_size=saved['compressed_size'], fetched_at=fetched_at, article=article,
+        )
+        for url, saved, article in pages
+    ])
+
+
+def load_html(content_hash):
+    """The original page bytes for a content hash. Raises FileNotFoundError when it was never archived."""
+    zstd_path = _path(content_hash, ZSTD_SUFFIX)
+    if os.path.exists(zstd_path):
+        if zstandard is None:
+            raise RuntimeError(f"{zstd_path} needs the zstandard package to be read")
+        with open(zstd_path, 'rb') as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+    with open(_path(content_hash, ZLIB_SUFFIX), 'rb') as f:
+        return zlib.decompress(f.read())
+
+
+def latest_page(url):
+    """Most recent archived download of url, or None."""
+    return RawPage.objects.filter(url=url).order_by('-fetched_at').first()
@@ -0,0 +1,179 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from news.models import Article
+from news.utils.summary_cache import normalize_text
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: stories sharing about half their shingles collide in at least one band
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_rng = random.Random(20240601)  # fixed seed: signatures are stored and must stay comparable
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text):
+    words = re.findall(r'\w+', normalize_text(text))
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """
+    MinHash signature of the word 3-shingles of `text`: NUM_PERM 32-bit
+    minimums packed into bytes, ready for Article.content_signature.
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in shingles(text)
+    ] or [0]
+    return array('I', (min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in _PERMUTATIONS)).tobytes()
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two texts behind the signatures."""
+    a, b = array('I', sig_a), array('I', sig_b)
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _band_keys(sig):
+    width = ROWS * 4
+    return [hash((band, sig[band * width:(band + 1) * width])) for band in range(BANDS)]
+
+
+class MinHashIndex:
+    """
+    In-memory LSH index over recent canonical articles. Each signature is cut
+    into BANDS bands and every band is one dict key, so a lookup is BANDS dict
+    hits plus a similarity check on the few articles that collide, however
+    many articles are indexed. Only articles published in the last
+    `window_days` are kept: rewrites of a story arrive within days of it.
+    """
+
+    def __init__(self, threshold=0.6, window_days=14):
+        self.threshold = threshold
+        self.window = timedelta(days=window_days)
+        self.buckets = {}
+        self.entries = {}  # article id -> (published_at, signature)
+        self.max_pk = 0
+        self._evicted_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, article_id, sig, published_at):
+        with self._lock:
+            if article_id in self.entries:
+                return
+            self.entries[article_id] = (published_at, sig)
+            for key in _band_keys(sig):
+                self.buckets.setdefault(key, []).append(article_id)
+
+    def discard(self, article_id):
+        with self._lock:
+            self._discard(article_id)
+
+    def _discard(self, article_id):
+        entry = self.entries.pop(article_id, None)
+        if entry is None:
+            return
+        for key in _band_keys(entry[1]):
+            ids = self.buckets.get(key)
+            if ids and article_id in ids:
+                ids.remove(article_id)
+                if not ids:
+                    del self.buckets[key]
+
+    def find(self, sig):
+        """Id of the most similar indexed article at or above the threshold, or None."""
+        best, best_score = None, self.threshold
+        with self._lock:
+            candidates = {article_id for key in _band_keys(sig) for article_id in self.buckets.get(key, ())}
+            for article_id in sorted(candidates):
+                score = similarity(sig, self.entries[article_id][1])
+                if score > best_score or (best is None and score == best_score):
+                    best, best_score = article_id, score
+        return best
+
+    def evict(self, cutoff):
+        with self._lock:
+            for article_id in [i for i, (published_at, _) in self.entries.items() if published_at < cutoff]:
+                self._discard(article_id)
+
+    def sync(self):
+        """Adds canonical articles saved since the last sync (by this or any other process)."""
+        cutoff = timezone.now() - self.window
+        if time.monotonic() - self._evicted_at > 3600:
+            self.evict(cutoff)
+            self._evicted_at = time.monotonic()
+        rows = Article.objects.filter(
+            pk__gt=self.max_pk, canonical__isnull=True, content_signature__isnull=False, published_at__gte=cutoff
+        ).order_by('pk').values_list('pk', 'content_signature', 'published_at')
+        for article_id, sig, published_at in rows.iterator():
+            self.add(article_id, bytes(sig), published_at)
+            self.max_pk = article_id
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index, filled from the database on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MinHashIndex(
+                threshold=getattr(settings, 'DEDUP_SIMILARITY_THRESHOLD', 0.6),
+                window_days=getattr(settings, 'DEDUP_WINDOW_DAYS', 14),
+            )
+        return _index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def find_canonicals(signatures):
+    """
+    For each content signature returns its canonical Article, the position of an earlier signature in the same list that it
+    duplicates (an int), or None if the story is new. One index sync and one
+    query for the whole batch.
+    """
+    index = get_index()
+    index.sync()
+    found = [index.find(sig) for sig in signatures]
+    existing = Article.objects.in_bulk([article_id for article_id in found if article_id is not None])
+    results, batch_canonicals = [], []
+    for position, (sig, article_id) in enumerate(zip(signatures, found)):
+        if article_id is not None and article_id in existing:
+            results.append(existing[article_id])
+            continue
+        if article_id is not None:
+            index.discard(article_id)  # deleted since it was indexed
+        match = next((i for i in batch_canonicals if similarity(sig, signatures[i]) >= index.threshold), None)
+        if match is None:
+            batch_canonicals.append(position)
+        results.append(match)
+    return results
+
+
+def remember(article):
+    """Indexes a freshly stored canonical article without waiting for the next sync."""
+    if article.canonical_id is None and article.content_signature:
+        get_index().add(article.pk, bytes(article.content_signature), article.published_at)
@@ -0,0 +1,161 @@
+import threading
+from urllib.parse import urlsplit
+
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+JUNK_TAGS = ('script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe')
+MIN_BLOCK_CHARS = 40
+MIN_BLOCKS = 3
+MAX_BLOCKS = 12
+
+# The fallback extractor's selectors in priority order, each described as
+# (css, kind, value) so all of them can be matched in one walk of the tree:
+#   'attr'     element has attribute value[0] == value[1]
+#   'class'    element has the class
+#   'in-class' <p> inside an element with the class
+#   'in-tag'   <p> inside an element with the tag
+#   'tag'      element has the tag
+RULES = (
+    ('[data-component="text-block"]', 'attr', ('data-component', 'text-block')),
+    ('.ssrcss-1q0x1qg-Paragraph', 'class', 'ssrcss-1q0x1qg-Paragraph'),
+    ('.story-body__inner p', 'in-class', 'story-body__inner'),
+    ('.zn-body__paragraph', 'class', 'zn-body__paragraph'),
+    ('.el__leafmedia--sourced-paragraph', 'class', 'el__leafmedia--sourced-paragraph'),
+    ('.StandardArticleBody_body p', 'in-class', 'StandardArticleBody_body'),
+    ('article p', 'in-tag', 'article'),
+    ('.article-content p', 'in-class', 'article-content'),
+    ('.entry-content p', 'in-class', 'entry-content'),
+    ('.post-content p', 'in-class', 'post-content'),
+    ('p', 'tag', 'p'),
+)
+_COMPILED = [CSSSelector(css) for css, _, _ in RULES]
+_CONTAINER_CLASSES = {value for _, kind, value in RULES if kind == 'in-class'}
+_CONTAINER_TAGS = {value for _, kind, value in RULES if kind == 'in-tag'}
+
+_winners = {}  # domain -> index into RULES that produced the text last time
+_winners_lock = threading.Lock()
+MAX_DOMAINS = 1000
+
+
+def selector_winners():
+    """{domain: css selector} remembered so far."""
+    with _winners_lock:
+        return {domain: RULES[index][0] for domain, index in _winners.items()}
+
+
+def reset_winners():
+    with _winners_lock:
+        _winners.clear()
+
+
+def _domain(url):
+    host = (urlsplit(url).hostname or '') if url else ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def _block_text(element):
+    return ' '.join(element.text_content().split())
+
+
+def _blocks_from(elements):
+    blocks = []
+    for element in elements:
+        text = _block_text(element)
+        if len(text) > MIN_BLOCK_CHARS:
+            blocks.append(text)
+            if len(blocks) == MAX_BLOCKS:
+                break
+    return blocks
+
+
+def _score_rules(root):
+    """
+    One pre-order walk over the tree. For every rule, counts the elements it
+    matches and keeps the first MAX_BLOCKS texts longer than MIN_BLOCK_CHARS.
+    Container membership is inherited from the parent, so no element is
+    visited twice.
+    """
+    counts = [0] * len(RULES)
+    blocks = [[] for _ in RULES]
+    inside = {}  # element -> (container classes, container tags) of its ancestors
+    for element in root.iter(etree.Element):
+        parent = element.getparent()
+        classes, tags = inside.get(parent, (frozenset(), frozenset()))
+        own_classes = set((element.get('class') or '').split())
+        tag = element.tag
+
+        matched = []
+        for index, (_, kind, value) in enumerate(RULES):
+            if kind == 'attr':
+                hit = element.get(value[0]) == value[1]
+            elif kind == 'class':
+                hit = value in own_classes
+            elif kind == 'in-class':
+                hit = tag == 'p' and value in classes
+            elif kind == 'in-tag':
+                hit = tag == 'p' and value in tags
+            else:
+                hit = tag == value
+            if hit:
+                matched.append(index)
+
+        if matched:
+            text = None
+            for index in matched:
+                counts[index] += 1
+                if len(blocks[index]) < MAX_BLOCKS:
+                    if text is None:
+                        text = _block_text(element)
+                    if len(text) > MIN_BLOCK_CHARS:
+                        blocks[index].append(text)
+
+        own_containers = own_classes & _CONTAINER_CLASSES
+        if own_containers or tag in _CONTAINER_TAGS:
+            inside[element] = (classes | own_containers, tags | ({tag} & _CONTAINER_TAGS))
+        elif parent in inside:
+            inside[element] = inside[parent]
+    return counts, blocks
+
+
+def extract_article_text(html, url=None):
+    """
+    Article body text from a page, or None when fewer than 200 characters
+    were found. Parses once with lxml, drops junk tags in one pass, then takes
+    the first selector (in RULES order) with at least MIN_BLOCKS matches. The
+    winning selector is remembered per domain and tried first next time.
+    """
+    if not html:
+        return None
+    try:
+        root = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(root, *JUNK_TAGS, with_tail=False)
+
+    domain = _domain(url)
+    with _winners_lock:
+        cached = _winners.get(domain)
+    if cached is not None:
+        matches = _COMPILED[cached](root)
+        if len(matches) >= MIN_BLOCKS:
+            blocks = _blocks_from(matches)
+            if blocks:
+                return _join(blocks)
+
+    counts, blocks = _score_rules(root)
+    for index in range(len(RULES)):
+        if counts[index] >= MIN_BLOCKS and blocks[index]:
+            if domain:
+                with _winners_lock:
+                    if len(_winners) >= MAX_DOMAINS:
+                        _winners.clear()
+                    _winners[domain] = index
+            return _join(blocks[index])
+    return None
+
+
+def _join(blocks):
+    text = '\n\n'.join(blocks)
+    return text if len(text) > 200 else None
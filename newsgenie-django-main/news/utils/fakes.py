@@ -0,0 +1,80 @@
+# Offline stand-ins for the Gemini client and gTTS, used by the tests and the
+# ingest benchmark (benchmark_ingest) so neither needs network access or quota.
+import json
+import random
+import re
+import threading
+import time
+
+import google.api_core.exceptions
+
+
+class FakeModelClient:
+    """
+    Offline stand-in for GeminiClient. Sleeps `latency` seconds per call and
+    raises ResourceExhausted for the first `fail_times` calls and then at
+    `error_rate`, like a model that keeps running out of quota.
+    """
+
+    def __init__(self, latency=0.0, fail_times=0, error_rate=0.0, seed=None, malformed_batches=False):
+        self.latency = latency
+        self.fail_times = fail_times
+        self.error_rate = error_rate
+        self.malformed_batches = malformed_batches
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_times or self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise google.api_core.exceptions.ResourceExhausted("Simulated quota exceeded")
+        articles = re.findall(r'^=== ARTICLE (\w+) ===\n(.*?)(?=\n\n=== ARTICLE |\Z)', prompt, re.S | re.M)
+        if articles:
+            if self.malformed_batches:
+                return "Here are your summaries: a1 - ..."
+            return json.dumps({article_id: f"Summary: {body.strip()[:200]}" for article_id, body in articles})
+        body = prompt.rsplit('---', 1)[-1].strip()
+        return f"Summary: {body[:200]}"
+
+
+class FakeGTTS:
+    """
+    Offline stand-in for gTTS, patched over `gTTS` by tests and the ingest
+    benchmark. Records the text of every save() in `calls`, holds each save()
+    until `gate` (when set) is released, sleeps `latency` seconds and fails
+    at `error_rate`. Call reset() before use: the settings are class-wide.
+    """
+    calls = []
+    gate = None
+    latency = 0.0
+    error_rate = 0.0
+    _random = random.Random(0)
+    _lock = threading.Lock()
+
+    def __init__(self, text, lang='en', slow=False):
+        self.text = text
+
+    @classmethod
+    def reset(cls, latency=0.0, error_rate=0.0, seed=0):
+        cls.calls, cls.gate = [], None
+        cls.latency, cls.error_rate = latency, error_rate
+        cls._random = random.Random(seed)
+
+    def save(self, path):
+        cls = type(self)
+        if cls.gate is not None:
+            cls.gate.wait(5)
+        with cls._lock:
+            fail = cls._random.random() < cls.error_rate
+            cls.calls.append(self.text)
+        if cls.latency:
+            time.sleep(cls.latency)
+        if fail:
+            raise ConnectionError("Simulated TTS failure")
+        with open(path, 'wb') as f:
+            f.write(b'ID3' + self.text.encode('utf-8'))
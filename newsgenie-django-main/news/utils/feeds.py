@@ -0,0 +1,167 @@
+import hashlib
+import logging
+from contextlib import nullcontext
+
+from datetime import timedelta
+
+import feedparser
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from news.models import Feed
+from news.utils import http
+
+logger = logging.getLogger(__name__)
+
+
+def hash_entries(entries):
+    """Order-sensitive fingerprint of a feed's entry set, built from entry ids (or links)."""
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update((entry.get('id') or entry.get('link') or '').encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def download_feed(feed_url, etag=None, modified=None):
+    """
+    Conditional GET of feed_url through the shared HTTP session, parsed with
+    feedparser. Like feedparser.parse(url, etag=, modified=), the result
+    carries `status`, `etag` and `modified`, and network errors come back as a
+    bozo result with no entries.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    try:
+        response = http.get(feed_url, headers=headers)
+    except requests.RequestException as e:
+        return feedparser.FeedParserDict(entries=[], bozo=1, bozo_exception=e)
+
+    if response.status_code == 304:
+        return feedparser.FeedParserDict(entries=[], status=304)
+    feed = feedparser.parse(response.content, response_headers={k.lower(): v for k, v in response.headers.items()})
+    feed['status'] = response.status_code
+    feed['href'] = response.url
+    if response.status_code >= 400:
+        feed['bozo'] = 1
+        feed['bozo_exception'] = requests.HTTPError(f"HTTP {response.status_code}")
+    if response.headers.get('ETag'):
+        feed['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        feed['modified'] = response.headers['Last-Modified']
+    return feed
+
+
+def _schedule_settings():
+    return {
+        'min': getattr(settings, 'FEED_MIN_INTERVAL', 300),
+        'max': getattr(settings, 'FEED_MAX_INTERVAL', 86400),
+        'target': getattr(settings, 'FEED_TARGET_NEW_PER_POLL', 3),
+        'max_backoff': getattr(settings, 'FEED_MAX_BACKOFF', 86400),
+    }
+
+
+def next_interval(current, new_entries):
+    """
+    Poll interval after a poll that found `new_entries` new articles. The
+    ideal interval yields FEED_TARGET_NEW_PER_POLL new entries per poll at the
+    observed rate (an empty poll stretches it by half); the result moves
+    halfway towards it, within FEED_MIN_INTERVAL..FEED_MAX_INTERVAL.
+    """
+    options = _schedule_settings()
+    if new_entries > 0:
+        ideal = current * options['target'] / new_entries
+    else:
+        ideal = current * 1.5
+    return int(min(options['max'], max(options['min'], (current + ideal) / 2)))
+
+
+def failure_backoff(feed):
+    """Delay before retrying a failing feed: its interval doubled per consecutive failure, capped."""
+    return min(_schedule_settings()['max_backoff'], feed.poll_interval * 2 ** feed.error_streak)
+
+
+def due_feeds(now=None):
+    """Active feeds whose next poll is due."""
+    now = now or timezone.now()
+    return Feed.objects.filter(is_active=True).filter(Q(next_poll_at__isnull=True) | Q(next_poll_at__lte=now))
+
+
+def record_new_entries(feed, new_entries, db_guard=nullcontext):
+    """Adapts the feed's interval to the entries its poll produced and schedules the next poll."""
+    now = timezone.now()
+    feed.poll_interval = next_interval(feed.poll_interval, new_entries)
+    feed.next_poll_at = now + timedelta(seconds=feed.poll_interval)
+    with db_guard():
+        Feed.objects.filter(pk=feed.pk).update(poll_interval=feed.poll_interval, next_poll_at=feed.next_poll_at)
+
+
+def _record_failure(feed, error, db_guard):
+    now = timezone.now()
+    feed.error_streak += 1
+    feed.last_failure_at = now
+    feed.last_error = str(error)[:2000]
+    feed.next_poll_at = now + timedelta(seconds=failure_backoff(feed))
+    with db_guard():
+        feed.save(update_fields=['last_polled_at', 'error_streak', 'last_failure_at', 'last_error', 'next_poll_at'])
+
+
+def poll_feed(feed_url, force=False, db_guard=nullcontext):
+    """
+    Downloads feed_url with a conditional GET (If-None-Match / If-Modified-Since).
+    Returns the parsed feed, or None when the server answered 304, the poll
+    failed, or the entry set is identical to the one seen on the previous
+    poll. `force` ignores the stored state and always returns the feed.
+    `db_guard` is entered around the database reads and writes, so concurrent
+    callers can serialize them.
+
+    The feed's schedule is updated here for polls that yield nothing (a
+    failure backs off, an empty poll stretches the interval); when a feed is
+    returned the caller reports its new entries with record_new_entries().
+    """
+    with db_guard():
+        state, _ = Feed.objects.get_or_create(url=feed_url)
+
+    if force:
+        feed = download_feed(feed_url)
+    else:
+        feed = download_feed(feed_url, etag=state.etag or None, modified=state.last_modified or None)
+
+    state.last_polled_at = timezone.now()
+
+    if feed.get('bozo') and not feed.entries and feed.get('status') != 304:
+        # A network or parse failure: keep the old validators so the next poll retries.
+        logger.warning(f"Feed {feed_url} could not be read: {feed.get('bozo_exception')}")
+        _record_failure(state, feed.get('bozo_exception') or 'unreadable feed', db_guard)
+        return None
+
+    state.error_streak = 0
+    state.last_success_at = state.last_polled_at
+    state.last_error = ''
+
+    if feed.get('status') == 304:
+        logger.info(f"Feed {feed_url} not modified (304), skipping.")
+        with db_guard():
+            state.save(update_fields=['last_polled_at', 'error_streak', 'last_success_at', 'last_error'])
+        record_new_entries(state, 0, db_guard)
+        return None
+
+    entries_hash = hash_entries(feed.entries)
+    unchanged = entries_hash == state.entries_hash
+
+    state.etag = feed.get('etag', '') or ''
+    state.last_modified = feed.get('modified', '') or ''
+    state.entries_hash = entries_hash
+    with db_guard():
+        state.save()
+
+    if unchanged and not force:
+        logger.info(f"Feed {feed_url} returned the same entries as last time, skipping.")
+        record_new_entries(state, 0, db_guard)
+        return None
+    return feed
@@ -0,0 +1,98 @@
+# Generation of one article's summary or audio outside the ingestion
+# pipeline: on demand from the web views and ahead of readers by
+# pregeneration (news.utils.pregen). Both go through the same single flight,
+# so an article is never summarized or voiced twice at once.
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from news.models import Article
+from news.utils import singleflight, tts
+from news.utils.extractive import extractive_summary
+from news.utils.scraper import SummaryError, get_full_article_text, get_summary_from_gemini
+
+
+def summary_flight(article):
+    return f"summary:{article.pk}"
+
+
+def has_final_summary(article):
+    return bool(article.summary) and not article.summary_provisional
+
+
+def summarize_once(article, max_wait=None):
+    """
+    Summarizes `article` with the LLM and saves the summary, replacing a
+    provisional one in place, unless another request is already doing so:
+    then waits up to SINGLEFLIGHT_WAIT seconds for it. Returns the summary,
+    or None while the other request is still working. Raises SummaryBusy /
+    SummaryError like get_summary_from_gemini; waits for Gemini quota up to
+    `max_wait` seconds (default GEMINI_WEB_MAX_WAIT).
+    """
+    flight = summary_flight(article)
+    token = singleflight.claim(flight)
+    if token is None:
+        finished = singleflight.wait(flight, getattr(settings, 'SINGLEFLIGHT_WAIT', 5))
+        article.refresh_from_db(fields=['summary', 'summary_provisional', 'audio_file'])
+        if has_final_summary(article) or not finished:
+            return article.summary if has_final_summary(article) else None
+        token = singleflight.claim(flight)  # the other request failed: try once ourselves
+        if token is None:
+            return None
+    try:
+        # a flight that ended just before ours began
+        article.refresh_from_db(fields=['summary', 'summary_provisional', 'audio_file'])
+        if has_final_summary(article):
+            return article.summary
+        full_content = article.content or get_full_article_text(article.url)
+        if not full_content:
+            raise SummaryError("Could not retrieve full article content to generate summary.")
+        # Never hold a web worker for minutes of rate-limit backoff: give up after GEMINI_WEB_MAX_WAIT.
+        summary_text = get_summary_from_gemini(
+            full_content, raise_on_failure=True,
+            max_wait=max_wait if max_wait is not None else settings.GEMINI_WEB_MAX_WAIT,
+        )
+        if not summary_text:
+            raise SummaryError("Summary generation failed.")
+        # Only these columns: a full save() would overwrite fields other requests just set.
+        fields = {'summary': summary_text, 'summary_provisional': False, 'updated_at': timezone.now()}
+        if article.summary_provisional and article.audio_file:
+            fields['audio_file'] = ''  # it voiced the provisional text; the new summary is voiced afresh
+        Article.objects.filter(pk=article.pk).update(**fields)
+        article.summary, article.summary_provisional = summary_text, False
+        if 'audio_file' in fields:
+            article.audio_file.name = ''
+        return summary_text
+    finally:
+        singleflight.release(flight, token)
+
+
+def provisional_summary(article):
+    """
+    The article's provisional summary, extracting (and saving) one from its
+    content if it has no summary at all. '' when the content has no usable
+    sentences. Runs in milliseconds and needs no network.
+    """
+    if article.summary:
+        return article.summary
+    summary_text = extractive_summary(article.content)
+    if summary_text:
+        # Only if still empty: never replaces a summary that arrived meanwhile.
+        Article.objects.filter(pk=article.pk).filter(Q(summary__isnull=True) | Q(summary='')).update(
+            summary=summary_text, summary_provisional=True, updated_at=timezone.now(),
+        )
+        article.summary, article.summary_provisional = summary_text, True
+    return summary_text
+
+
+def voice_article(article):
+    """
+    Voices the article's summary and attaches the file (blocking; shares the
+    TTS pool and its single flight with the web views). Returns the storage
+    name, or None when TTS failed.
+    """
+    name = tts.generate_audio(article.summary)
+    if name:
+        Article.objects.filter(pk=article.pk).update(audio_file=name)
+        article.audio_file.name = name
+    return name
@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36'
+
+_session = None
+_session_lock = threading.Lock()
+_stats = defaultdict(lambda: {
+    'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'new_connections': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+})
+_stats_lock = threading.Lock()
+
+
+def _build_session():
+    retries = Retry(
+        total=getattr(settings, 'HTTP_RETRIES', 2),
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    pool_size = getattr(settings, 'HTTP_POOL_MAXSIZE', 10)
+    # pool_connections = number of hosts kept, pool_maxsize = keep-alive connections per host
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=pool_size, max_retries=retries, pool_block=False)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': getattr(settings, 'HTTP_USER_AGENT', DEFAULT_USER_AGENT),
+        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Language': 'en-US,en;q=0.9',
+    })
+    return session
+
+
+def get_session():
+    """The process-wide requests.Session: keep-alive pools per host, retries and compression."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def reset_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+    with _stats_lock:
+        _stats.clear()
+
+
+def _connection_count(session, url):
+    """Connections the urllib3 pools for url's host have opened so far."""
+    parts = urlsplit(url)
+    try:
+        pools = session.get_adapter(url).poolmanager.pools
+        return sum(
+            pool.num_connections for pool in (pools.get(key) for key in pools.keys())
+            if pool is not None and pool.host == parts.hostname and pool.scheme == parts.scheme
+        )
+    except Exception:
+        return 0
+
+
+def get(url, timeout=None, **kwargs):
+    """
+    GET through the shared session. Records latency, body bytes, urllib3
+    retries and whether a new TCP/TLS connection had to be opened for the host.
+    Raises requests exceptions like requests.get; callers keep their own error handling.
+    """
+    session = get_session()
+    host = urlsplit(url).hostname or ''
+    timeout = timeout or getattr(settings, 'HTTP_TIMEOUT', (5, 15))
+    opened_before = _connection_count(session, url)
+    started = time.monotonic()
+    error = False
+    received = retries = 0
+    try:
+        response = session.get(url, timeout=timeout, **kwargs)
+        if not kwargs.get('stream'):
+            received = len(response.content)
+        retry_state = getattr(response.raw, 'retries', None)
+        retries = len(retry_state.history) if retry_state is not None else 0
+        return response
+    except requests.RequestException:
+        error = True
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        opened = max(_connection_count(session, url) - opened_before, 0)
+        with _stats_lock:
+            entry = _stats[host]
+            entry['requests'] += 1
+            entry['errors'] += int(error)
+            entry['retries'] += retries
+            entry['bytes'] += received
+            # Approximate under concurrency: another thread may open a connection to the same host meanwhile.
+            entry['new_connections'] += opened
+            entry['seconds'] += elapsed
+            entry['max_seconds'] = max(entry['max_seconds'], elapsed)
+
+
+def http_stats():
+    """
+    {host: {'requests', 'errors', 'retries', 'bytes', 'new_connections',
+    'reused_connections', 'avg_ms', 'max_ms'}} for every host requested since start-up.
+    """
+    with _stats_lock:
+        return {
+            host: {
+                'requests': entry['requests'],
+                'errors': entry['errors'],
+                'retries': entry['retries'],
+                'bytes': entry['bytes'],
+                'new_connections': entry['new_connections'],
+                'reused_connections': max(entry['requests'] - entry['new_connections'], 0),
+                'avg_ms': round(entry['seconds'] * 1000 / entry['requests'], 1) if entry['requests'] else 0.0,
+                'max_ms': round(entry['max_seconds'] * 1000, 1),
+            }
+            for host, entry in sorted(_stats.items())
+        }
@@ -0,0 +1,111 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from news.models import RunLock
+
+logger = logging.getLogger(__name__)
+
+# Held by whoever queues feeds and works the ingestion queue: the scheduler, fetch_articles or the scraper view.
+INGEST_LOCK = 'ingest'
+
+
+class LockHeld(Exception):
+    """Raised when a lease is owned by another process."""
+
+
+def acquire(name, owner, ttl):
+    """
+    Takes the lease `name` for `ttl` seconds if it is free, expired or already
+    ours. One compare-and-set UPDATE, so two nodes can never both succeed.
+    """
+    now = timezone.now()
+    RunLock.objects.get_or_create(name=name)
+    taken = RunLock.objects.filter(Q(owner='') | Q(owner=owner) | Q(expires_at__lte=now), name=name).update(
+        owner=owner, acquired_at=now, expires_at=now + timedelta(seconds=ttl),
+    )
+    return taken == 1
+
+
+def renew(name, owner, ttl):
+    """Extends a lease we hold. Returns False if it expired and another process took it."""
+    return RunLock.objects.filter(name=name, owner=owner).update(
+        expires_at=timezone.now() + timedelta(seconds=ttl),
+    ) == 1
+
+
+def release(name, owner):
+    RunLock.objects.filter(name=name, owner=owner).update(owner='', expires_at=timezone.now())
+
+
+def discard(name, owner):
+    """Releases a lease we hold by deleting its row: for short-lived, per-key leases that are rarely taken twice."""
+    RunLock.objects.filter(name=name, owner=owner).delete()
+
+
+def holder(name):
+    """Owner of an unexpired lease `name`, or None when it is free."""
+    lock = RunLock.objects.filter(name=name, expires_at__gt=timezone.now()).exclude(owner='').first()
+    return lock.owner if lock else None
+
+
+class Lease:
+    """
+    Context manager that holds a RunLock for the duration of a block and
+    renews it from a background thread every ttl/3 seconds. `on_lost` is
+    called if a renewal finds the lease taken over, so the holder can wind
+    down instead of working alongside the new owner.
+    """
+
+    def __init__(self, name, owner, ttl=None, on_lost=None):
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl or getattr(settings, 'INGEST_LOCK_TTL', 120)
+        self.on_lost = on_lost
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Takes the lease and starts renewing it. Raises LockHeld if another process owns it."""
+        if not acquire(self.name, self.owner, self.ttl):
+            raise LockHeld(f"'{self.name}' is held by {holder(self.name) or 'another process'}")
+        self._thread = threading.Thread(target=self._heartbeat, name=f'lease-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops renewing and releases the lease. May be called from another thread than start()."""
+        self._stop.set()
+        self._thread.join()
+        if not self.lost:
+            release(self.name, self.owner)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _heartbeat(self):
+        try:
+            while not self._stop.wait(self.ttl / 3):
+                try:
+                    renewed = renew(self.name, self.owner, self.ttl)
+                except Exception as e:  # a database hiccup: try again before the lease runs out
+                    logger.warning(f"Could not renew the '{self.name}' lock: {e}")
+                    continue
+                if not renewed:
+                    logger.error(f"Lost the '{self.name}' lock to {holder(self.name) or 'another process'}.")
+                    self.lost = True
+                    if self.on_lost:
+                        self.on_lost()
+                    return
+        finally:
+            connections.close_all()
@@ -0,0 +1,95 @@
+# CPU-bound article parsing, kept off the ingestion threads. Downloads stay on
+# the I/O threads; page bytes go to a process pool and only the extracted text
+# comes back. Nothing here touches the database: workers import this module
+# in a bare child process.
+import atexit
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from newspaper import Article as NewsArticle
+from newspaper import Config
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parse_article_html(html, url, encoding=None):
+    """
+    Runs in a pool worker: page bytes in, newspaper3k article text out
+    ('' when nothing could be extracted).
+    """
+    config = Config()
+    config.fetch_images = False  # parse() would otherwise download images to pick a top image
+    config.memoize_articles = False
+    article = NewsArticle(url, config=config)
+    article.download(input_html=html.decode(encoding or 'utf-8', errors='replace'))
+    article.parse()
+    return article.text or ''
+
+
+def _parse_settings():
+    from django.conf import settings
+    return (
+        getattr(settings, 'SCRAPER_PARSE_WORKERS', 2),
+        getattr(settings, 'SCRAPER_PARSE_MAX_TASKS_PER_CHILD', 200),
+    )
+
+
+def get_parse_pool():
+    """The process-wide parse pool, or None when SCRAPER_PARSE_WORKERS is 0 (parse in the calling thread)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers, max_tasks = _parse_settings()
+            if workers <= 0:
+                return None
+            # Workers are recycled after max_tasks parses so lxml/newspaper memory cannot grow without bound.
+            _pool = ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_tasks or None)
+        return _pool
+
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+atexit.register(shutdown_parse_pool)
+
+
+def parse_html(html, url, encoding=None):
+    """
+    Extracts article text from downloaded page bytes in the parse pool.
+    Falls back to parsing in this thread when the pool is disabled or a
+    worker died (the broken pool is replaced on the next call).
+    """
+    global _pool
+    pool = get_parse_pool()
+    if pool is not None:
+        try:
+            return pool.submit(parse_article_html, html, url, encoding).result()
+        except BrokenProcessPool as e:
+            logger.error(f"Parse pool broke ({e}); parsing {url} in-process and restarting the pool.")
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+    return parse_article_html(html, url, encoding)
+
+
+def parse_many(pages):
+    """
+    Parses many (html, url, encoding) tuples, fanned out over the parse pool.
+    Returns the texts in input order.
+    """
+    pages = list(pages)
+    pool = get_parse_pool()
+    if pool is None or len(pages) < 2:
+        return [parse_article_html(*page) for page in pages]
+    htmls, urls, encodings = zip(*pages)
+    return list(pool.map(parse_article_html, htmls, urls, encodings, chunksize=4))
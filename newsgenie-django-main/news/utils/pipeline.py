@@ -0,0 +1,670 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytz
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from news.models import Article, Feed, IngestJob
+from news.utils import archive, dedup, scraper
+from news.utils.extractive import extractive_summary
+from news.utils.feeds import due_feeds, poll_feed, record_new_entries
+from news.utils.http import http_stats
+from news.utils.report import IngestReport
+from news.utils.summarizer import SummaryError, model_stats, summarize_batch
+from news.utils.summary_cache import cache_stats
+from news.utils.throttle import HostThrottle, StageLimits
+from news.utils.tts import tts_stats
+from news.utils.urls import clean_url, normalize_url, url_variants
+
+logger = logging.getLogger(__name__)
+
+# Pipeline order. Workers claim from the last stage first, so started articles finish before new ones begin.
+STAGES = [IngestJob.FEED, IngestJob.EXTRACT, IngestJob.SUMMARIZE, IngestJob.TTS]
+
+
+def _pipeline_settings():
+    return {
+        'stage_limits': getattr(settings, 'SCRAPER_STAGE_LIMITS', {}),
+        'host_delay': getattr(settings, 'SCRAPER_HOST_DELAY', 2.0),
+        'entries_per_feed': getattr(settings, 'SCRAPER_ENTRIES_PER_FEED', 7),
+        'max_attempts': getattr(settings, 'SCRAPER_JOB_MAX_ATTEMPTS', 3),
+        'retry_delay': getattr(settings, 'SCRAPER_JOB_RETRY_DELAY', 30),
+        'retry_wait': getattr(settings, 'SCRAPER_JOB_RETRY_WAIT', 120),
+        'lease': getattr(settings, 'SCRAPER_JOB_LEASE', 600),
+        'batch_size': getattr(settings, 'SUMMARY_BATCH_SIZE', 5),
+        'batch_backlog': getattr(settings, 'SUMMARY_BATCH_BACKLOG', 10),
+        'write_batch': getattr(settings, 'SCRAPER_WRITE_BATCH', 20),
+    }
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# --- Queue operations -------------------------------------------------------
+
+def enqueue_feeds(feeds=None, force=False, run=None):
+    """
+    Queues one feed job per due feed of the registry (every active feed with
+    `force`) that has no pending or running job yet. `feeds` overrides the
+    selection with an iterable of Feed rows. The jobs, and every job that
+    follows from them, belong to the IngestRun `run` if given.
+    Returns the number of jobs queued.
+    """
+    if feeds is None:
+        feeds = Feed.objects.filter(is_active=True) if force else due_feeds()
+        feeds = feeds.select_related('category')
+    active = set(
+        IngestJob.objects.filter(stage=IngestJob.FEED, state__in=[IngestJob.PENDING, IngestJob.RUNNING])
+        .values_list('url', flat=True)
+    )
+    jobs = [
+        IngestJob(stage=IngestJob.FEED, url=feed.url, run=run, payload={
+            'category': feed.category.name if feed.category else feed.name, 'force': force, 'feed': feed.url,
+        })
+        for feed in feeds
+        if feed.url not in active
+    ]
+    IngestJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+def claim_jobs(stage, limit, worker):
+    """
+    Moves up to `limit` due pending jobs of `stage` to running and returns them.
+    Each claim is a compare-and-set UPDATE, so several processes can share the queue.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    candidates = list(
+        IngestJob.objects.filter(stage=stage, state=IngestJob.PENDING, available_at__lte=now)
+        .values_list('pk', flat=True)[:limit]
+    )
+    claimed = []
+    for pk in candidates:
+        updated = IngestJob.objects.filter(pk=pk, state=IngestJob.PENDING).update(
+            state=IngestJob.RUNNING, started_at=now, finished_at=None, worker=worker, attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(pk)
+    return list(IngestJob.objects.select_related('article').filter(pk__in=claimed))
+
+
+def requeue_stale_jobs(lease_seconds):
+    """
+    Puts running jobs whose lease expired (their worker crashed or was killed)
+    back to pending. Returns the number of jobs requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    return IngestJob.objects.filter(state=IngestJob.RUNNING, started_at__lt=cutoff).update(
+        state=IngestJob.PENDING, worker='', available_at=timezone.now(),
+    )
+
+
+def release_jobs(worker):
+    """
+    Hands the running jobs claimed by `worker` back to the queue right away,
+    instead of after their lease expires. The interrupted attempt is not counted.
+    """
+    return IngestJob.objects.filter(state=IngestJob.RUNNING, worker=worker).update(
+        state=IngestJob.PENDING, worker='', available_at=timezone.now(), attempts=F('attempts') - 1,
+    )
+
+
+def queue_progress():
+    """Job counts as {stage: {state: count}} for every stage, for status pages and the command output."""
+    progress = {stage: {state: 0 for state, _ in IngestJob.STATE_CHOICES} for stage in STAGES}
+    for row in IngestJob.objects.values('stage', 'state').annotate(count=Count('id')):
+        progress[row['stage']][row['state']] = row['count']
+    return progress
+
+
+def _advance(job, state=IngestJob.DONE, next_stage=None, article=None):
+    """Finishes `job` and queues the next stage for the same article. Call inside a transaction."""
+    article = article or job.article
+    IngestJob.objects.filter(pk=job.pk).update(
+        state=state, finished_at=timezone.now(), last_error='', article=article,
+    )
+    if next_stage:
+        IngestJob.objects.create(stage=next_stage, url=job.url, article=article, payload=job.payload, run_id=job.run_id)
+
+
+def _fail(job, error, options):
+    """
+    Records a failed attempt; retries with exponential backoff until
+    max_attempts is reached. Returns True if the job will be retried.
+    A summarize job out of attempts still publishes its article when it has
+    the extractive summary: its TTS job is queued, and the final stage
+    approves it (pre-generation upgrades the summary later).
+    """
+    now = timezone.now()
+    retry = job.attempts < options['max_attempts']
+    if not retry:
+        updates = {'state': IngestJob.FAILED, 'finished_at': now}
+        article = job.article if job.article_id else None
+        if job.stage == IngestJob.SUMMARIZE and article is not None and article.summary and article.summary_provisional:
+            IngestJob.objects.create(stage=IngestJob.TTS, url=job.url, article=article, payload=job.payload, run_id=job.run_id)
+    else:
+        delay = options['retry_delay'] * (2 ** (job.attempts - 1))
+        updates = {'state': IngestJob.PENDING, 'available_at': now + timedelta(seconds=delay)}
+    IngestJob.objects.filter(pk=job.pk).update(last_error=str(error)[:2000], **updates)
+    return retry
+
+
+# --- Entry de-duplication ---------------------------------------------------
+
+def select_new_entries(entries, report):
+    """
+    Drops feed entries whose normalized URL is already stored as an Article or
+    already has an extract job (one set-based query for the whole batch), and
+    repeated links within the batch itself.
+    """
+    candidates = [(entry, normalize_url(entry.link)) for entry in entries if entry.get('link')]
+    report.incr('entries_seen', len(candidates))
+    if not candidates:
+        return []
+
+    variants = set()
+    for entry, _ in candidates:
+        variants |= url_variants(entry.link)
+    stored = Article.objects.filter(url__in=variants).values_list('url', flat=True).union(
+        IngestJob.objects.filter(stage=IngestJob.EXTRACT, url__in=variants).order_by().values_list('url', flat=True)
+    )
+    known = {normalize_url(url) for url in stored}
+
+    fresh = []
+    for entry, key in candidates:
+        if key in known:
+            report.incr('known_skipped')
+            continue
+        known.add(key)
+        fresh.append(entry)
+    return fresh
+
+
+def _entry_payload(entry, category_name, feed_url):
+    published_at = None
+    if hasattr(entry, 'published_parsed') and entry.published_parsed:
+        published_at = datetime(*entry.published_parsed[:6], tzinfo=pytz.UTC).isoformat()
+    return {
+        'category': category_name,
+        'title': entry.get('title', ''),
+        'author': entry.get('author', 'Unknown'),
+        'published_at': published_at,
+        'feed': feed_url,
+    }
+
+
+# --- Stage handlers ----------------------------------------------------------
+
+def _handle_feed(job, run):
+    category_name = job.payload.get('category', '')
+    with run.db():
+        registered = Feed.objects.filter(url=job.url).first()
+    if registered is None:
+        # Deleted or renamed in the registry while the job was queued: polling it would register it again.
+        logger.info(f"Feed {job.url} is no longer registered, skipping.")
+        with run.db():
+            _advance(job, state=IngestJob.SKIPPED)
+        return
+    with run.report.timer('feed'):
+        feed = poll_feed(job.url, force=job.payload.get('force', False), db_guard=run.db)
+    run.report.incr('feeds_polled')
+    if feed is None:
+        run.report.incr('feeds_unchanged')
+        with run.db():
+            _advance(job, state=IngestJob.SKIPPED)
+        return
+
+    entries = feed.entries[:registered.max_entries or run.options['entries_per_feed']]
+    with run.db(), transaction.atomic():
+        fresh = select_new_entries(entries, run.report)
+        IngestJob.objects.bulk_create([
+            IngestJob(
+                stage=IngestJob.EXTRACT, url=clean_url(entry.link), run_id=job.run_id,
+                payload=_entry_payload(entry, category_name, job.url),
+            )
+            for entry in fresh
+        ])
+        _advance(job)
+    record_new_entries(registered, len(fresh), db_guard=run.db)
+    logger.info(f"Feed {category_name}: {len(fresh)} new entries")
+
+
+def _handle_extract(job, run):
+    with run.report.timer('host_wait'):
+        run.throttle.wait(job.url)  # per-host politeness instead of a global sleep
+    full_content, saved = scraper.fetch_article(job.url, report=run.report)
+    if not full_content or len(full_content) < 200:
+        run.report.incr('too_short_skipped')
+        with run.db():
+            if saved:
+                archive.record(job.url, saved, saved.get('encoding'))  # kept so a better parser can retry it offline
+            _advance(job, state=IngestJob.SKIPPED)
+        return
+
+    payload = job.payload
+    category_name = payload.get('category', '')
+    published_at = timezone.now()
+    if payload.get('published_at'):
+        published_at = datetime.fromisoformat(payload['published_at'])
+
+    with run.report.timer('extractive'):
+        # First paint: shown until the summarize stage replaces it with the LLM summary
+        provisional = extractive_summary(full_content)
+
+    logger.info(f"Extracted '{payload.get('title', '')[:50]}'")
+    # Written together with other finished extractions, SCRAPER_WRITE_BATCH per transaction
+    run.extracted.add({
+        'job': job,
+        'article': Article(
+            title=scraper.clean_html(payload.get('title', ''))[:200],
+            author=payload.get('author') or 'Unknown',
+            content=full_content,
+            summary=provisional,
+            summary_provisional=bool(provisional),
+            url=job.url,
+            source=category_name,
+            published_at=published_at,
+            approved=False,  # hidden until its summary (or, if the LLM keeps failing, the extractive one) is voiced
+            reading_time=Article.compute_reading_time(full_content),
+            content_signature=dedup.signature(full_content),
+        ),
+        'category': run.categories.get(category_name.lower()),
+        'saved': saved,
+    })
+
+
+def _write_extracted(items, run):
+    """
+    Stores a batch of extracted articles in one transaction: bulk inserts for
+    the articles, their category links and raw pages, one bulk update for the
+    extract jobs and one bulk insert for the summarize jobs that follow.
+    Near-duplicates are linked to their canonical article (stored earlier or
+    earlier in this batch) and go no further: they stay hidden for good.
+    """
+    now = timezone.now()
+    with run.db(), transaction.atomic():
+        stored = set(Article.objects.filter(url__in=[item['job'].url for item in items]).values_list('url', flat=True))
+        fresh = []
+        for item in items:
+            if item['job'].url in stored:
+                item['job'].state = IngestJob.SKIPPED  # another worker stored this URL first
+            else:
+                stored.add(item['job'].url)
+                fresh.append(item)
+
+        canonicals = dedup.find_canonicals([item['article'].content_signature for item in fresh])
+        for item, canonical in zip(fresh, canonicals):
+            if isinstance(canonical, Article):
+                item['article'].canonical = canonical
+        # Stories new to the database go first, so copies within the batch can point at them.
+        Article.objects.bulk_create([item['article'] for item, canonical in zip(fresh, canonicals) if not isinstance(canonical, int)])
+        copies = []
+        for item, canonical in zip(fresh, canonicals):
+            if isinstance(canonical, int):
+                item['article'].canonical = fresh[canonical]['article']
+                copies.append(item['article'])
+        Article.objects.bulk_create(copies)
+
+        Article.category.through.objects.bulk_create([
+            Article.category.through(article_id=item['article'].pk, category_id=item['category'].pk)
+            for item in fresh if item['category']
+        ])
+        archive.record_many([
+            (item['job'].url, item['saved'], item['article'] if item['article'].pk else None)
+            for item in items if item['saved']
+        ], fetched_at=now)
+
+        next_jobs = []
+        for item in fresh:
+            job, article = item['job'], item['article']
+            job.article = article
+            job.state = IngestJob.DONE
+            if article.canonical_id is not None:
+                run.report.incr('near_duplicates')
+            else:
+                next_jobs.append(IngestJob(stage=IngestJob.SUMMARIZE, url=job.url, article=article, payload=job.payload, run_id=job.run_id))
+        jobs = [item['job'] for item in items]
+        for job in jobs:
+            job.finished_at, job.last_error = now, ''
+        IngestJob.objects.bulk_update(jobs, ['state', 'finished_at', 'last_error', 'article'])
+        IngestJob.objects.bulk_create(next_jobs)
+
+    for item in fresh:
+        dedup.remember(item['article'])
+
+
+def _handle_summarize(job, run):
+    article = job.article
+    with run.report.timer('summarize'):
+        article.summary = scraper.get_summary_from_gemini(article.content, raise_on_failure=True, db_guard=run.db)
+    article.summary_provisional = False
+    run.summarized.add({'job': job, 'article': article})
+
+
+def _handle_summarize_batch(jobs, run):
+    """Summarizes several articles with packed multi-article requests (see summarize_batch)."""
+    with run.report.timer('summarize_batch'):
+        summaries = summarize_batch([job.article.content for job in jobs], db_guard=run.db)
+    run.report.incr('summary_batches')
+    for job, summary_text in zip(jobs, summaries):
+        if summary_text is None:
+            run.report.incr('summarize_errors')
+            with run.db():
+                retried = _fail(job, SummaryError("No summary from the batch request or its single-article fallback"), run.options)
+            run.report.incr('job_retries' if retried else 'jobs_failed')
+            continue
+        job.article.summary, job.article.summary_provisional = summary_text, False
+        run.summarized.add({'job': job, 'article': job.article})
+
+
+def _write_summarized(items, run):
+    """Stores a batch of summaries and queues their TTS jobs in one transaction."""
+    now = timezone.now()
+    jobs = [item['job'] for item in items]
+    for job in jobs:
+        job.state, job.finished_at, job.last_error = IngestJob.DONE, now, ''
+    for item in items:
+        item['article'].updated_at = now  # bulk_update skips auto_now
+    with run.db(), transaction.atomic():
+        Article.objects.bulk_update([item['article'] for item in items], ['summary', 'summary_provisional', 'updated_at'])
+        IngestJob.objects.bulk_update(jobs, ['state', 'finished_at', 'last_error'])
+        IngestJob.objects.bulk_create([
+            IngestJob(stage=IngestJob.TTS, url=job.url, article=job.article, payload=job.payload, run_id=job.run_id) for job in jobs
+        ])
+
+
+def _handle_tts(job, run):
+    article = job.article
+    with run.report.timer('tts'):
+        # Waits on the shared TTS pool; a summary voiced before reuses its file.
+        audio_name = scraper.generate_audio(article.summary)
+    if audio_name:
+        article.audio_file = audio_name
+    run.voiced.add({'job': job, 'article': article})
+
+
+def _write_voiced(items, run):
+    """Publishes a batch of voiced articles: one approval update and one job update per batch."""
+    now = timezone.now()
+    articles = [item['article'] for item in items]
+    for article in articles:
+        article.approved, article.updated_at = True, now
+    jobs = [item['job'] for item in items]
+    for job in jobs:
+        job.state, job.finished_at, job.last_error = IngestJob.DONE, now, ''
+    with run.db(), transaction.atomic():
+        Article.objects.bulk_update(articles, ['approved', 'audio_file', 'updated_at'])
+        IngestJob.objects.bulk_update(jobs, ['state', 'finished_at', 'last_error'])
+    run.report.incr('articles_created', len(articles))
+    run.finished.extend(article.pk for article in articles)
+
+
+class _WriteBuffer:
+    """
+    Collects finished jobs of one stage and hands them to `write` in batches
+    of `size`. A batch that cannot be written fails all of its jobs (they are
+    retried like any other failed job).
+    """
+
+    def __init__(self, write, run, size):
+        self.write = write
+        self.run = run
+        self.size = max(size, 1)
+        self.items = []
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        with self._lock:
+            self.items.append(item)
+            if len(self.items) < self.size:
+                return
+            items, self.items = self.items, []
+        self._write(items)
+
+    def flush(self):
+        """Writes whatever is buffered; returns True if anything was written."""
+        with self._lock:
+            items, self.items = self.items, []
+        if items:
+            self._write(items)
+        return bool(items)
+
+    def _write(self, items):
+        try:
+            self.write(items, self.run)
+        except Exception as e:
+            logger.error(f"Writing {len(items)} finished jobs failed: {e}")
+            for item in items:
+                job = item['job']
+                self.run.report.incr(f"{job.stage}_errors")
+                with self.run.db():
+                    retried = _fail(job, e, self.run.options)
+                self.run.report.incr('job_retries' if retried else 'jobs_failed')
+
+
+HANDLERS = {
+    IngestJob.FEED: _handle_feed,
+    IngestJob.EXTRACT: _handle_extract,
+    IngestJob.SUMMARIZE: _handle_summarize,
+    IngestJob.TTS: _handle_tts,
+}
+
+
+# --- Runner -------------------------------------------------------------------
+
+class _PipelineRun:
+    """State shared by every job executed by one run_pipeline() call."""
+
+    def __init__(self, options, report, workers, stop=None):
+        self.options = options
+        self.report = report
+        self.workers = workers
+        # Concurrent runs funnel all database access through the single-slot 'db' stage.
+        self.limits = StageLimits(options['stage_limits'] if workers > 1 else None)
+        self.throttle = HostThrottle(options['host_delay'])
+        self.categories = scraper.create_categories()
+        self.worker = f"{worker_id()}:{uuid.uuid4().hex[:8]}"  # per run, so release_jobs only touches our own claims
+        self.stop = stop or threading.Event()
+        self.finished = []
+        self.extracted = _WriteBuffer(_write_extracted, self, options['write_batch'])
+        self.summarized = _WriteBuffer(_write_summarized, self, options['write_batch'])
+        self.voiced = _WriteBuffer(_write_voiced, self, options['write_batch'])
+
+    def flush(self):
+        """Writes every buffered job. Returns True if that may have queued new work."""
+        queued = self.extracted.flush()
+        queued = self.summarized.flush() or queued
+        self.voiced.flush()
+        return queued
+
+    @contextmanager
+    def db(self):
+        # Timed including the wait for the db slot, so contention shows up in the 'db' histogram.
+        with self.report.timer('db'), self.limits.stage('db'):
+            yield
+
+    def stage_capacity(self, stage):
+        return min(self.options['stage_limits'].get(stage) or self.workers, self.workers)
+
+
+def _execute(jobs, run):
+    """Runs one unit of work: a single job, or a batch of summarize jobs."""
+    try:
+        if len(jobs) > 1:
+            _handle_summarize_batch(jobs, run)
+        else:
+            HANDLERS[jobs[0].stage](jobs[0], run)
+    except Exception as e:
+        for job in jobs:
+            run.report.incr(f"{job.stage}_errors")
+            logger.error(f"{job.stage} job {job.pk} for '{job.url}' failed (attempt {job.attempts}): {e}")
+            with run.db():
+                retried = _fail(job, e, run.options)
+            run.report.incr('job_retries' if retried else 'jobs_failed')
+
+
+def _claim_work(stage, count, run):
+    """
+    Claims up to `count` units of work for `stage`. A unit is one job, except
+    that summarize jobs are claimed in batches of SUMMARY_BATCH_SIZE while at
+    least SUMMARY_BATCH_BACKLOG of them are waiting.
+    """
+    batch_size = run.options['batch_size']
+    if stage == IngestJob.SUMMARIZE and batch_size > 1:
+        backlog = IngestJob.objects.filter(stage=stage, state=IngestJob.PENDING).count()
+        if backlog >= run.options['batch_backlog']:
+            jobs = claim_jobs(stage, count * batch_size, run.worker)
+            return [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    return [[job] for job in claim_jobs(stage, count, run.worker)]
+
+
+def _claim_next(stages, run):
+    for stage in reversed(stages):
+        work = _claim_work(stage, 1, run)
+        if work:
+            return work[0]
+    return None
+
+
+def _run_in_worker(func, *args):
+    """Runs func in a pool thread and releases that thread's DB connection afterwards."""
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+def _process_totals():
+    """
+    Process-wide HTTP, model, summary-cache and TTS totals. A run reports how much
+    they grew while it worked (only one run holds the ingest lock at a time).
+    """
+    hosts = http_stats().values()
+    models, cache, audio = model_stats(), cache_stats(), tts_stats()
+    return {
+        'http_requests': sum(host['requests'] for host in hosts),
+        'http_errors': sum(host['errors'] for host in hosts),
+        'http_retries': sum(host['retries'] for host in hosts),
+        'bytes_downloaded': sum(host['bytes'] for host in hosts),
+        'gemini_calls': models['calls'],
+        'gemini_tokens_sent': models['tokens_sent'],
+        'gemini_rate_limited': models['rate_limited'],
+        'summary_cache_hits': cache['hits'],
+        'summary_cache_misses': cache['misses'],
+        'tts_synthesized': audio['synthesized'],
+        'tts_reused': audio['reused'],
+        'tts_errors': audio['errors'],
+    }
+
+
+def _wait_for_retries(stages, run):
+    """
+    Sleeps until the next deferred retry is due, if that is within
+    SCRAPER_JOB_RETRY_WAIT seconds. Returns False when there is nothing left to
+    wait for, or when the run was asked to stop during the wait.
+    """
+    with run.db():
+        next_due = IngestJob.objects.filter(stage__in=stages, state=IngestJob.PENDING).aggregate(
+            next_due=Min('available_at')
+        )['next_due']
+    if next_due is None:
+        return False
+    delay = (next_due - timezone.now()).total_seconds()
+    if delay > run.options['retry_wait']:
+        return False
+    if delay > 0:
+        with run.report.timer('retry_wait'):
+            return not run.stop.wait(delay)
+    return True
+
+
+def run_pipeline(workers=None, stages=None, report=None, stop=None):
+    """
+    Works the IngestJob queue until no job of `stages` (default: all) is due.
+    Jobs left running by a crashed worker are requeued once their lease expires,
+    so a restarted run continues where the previous one stopped. Returns the
+    articles that completed their last stage during this run.
+
+    Setting the threading.Event `stop` ends the run gracefully: no new job is
+    claimed, jobs already executing finish, buffered results are written and
+    anything still claimed is handed back to the queue for the next run.
+    """
+    if workers is None:
+        workers = getattr(settings, 'SCRAPER_WORKERS', 1)
+    if report is None:
+        report = IngestReport()
+    stages = stages or STAGES
+    options = _pipeline_settings()
+
+    requeued = requeue_stale_jobs(options['lease'])
+    if requeued:
+        logger.warning(f"Requeued {requeued} ingestion jobs whose worker stopped responding.")
+    run = _PipelineRun(options, report, workers, stop)
+    totals_before = _process_totals()
+
+    try:
+        _work_queue(stages, run)
+    finally:
+        run.flush()
+        released = release_jobs(run.worker)
+        if released:
+            logger.info(f"Handed {released} claimed ingestion jobs back to the queue.")
+        for name, value in _process_totals().items():
+            if value - totals_before[name]:
+                report.incr(name, value - totals_before[name])
+
+    return list(Article.objects.filter(pk__in=run.finished))
+
+
+def _work_queue(stages, run):
+    workers = run.workers
+    if workers <= 1:
+        while not run.stop.is_set():
+            jobs = _claim_next(stages, run)
+            if jobs is None:
+                if run.flush() or _wait_for_retries(stages, run):
+                    continue
+                break
+            _execute(jobs, run)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as pool:
+            in_flight = {}
+            while True:
+                for stage in reversed(stages):
+                    if run.stop.is_set():
+                        break  # let in-flight jobs finish, claim nothing new
+                    running = sum(1 for s in in_flight.values() if s == stage)
+                    free = min(run.stage_capacity(stage) - running, workers - len(in_flight))
+                    if free <= 0:
+                        continue
+                    with run.db():
+                        work = _claim_work(stage, free, run)
+                    for jobs in work:
+                        in_flight[pool.submit(_run_in_worker, _execute, jobs, run)] = stage
+
+                if not in_flight:
+                    if run.stop.is_set():
+                        break
+                    if run.flush():
+                        continue
+                    if _wait_for_retries(stages, run):
+                        continue
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.pop(future)
+                    future.result()
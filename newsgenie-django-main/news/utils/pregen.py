@@ -0,0 +1,252 @@
+# Pre-generation of summaries and audio ahead of readers. Articles that
+# ingestion left without a summary or audio get a PregenTask whose priority
+# predicts demand from freshness, how many readers follow the article's
+# categories, early likes and reading engagement. Tasks are worked highest
+# first until the day's PREGEN_DAILY_LIMITS are spent, so quota goes to the
+# articles people are about to open and the long tail waits (or never runs).
+import logging
+import math
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.utils import timezone
+
+from news.models import Article, PregenSpend, PregenTask, UserArticleMetrics, UserPreference
+from news.utils.generation import has_final_summary, summarize_once, voice_article
+from news.utils.scraper import SummaryBusy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {'freshness': 1.0, 'preference': 1.0, 'likes': 0.5, 'engagement': 0.5}
+DEFAULT_LIMITS = {PregenTask.SUMMARY: 100, PregenTask.AUDIO: 100}
+
+
+def _settings():
+    return {
+        'weights': {**DEFAULT_WEIGHTS, **getattr(settings, 'PREGEN_WEIGHTS', {})},
+        'limits': {**DEFAULT_LIMITS, **getattr(settings, 'PREGEN_DAILY_LIMITS', {})},
+        'window': getattr(settings, 'PREGEN_WINDOW_HOURS', 48),
+        'half_life': getattr(settings, 'PREGEN_HALF_LIFE_HOURS', 6),
+        'min_priority': getattr(settings, 'PREGEN_MIN_PRIORITY', 0.1),
+        'max_attempts': getattr(settings, 'PREGEN_MAX_ATTEMPTS', 2),
+        'lease': getattr(settings, 'SCRAPER_JOB_LEASE', 600),
+    }
+
+
+def _needs(article):
+    kinds = []
+    if not article.summary or article.summary_provisional:
+        kinds.append(PregenTask.SUMMARY)
+    if not article.audio_file:
+        kinds.append(PregenTask.AUDIO)
+    return kinds
+
+
+def score_articles(articles, now=None):
+    """
+    Priority components of each article, keyed by id. A handful of grouped
+    queries whatever the number of articles.
+      freshness   0.5 ** (age / PREGEN_HALF_LIFE_HOURS)
+      preference  share of readers with preferences who follow one of its categories
+      likes       log(1 + likes); candidates are young, so these are early likes
+      engagement  log(1 + minutes read) x average scroll depth
+    """
+    now = now or timezone.now()
+    config = _settings()
+    ids = [article.pk for article in articles]
+
+    followers = dict(
+        UserPreference.preferred_categories.through.objects
+        .values_list('category_id').annotate(n=Count('userpreference_id'))
+    )
+    readers_with_preferences = UserPreference.objects.filter(preferred_categories__isnull=False).distinct().count()
+    categories = {}
+    for article_id, category_id in Article.category.through.objects.filter(article_id__in=ids).values_list('article_id', 'category_id'):
+        categories.setdefault(article_id, []).append(category_id)
+    likes = dict(
+        Article.objects.filter(pk__in=ids).annotate(n=Count('likes')).values_list('pk', 'n')
+    )
+    engagement = {
+        row['article_id']: row
+        for row in UserArticleMetrics.objects.filter(article_id__in=ids)
+        .values('article_id').annotate(seconds=Sum('time_on_page'), scroll=Avg('scroll_depth'))
+    }
+
+    scores = {}
+    for article in articles:
+        age_hours = max((now - article.published_at).total_seconds() / 3600, 0)
+        share = max((followers.get(c, 0) for c in categories.get(article.pk, [])), default=0)
+        read = engagement.get(article.pk, {})
+        scores[article.pk] = {
+            'freshness': round(0.5 ** (age_hours / config['half_life']), 4),
+            'preference': round(share / readers_with_preferences, 4) if readers_with_preferences else 0.0,
+            'likes': round(math.log1p(likes.get(article.pk, 0)), 4),
+            'engagement': round(math.log1p((read.get('seconds') or 0) / 60) * (read.get('scroll') or 0), 4),
+        }
+    return scores
+
+
+def priority(score, weights=None):
+    weights = weights or _settings()['weights']
+    return round(sum(weights.get(name, 0) * value for name, value in score.items()), 4)
+
+
+def refresh_queue(now=None):
+    """
+    Queues the recent approved articles that lack a summary or audio and
+    re-scores every pending task. Tasks whose output appeared meanwhile (from a
+    reader's click or a later ingestion) or whose article left the window are
+    skipped; tasks orphaned by a crashed worker are queued again. Returns the
+    number of pending tasks.
+    """
+    now = now or timezone.now()
+    config = _settings()
+    PregenTask.objects.filter(
+        state=PregenTask.RUNNING, started_at__lt=now - timedelta(seconds=config['lease'])
+    ).update(state=PregenTask.PENDING)
+
+    candidates = list(
+        Article.objects.filter(
+            approved=True, canonical__isnull=True, published_at__gte=now - timedelta(hours=config['window']),
+        ).filter(
+            Q(summary__isnull=True) | Q(summary='') | Q(summary_provisional=True)
+            | Q(audio_file__isnull=True) | Q(audio_file='')
+        )
+        .only('pk', 'published_at', 'summary', 'summary_provisional', 'audio_file')
+    )
+    scores = score_articles(candidates, now)
+    tasks = {
+        (task.article_id, task.kind): task
+        for task in PregenTask.objects.filter(article__in=candidates)
+    }
+    create, update = [], []
+    for article in candidates:
+        score = scores[article.pk]
+        for kind in _needs(article):
+            task = tasks.get((article.pk, kind))
+            if task is None:
+                create.append(PregenTask(article=article, kind=kind, score=score, priority=priority(score, config['weights']), scored_at=now))
+            elif task.state in (PregenTask.PENDING, PregenTask.SKIPPED):
+                # Skipped tasks come back when their output is wanted again (e.g. a summary was cleared).
+                task.state, task.score, task.priority, task.scored_at = PregenTask.PENDING, score, priority(score, config['weights']), now
+                update.append(task)
+    PregenTask.objects.bulk_create(create, ignore_conflicts=True)
+    PregenTask.objects.bulk_update(update, ['state', 'score', 'priority', 'scored_at'], batch_size=500)
+
+    wanted = {(article.pk, kind) for article in candidates for kind in _needs(article)}
+    stale = [
+        pk for pk, article_id, kind in
+        PregenTask.objects.filter(state=PregenTask.PENDING).values_list('pk', 'article_id', 'kind')
+        if (article_id, kind) not in wanted
+    ]
+    PregenTask.objects.filter(pk__in=stale).update(state=PregenTask.SKIPPED, finished_at=now)
+    return PregenTask.objects.filter(state=PregenTask.PENDING).count()
+
+
+def spent_today(now=None):
+    """Attempts per kind made today (local time), whenever their tasks were queued: what counts against PREGEN_DAILY_LIMITS."""
+    day = timezone.localdate(now or timezone.now())
+    spent = dict(PregenSpend.objects.filter(day=day).values_list('kind', 'attempts'))
+    return {kind: spent.get(kind, 0) for kind, _ in PregenTask.KIND_CHOICES}
+
+
+def _spend(kind, now=None):
+    """Books one attempt of `kind` on today's counter (one row per day and kind)."""
+    day = timezone.localdate(now or timezone.now())
+    if PregenSpend.objects.filter(day=day, kind=kind).update(attempts=F('attempts') + 1):
+        return
+    try:
+        with transaction.atomic():
+            PregenSpend.objects.create(day=day, kind=kind, attempts=1)
+    except IntegrityError:
+        # Another worker created the day's row first: count on it.
+        PregenSpend.objects.filter(day=day, kind=kind).update(attempts=F('attempts') + 1)
+
+
+def budget_left(now=None):
+    limits = _settings()['limits']
+    spent = spent_today(now)
+    return {kind: max(limits.get(kind, 0) - spent[kind], 0) for kind in spent}
+
+
+def _next_task(kinds, min_priority):
+    """Claims the highest-priority pending task of `kinds`; audio waits until its article has a final summary."""
+    candidates = (
+        PregenTask.objects.filter(state=PregenTask.PENDING, kind__in=kinds, priority__gte=min_priority)
+        .exclude(Q(kind=PregenTask.AUDIO) & (
+            Q(article__summary__isnull=True) | Q(article__summary='') | Q(article__summary_provisional=True)
+        ))
+        .select_related('article').order_by('-priority', 'pk')
+    )
+    for task in candidates[:5]:
+        # Compare-and-set, so two pregeneration workers never take the same task.
+        if PregenTask.objects.filter(pk=task.pk, state=PregenTask.PENDING).update(
+                state=PregenTask.RUNNING, started_at=timezone.now()):
+            return task
+    return None
+
+
+def _work(task):
+    """Generates the task's output. Returns True when it exists afterwards."""
+    article = task.article
+    if task.kind == PregenTask.SUMMARY:
+        # Off-request, so waiting out a short quota window is fine.
+        return bool(has_final_summary(article) or summarize_once(article, max_wait=getattr(settings, 'GEMINI_BACKOFF_CAP', 60)))
+    return bool(article.audio_file or voice_article(article))
+
+
+def run_pregeneration(max_tasks=None, stop=None, report=None):
+    """
+    Refreshes the queue and works it highest priority first until it is
+    empty, below PREGEN_MIN_PRIORITY, out of today's budget, `max_tasks` were
+    done or `stop` (an Event) is set. Returns {'done', 'failed', 'budget_left', 'pending'}.
+    """
+    config = _settings()
+    refresh_queue()
+    budget = budget_left()
+    done = failed = 0
+    while max_tasks is None or done + failed < max_tasks:
+        if stop is not None and stop.is_set():
+            break
+        kinds = [kind for kind, left in budget.items() if left > 0]
+        task = _next_task(kinds, config['min_priority']) if kinds else None
+        if task is None:
+            break
+        budget[task.kind] -= 1
+        state, error = PregenTask.FAILED, ''
+        try:
+            with report.timer(f"pregen_{task.kind}") if report is not None else nullcontext():
+                generated = _work(task)
+            if generated:
+                state = PregenTask.DONE
+            else:
+                error = "Nothing was generated"
+        except SummaryBusy as e:
+            # Quota is exhausted for now: hand the task back and leave summaries for the next pass.
+            PregenTask.objects.filter(pk=task.pk).update(state=PregenTask.PENDING, started_at=None)
+            budget[PregenTask.SUMMARY] = 0
+            logger.info(f"Pausing summary pre-generation: {e}")
+            continue
+        except Exception as e:
+            error = str(e)
+        _spend(task.kind)
+        attempts = task.attempts + 1
+        if state == PregenTask.FAILED and attempts < config['max_attempts']:
+            state = PregenTask.PENDING  # retried on a later pass, still within the daily budget
+        PregenTask.objects.filter(pk=task.pk).update(
+            state=state, attempts=attempts, last_error=error, finished_at=timezone.now(),
+        )
+        if state == PregenTask.DONE:
+            done += 1
+        else:
+            failed += 1
+            logger.warning(f"Pre-generating {task.kind} of article {task.article_id} failed: {error}")
+    return {
+        'done': done,
+        'failed': failed,
+        'budget_left': budget,
+        'pending': PregenTask.objects.filter(state=PregenTask.PENDING).count(),
+    }
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+class RateLimitTimeout(Exception):
+    """The limiter could not grant capacity within the caller's timeout."""
+
+    def __init__(self, wait):
+        super().__init__(f"rate limit capacity not available for another {wait:.1f}s")
+        self.wait = wait
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills `capacity`
+    tokens every `per_seconds`. Not thread-safe on its own; RateLimiter guards it.
+    """
+
+    def __init__(self, capacity, per_seconds=60.0, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / per_seconds
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` tokens are available (0 if they are available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        """Gives back tokens taken for a grant that did not happen."""
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets plus a cap on calls in
+    flight, shared by every thread of the process. With `shared=True` every
+    grant is also counted in per-minute windows in the Django cache, which
+    extends the quota across processes when the cache backend is shared
+    (Redis, Memcached, database).
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_in_flight=4, shared=False,
+                 name='gemini', clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = max_in_flight
+        self.shared = shared
+        self.name = name
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        """Stops every caller from starting a request for `seconds` (used after a quota error)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+    def _shared_wait(self, tokens):
+        """Counts this grant in the cache window; returns seconds to wait if the window is full."""
+        window = int(time.time() // 60)
+        request_key = f"ratelimit:{self.name}:{window}:requests"
+        token_key = f"ratelimit:{self.name}:{window}:tokens"
+        cache.add(request_key, 0, timeout=120)
+        cache.add(token_key, 0, timeout=120)
+        used_requests = cache.incr(request_key)
+        used_tokens = cache.incr(token_key, tokens)
+        if used_requests > self.requests_per_minute or used_tokens > self.tokens_per_minute:
+            cache.decr(request_key)
+            cache.decr(token_key, tokens)
+            return 60 - (time.time() % 60)
+        return 0.0
+
+    def acquire(self, tokens, timeout=None):
+        """
+        Blocks until one request and `tokens` tokens can be spent. Raises
+        RateLimitTimeout instead of waiting past `timeout` seconds.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                now = self.clock()
+                wait = max(self._paused_until - now, 0.0)
+                if not wait:
+                    wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if not wait:
+                    self.requests.take(1, now)
+                    self.tokens.take(tokens, now)
+            if not wait and self.shared:
+                wait = self._shared_wait(tokens)
+                if wait:
+                    # The shared window is full: hand the local tokens back, or every retry would spend them again.
+                    with self._lock:
+                        self.requests.refund(1)
+                        self.tokens.refund(tokens)
+            if not wait:
+                return
+            if deadline is not None and now + wait > deadline:
+                raise RateLimitTimeout(wait)
+            self.sleep(wait)
+
+    @contextmanager
+    def slot(self, tokens, timeout=None):
+        """Holds one in-flight slot and the bucket capacity for the duration of a call."""
+        deadline = None if timeout is None else self.clock() + timeout
+        if not self._in_flight.acquire(timeout=timeout):
+            raise RateLimitTimeout(timeout)
+        try:
+            remaining = None if deadline is None else max(deadline - self.clock(), 0.0)
+            self.acquire(tokens, timeout=remaining)
+            yield
+        finally:
+            self._in_flight.release()
@@ -0,0 +1,91 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds (milliseconds) of the latency histogram buckets; slower samples land in an overflow bucket.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: constant memory however long the run."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile sample, capped at the slowest sample seen."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return float(min(bound, self.max))
+        return self.max
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 1),
+            'mean_ms': round(self.total / self.count, 1) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 1),
+            'p95_ms': round(self.percentile(0.95), 1),
+            'max_ms': round(self.max, 1),
+            'buckets': {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class IngestReport:
+    """
+    Thread-safe counters and per-stage latency histograms collected during one
+    ingestion run. Counters are e.g. feeds_polled, entries_seen, known_skipped,
+    articles_created, job_retries, bytes_downloaded, gemini_tokens_sent;
+    timings are e.g. feed, download, parse, summarize, tts and db.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.timings = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.timings.setdefault(name, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Times the block into the `name` histogram, whether or not it raises."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'timings': {name: histogram.as_dict() for name, histogram in sorted(self.timings.items())},
+            }
+
+    def summary_line(self):
+        counters = self.as_dict()['counters']
+        return ', '.join(f"{name}={value}" for name, value in sorted(counters.items()))
@@ -0,0 +1,184 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+
+from news.models import Feed, IngestJob, IngestRun
+from news.utils.locks import INGEST_LOCK, Lease
+from news.utils.pipeline import STAGES, enqueue_feeds, run_pipeline, worker_id
+from news.utils.report import IngestReport
+from news.utils.search_index import update_index
+
+logger = logging.getLogger(__name__)
+
+_threads = {}  # IngestRun id -> thread working it in this process
+
+
+def begin_run(trigger, user=None, on_lost=None, lock=True):
+    """
+    Takes the deployment-wide ingest lock and records a new IngestRun.
+    Returns (run, lease); hand both to work_run(), which releases the lease.
+    Raises LockHeld while another run is in progress. With lock=False (a run
+    that only drains jobs already queued) no lock is taken and lease is None.
+    """
+    owner = f"{worker_id()}:{trigger}-{threading.get_ident()}"
+    lease = Lease(INGEST_LOCK, owner, on_lost=on_lost) if lock else None
+    if lease:
+        lease.start()
+    try:
+        ingest_run = IngestRun.objects.create(trigger=trigger, started_by=user, worker=owner)
+    except Exception:
+        if lease:
+            lease.stop()
+        raise
+    return ingest_run, lease
+
+
+def work_run(ingest_run, lease, workers=None, stop=None, force=False, stages=None, enqueue=True, report=None):
+    """
+    Queues the due feeds for `ingest_run` (unless enqueue=False), works the
+    job queue, records the outcome, counters and stage timings on the run and
+    releases the lease. Returns the articles completed.
+    """
+    report = report or IngestReport()
+    state, error = IngestRun.FAILED, ''
+    try:
+        if enqueue:
+            ingest_run.feeds_queued = enqueue_feeds(force=force, run=ingest_run)
+            IngestRun.objects.filter(pk=ingest_run.pk).update(feeds_queued=ingest_run.feeds_queued)
+        finished = run_pipeline(workers=workers, stages=stages, report=report, stop=stop)
+        _update_search_index(finished, report)
+        state = IngestRun.STOPPED if stop is not None and stop.is_set() else IngestRun.DONE
+        return finished
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        ingest_run.state = state
+        ingest_run.error = error
+        collected = report.as_dict()
+        ingest_run.counters = collected['counters']
+        ingest_run.timings = collected['timings']
+        ingest_run.articles_created = _completed(ingest_run).count() if enqueue else collected['counters'].get('articles_created', 0)
+        ingest_run.finished_at = timezone.now()
+        ingest_run.save(update_fields=['state', 'error', 'counters', 'timings', 'articles_created', 'finished_at'])
+        if lease:
+            lease.stop()
+
+
+def _update_search_index(articles, report):
+    """Catches the BM25 search index up with the run's published articles, if it is in use."""
+    if getattr(settings, 'SEARCH_BACKEND', 'database') != 'index' or not articles:
+        return
+    try:
+        with report.timer('search_index'):
+            update_index()
+    except Exception as e:
+        # Searches still work: they catch the index up themselves, or use the database index meanwhile.
+        logger.error(f"Updating the search index failed: {e}")
+
+
+def start_background_run(user=None, workers=None):
+    """
+    Starts a run in a daemon thread of this process and returns its IngestRun
+    at once, so a web request never waits for the crawl. Raises LockHeld while
+    another run is in progress.
+    """
+    stop = threading.Event()
+    ingest_run, lease = begin_run(IngestRun.VIEW, user, on_lost=stop.set)
+    thread = threading.Thread(
+        target=_work_in_background, args=(ingest_run, lease, workers, stop),
+        name=f'ingest-run-{ingest_run.pk}', daemon=True,
+    )
+    _threads[ingest_run.pk] = thread
+    thread.start()
+    return ingest_run
+
+
+def _work_in_background(ingest_run, lease, workers, stop):
+    try:
+        work_run(ingest_run, lease, workers=workers, stop=stop)
+    except Exception as e:
+        logger.error(f"Background ingestion run {ingest_run.pk} failed: {e}")
+    finally:
+        _threads.pop(ingest_run.pk, None)
+        connections.close_all()
+
+
+def join_run(ingest_run, timeout=None):
+    """Waits for a run started by this process to finish. Returns False on timeout."""
+    thread = _threads.get(ingest_run.pk)
+    if thread is not None:
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+
+def _completed(ingest_run):
+    return IngestJob.objects.filter(run=ingest_run, stage=STAGES[-1], state=IngestJob.DONE)
+
+
+def run_status(ingest_run):
+    """
+    Progress of a run as a JSON-ready dict: per-feed job counts, articles
+    created so far and the latest failures. Read from the job table, so any
+    web process can answer it while another one works the run.
+    """
+    feeds = {}
+    rows = (
+        IngestJob.objects.filter(run=ingest_run)
+        .values('payload__feed', 'stage', 'state')
+        .annotate(count=Count('id'))
+    )
+    for row in rows:
+        progress = feeds.setdefault(row['payload__feed'], {
+            'state': IngestJob.PENDING, 'entries': 0, 'extracted': 0, 'summarized': 0, 'completed': 0,
+            'in_progress': 0, 'failed': 0,
+        })
+        stage, state, count = row['stage'], row['state'], row['count']
+        if stage == IngestJob.FEED:
+            progress['state'] = state
+        elif stage == IngestJob.EXTRACT:
+            progress['entries'] += count
+        if state == IngestJob.DONE:
+            key = {IngestJob.EXTRACT: 'extracted', IngestJob.SUMMARIZE: 'summarized', IngestJob.TTS: 'completed'}
+            if stage in key:
+                progress[key[stage]] += count
+        elif state == IngestJob.FAILED:
+            progress['failed'] += count
+        elif state in (IngestJob.PENDING, IngestJob.RUNNING) and stage != IngestJob.FEED:
+            progress['in_progress'] += count
+
+    names = dict(Feed.objects.filter(url__in=[url for url in feeds if url]).values_list('url', 'name'))
+    failures = (
+        IngestJob.objects.filter(run=ingest_run, state=IngestJob.FAILED)
+        .order_by('-finished_at').values('stage', 'url', 'last_error', 'finished_at')[:20]
+    )
+    running = ingest_run.state == IngestRun.RUNNING
+    return {
+        'id': ingest_run.pk,
+        'state': ingest_run.state,
+        'trigger': ingest_run.trigger,
+        'started_at': ingest_run.started_at.isoformat(),
+        'finished_at': ingest_run.finished_at.isoformat() if ingest_run.finished_at else None,
+        'feeds_queued': ingest_run.feeds_queued,
+        'articles_created': _completed(ingest_run).count() if running else ingest_run.articles_created,
+        'failed_jobs': sum(progress['failed'] for progress in feeds.values()),
+        'counters': ingest_run.counters,
+        'timings': ingest_run.timings,
+        'error': ingest_run.error,
+        'feeds': [
+            {'url': url, 'name': names.get(url, url), **progress}
+            for url, progress in sorted(feeds.items(), key=lambda item: names.get(item[0], item[0] or ''))
+        ],
+        'failures': [
+            {
+                'stage': failure['stage'], 'url': failure['url'], 'error': failure['last_error'],
+                'at': failure['finished_at'].isoformat() if failure['finished_at'] else None,
+            }
+            for failure in failures
+        ],
+    }
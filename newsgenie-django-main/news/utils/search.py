@@ -0,0 +1,281 @@
+# Full-text search over article title, summary and content, ranked by
+# relevance. SQLite uses an FTS5 table (external content, so the text is
+# not stored twice) kept in sync by triggers; PostgreSQL a generated tsvector
+# column with a GIN index. Both follow every write path, including
+# bulk_create/bulk_update from ingestion and QuerySet.update(), since the
+# database maintains them. Other backends fall back to icontains filters.
+#
+# With SEARCH_BACKEND = 'index', views rank with the in-process BM25 index
+# (news.utils.search_index, see IndexResults) instead, once it has been built.
+#
+# SQLite drops a table's triggers when a migration rebuilds it (most
+# AddField/AlterField/RemoveField operations on Article): restore_index()
+# puts them back and refills the index after every migrate (post_migrate).
+import logging
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from news.utils.search_index import current_index
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'news_article_fts'
+
+# Column weights: a hit in the title counts most, then the summary, then the body.
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, summary, content, content='news_article', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON news_article BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, content)
+        VALUES (new.id, new.title, coalesce(new.summary, ''), new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON news_article BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, coalesce(old.summary, ''), old.content);
+    END""",
+    # Only text changes touch the index: approvals, audio and likes don't.
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, summary, content ON news_article BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, coalesce(old.summary, ''), old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, content)
+        VALUES (new.id, new.title, coalesce(new.summary, ''), new.content);
+    END""",
+]
+SQLITE_TRIGGERS = [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+SQLITE_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {trigger}" for trigger in SQLITE_TRIGGERS),
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_INSTALL = [
+    """ALTER TABLE news_article ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(summary, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(content, '')), 'C')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS news_article_search_vector ON news_article USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS news_article_search_vector",
+    "ALTER TABLE news_article DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def install_index(schema_editor, rebuild=True):
+    """Creates the index for the connection's backend (idempotent) and, on SQLite, fills it from news_article."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_INSTALL:
+            schema_editor.execute(statement)
+        if rebuild:
+            schema_editor.execute(SQLITE_REBUILD)
+    elif vendor == 'postgresql':
+        # The generated column is computed for existing rows as it is added.
+        for statement in POSTGRES_INSTALL:
+            schema_editor.execute(statement)
+    else:
+        logger.warning(f"No full-text index for the {vendor} backend; search falls back to icontains.")
+
+
+def uninstall_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+def restore_index(using=DEFAULT_DB_ALIAS):
+    """
+    Re-creates the SQLite sync triggers a table rebuild dropped and refills
+    the index, whose rows went stale meanwhile. Does nothing unless the FTS
+    table exists (it is created by migration 0028). Runs after every migrate;
+    returns True if the triggers had to be restored.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return False
+    names = [FTS_TABLE, *SQLITE_TRIGGERS]
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names,
+        )
+        present = {name for (name,) in cursor.fetchall()}
+        if FTS_TABLE not in present or present.issuperset(SQLITE_TRIGGERS):
+            return False
+        for statement in [*SQLITE_INSTALL, SQLITE_REBUILD]:
+            cursor.execute(statement)
+    logger.warning(f"Restored the full-text index triggers on {using}; the index was refilled.")
+    return True
+
+
+def terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def _fts5_query(words):
+    # Every word quoted, so user input can never be FTS5 syntax; implicit AND between them.
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def search_articles(articles, query):
+    """
+    `articles` narrowed to those matching every word of `query` in the
+    database index and annotated with `search_rank` (higher is more
+    relevant; 0.0 on backends without an index). Composes with any other
+    filter, annotation or ordering on the queryset.
+    """
+    words = terms(query)
+    if not words:
+        return articles.annotate(search_rank=Value(0.0)).none()
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        match = _fts5_query(words)
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        return articles.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        ).annotate(search_rank=RawSQL(
+            # bm25() is lower for better matches; negated so that higher ranks first, like ts_rank.
+            f"""SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s AND rowid = news_article.id""",
+            (match,), output_field=FloatField(),
+        ))
+    if vendor == 'postgresql':
+        tsquery = "plainto_tsquery('english', %s)"
+        return articles.filter(
+            pk__in=RawSQL(f"SELECT id FROM news_article WHERE search_vector @@ {tsquery}", (query,))
+        ).annotate(search_rank=RawSQL(
+            f"ts_rank_cd(news_article.search_vector, {tsquery})", (query,), output_field=FloatField(),
+        ))
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(summary__icontains=word) | Q(content__icontains=word)
+    return articles.filter(condition).annotate(search_rank=Value(0.0))
+
+
+def search_index_in_use():
+    """
+    The BM25 index when SEARCH_BACKEND = 'index' and it has been built and
+    caught up with the approved articles (see current_index), else None (use
+    search_articles).
+    """
+    if getattr(settings, 'SEARCH_BACKEND', 'database') != 'index':
+        return None
+    return current_index()
+
+
+# Up to this many matches are filtered and ordered with one pk__in
+# query; more are found by walking the ordered queryset ORDERED_CHUNK pks at a time.
+PK_LIST_LIMIT = 500
+ORDERED_CHUNK = 2000
+
+
+class IndexResults:
+    """
+    The articles of a (filtered) queryset that match `query` in the BM25
+    index, as a sequence for Paginator: len() counts the matches and a slice
+    loads only those articles, each with its score as `search_rank`. Best
+    first, or in `ordering` (order_by() arguments) when given. Every article
+    the queryset allows is searched, so filters never drop matches.
+
+    `filtered` says whether the queryset narrows the approved articles
+    (category, dates, likes...). When it does not, the index's own documents
+    are the allowed set and no pks are read from the database.
+    """
+
+    def __init__(self, articles, query, index, ordering=None, filtered=True):
+        self.articles = articles
+        self.query = query
+        self.index = index
+        self.ordering = ordering
+        self.filtered = filtered
+        self._total = None
+        self._index_total = None
+        self._allowed = None
+        self._ordered = None  # [(pk, score)] of the matches in `ordering`, read as far as pages asked
+        self._rows = None  # the rest of the ordered queryset, while it is being walked
+        self._seen = set()
+
+    def _matches_in_index(self):
+        if self._index_total is None:
+            self._index_total, _ = self.index.search(self.query, limit=0)
+        return self._index_total
+
+    def _few_matches(self):
+        return self._matches_in_index() <= PK_LIST_LIMIT
+
+    def _pks(self):
+        """The pks the index search is restricted to, or None when the queryset allows every indexed article."""
+        if not self.filtered:
+            return None
+        if self._allowed is None:
+            articles = self.articles.order_by()
+            if self._few_matches():
+                # Which of the few matches pass the filters: one query by pk.
+                _, hits = self.index.search(self.query, limit=None)
+                articles = articles.filter(pk__in=[pk for pk, _ in hits])
+            self._allowed = list(articles.values_list('pk', flat=True).distinct())
+        return self._allowed
+
+    def _matches(self, stop=None):
+        """The matches in `ordering`, read until at least `stop` are known (all with None)."""
+        if self._ordered is None:
+            self._ordered = []
+            if self._few_matches():
+                _, hits = self.index.search(self.query, limit=None)
+                scores = dict(hits)
+                rows = self.articles.filter(pk__in=list(scores)).order_by(*self.ordering).values_list('pk', flat=True)
+                self._ordered = [(pk, scores[pk]) for pk in dict.fromkeys(rows)]
+                self._total = len(self._ordered)
+            else:
+                # Many matches: walk the ordered queryset and keep its matches, stopping once the page is filled.
+                self._rows = self.articles.order_by(*self.ordering).values_list('pk', flat=True).iterator(ORDERED_CHUNK)
+        while self._rows is not None and (stop is None or len(self._ordered) < stop):
+            chunk = [pk for pk in islice(self._rows, ORDERED_CHUNK) if pk not in self._seen]
+            if not chunk:
+                self._rows = None
+                break
+            self._seen.update(chunk)
+            _, hits = self.index.search(self.query, limit=None, pks=chunk)
+            scores = dict(hits)
+            self._ordered.extend((pk, scores[pk]) for pk in chunk if pk in scores)
+        return self._ordered
+
+    def count(self):
+        if self._total is None:
+            if self.ordering and self._few_matches():
+                self._matches()
+            elif not self.filtered:
+                self._total = self._matches_in_index()
+            else:
+                self._total, _ = self.index.search(self.query, limit=0, pks=self._pks())
+        return self._total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if self.ordering:
+            hits = self._matches(stop)[start:stop]
+        else:
+            self._total, hits = self.index.search(
+                self.query, limit=None if stop is None else max(stop - start, 0), offset=start, pks=self._pks(),
+            )
+        articles = self.articles.order_by().in_bulk([pk for pk, _ in hits])
+        page = []
+        for pk, score in hits:
+            article = articles.get(pk)
+            if article is not None:  # None: deleted since the pks were read
+                article.search_rank = score
+                page.append(article)
+        return page
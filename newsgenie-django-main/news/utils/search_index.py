@@ -0,0 +1,893 @@
+# In-process BM25 search over approved articles. The index is an inverted
+# index of sorted, varint delta-encoded document numbers and term
+# frequencies per term, persisted to one file (SEARCH_INDEX_PATH) that every
+# process memory-maps: workers start warm, share the pages, and pick up a
+# newer file as soon as ingestion replaces it.
+#
+# Changes since the file was written are appended to a journal next to it
+# (SEARCH_INDEX_PATH + '.log') that every process replays into a small
+# in-memory segment, which queries merge with the mapped one. Once the
+# journal holds SEARCH_INDEX_MAX_LOG changes, save() folds them into a new
+# file and starts the journal over. Postings are decoded and scored with
+# numpy, so a query costs a few array passes over its terms' postings, not a
+# Python loop.
+#
+# The file is created by `manage.py build_bm25_index`; until then search
+# falls back to the database index (news.utils.search). Afterwards searches
+# first index the articles changed since the last sync (Article.updated_at),
+# so approvals in the admin or any other write path are found at once.
+import bisect
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import tempfile
+import threading
+import uuid
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'NGBM25\x00\x01'
+K1 = 1.2
+B = 0.75
+# Term frequency of a word in the title counts three times, in the summary twice (a simple BM25F).
+FIELD_WEIGHTS = (('title', 3), ('summary', 2), ('content', 1))
+MAX_TF = 255  # frequencies are stored in one byte
+MIN_PREFIX = 3
+# Terms in at least HEAD_MIN_DF documents keep the HEAD_SIZE they weigh most in (their head), so a
+# search for one of them alone ranks those instead of its whole list.
+HEAD_MIN_DF = 50_000
+HEAD_SIZE = 1000
+TOKEN_RE = re.compile(r'\w+')
+LOG_SUFFIX = '.log'
+LOCK_SUFFIX = '.lock'
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall((text or '').lower()) if len(token) > 1 and token not in ENGLISH_STOP_WORDS]
+
+
+def term_counts(title='', summary='', content=''):
+    """{term: weighted frequency} of an article's fields (see FIELD_WEIGHTS)."""
+    counts = Counter()
+    for (_, weight), text in zip(FIELD_WEIGHTS, (title, summary, content)):
+        for token in tokenize(text):
+            counts[token] += weight
+    return dict(counts)
+
+
+def parse_query(query):
+    """
+    (terms, prefix): the words every result must contain, and the last word
+    when it also matches as a prefix (search as you type), else None.
+    """
+    words = TOKEN_RE.findall((query or '').lower())
+    terms = tokenize(query)
+    prefix = words[-1] if words and len(words[-1]) >= MIN_PREFIX and words[-1] not in ENGLISH_STOP_WORDS else None
+    if prefix and terms and terms[-1] == prefix:
+        terms = terms[:-1]
+    return terms, prefix
+
+
+def encode_varints(values):
+    """LEB128 bytes of non-negative integers, vectorized. Returns (bytes array, bytes per value)."""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        sizes += values >= np.uint64(1 << shift)
+    ends = np.cumsum(sizes)
+    out = np.empty(int(ends[-1]) if len(values) else 0, dtype=np.uint8)
+    starts = ends - sizes
+    for k in range(int(sizes.max()) if len(values) else 0):
+        mask = sizes > k
+        byte = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (sizes[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[mask] + k] = (byte | more).astype(np.uint8)
+    return out, sizes
+
+
+def decode_varints(data):
+    data = np.asarray(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == len(data):
+        return data.astype(np.int64)  # every value fits in one byte
+    # Each value's last byte holds its highest bits; earlier bytes are folded in one pass per byte
+    # position, over only the values that long (posting deltas rarely take more than two).
+    values = data[ends].astype(np.int64)
+    sizes = np.diff(ends, prepend=-1)
+    for k in range(1, int(sizes.max())):
+        longer = np.flatnonzero(sizes > k)
+        values[longer] = (values[longer] << 7) | (data[ends[longer] - k] & 0x7F)
+    return values
+
+
+def write_index(path, vocab, term_ids, docnums, tfs, pks, lengths, synced_at=None, generation=None):
+    """
+    Writes an index file. Postings are (term_ids, docnums, tfs) in any order;
+    terms are positions in `vocab` (sorted), documents positions in `pks`
+    (ascending) and `lengths`. `synced_at` (a datetime) is kept in the header
+    for sync_index(); `generation` names the file for its journal.
+    """
+    order = np.lexsort((docnums, term_ids))
+    term_ids, docnums, tfs = term_ids[order], docnums[order].astype(np.int64), tfs[order]
+    df = np.bincount(term_ids, minlength=len(vocab)) if len(vocab) else np.zeros(0, np.int64)
+    post_offsets = np.zeros(len(vocab) + 1, dtype=np.uint64)
+    np.cumsum(df, out=post_offsets[1:])
+    deltas = docnums.copy()
+    deltas[1:] -= docnums[:-1]
+    first = post_offsets[:-1][df > 0].astype(np.int64)
+    deltas[first] = docnums[first]  # each term's list starts with an absolute number
+    data, sizes = encode_varints(deltas)
+    byte_ends = np.concatenate([[0], np.cumsum(sizes)]).astype(np.uint64)
+    byte_offsets = byte_ends[post_offsets.astype(np.int64)]
+    tfs = np.minimum(tfs, MAX_TF).astype(np.uint8)
+    head_terms, head_offsets, head_docs, head_tfs = _heads(df, post_offsets, docnums, tfs, lengths)
+
+    sections = [
+        ('vocab', np.frombuffer('\n'.join(vocab).encode('utf-8'), dtype=np.uint8)),
+        ('byte_offsets', byte_offsets),
+        ('post_offsets', post_offsets),
+        ('post_bytes', data),
+        ('post_tfs', tfs),
+        ('doc_pks', np.asarray(pks, dtype=np.int64)),
+        ('doc_lengths', np.asarray(lengths, dtype=np.uint32)),
+        ('head_terms', head_terms),
+        ('head_offsets', head_offsets),
+        ('head_docs', head_docs),
+        ('head_tfs', head_tfs),
+    ]
+    header, offset = {'terms': len(vocab), 'docs': len(pks), 'sections': {}}, 0
+    header['synced_at'] = synced_at.isoformat() if synced_at else None
+    header['generation'] = generation
+    for name, values in sections:
+        header['sections'][name] = [offset, len(values), values.dtype.str]
+        offset += (values.nbytes + 7) // 8 * 8
+    encoded = json.dumps(header).encode('utf-8')
+    start = (len(MAGIC) + 8 + len(encoded) + 7) // 8 * 8
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + len(encoded).to_bytes(8, 'little') + encoded)
+            for name, values in sections:
+                f.seek(start + header['sections'][name][0])
+                f.write(values.tobytes())
+            f.truncate(start + offset)
+        # Readers keep their mapping of the old file; the next refresh() maps this one.
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _heads(df, post_offsets, docnums, tfs, lengths):
+    """
+    (term ids, offsets, document numbers, tfs) of the heads: for each term
+    in HEAD_MIN_DF documents or more, the HEAD_SIZE documents with the
+    highest BM25 weight for it, in document order.
+    """
+    terms = np.flatnonzero(df >= max(HEAD_MIN_DF, HEAD_SIZE + 1))
+    lengths = np.asarray(lengths, dtype=np.float32)
+    average = max(float(lengths.mean()), 1.0) if len(lengths) else 1.0
+    docs, tfs_of = [], []
+    for term in terms:
+        start, end = int(post_offsets[term]), int(post_offsets[term + 1])
+        tf = tfs[start:end].astype(np.float32)
+        weight = tf / (tf + K1 * (1 - B + B * lengths[docnums[start:end]] / average))
+        top = np.sort(np.argpartition(-weight, HEAD_SIZE - 1)[:HEAD_SIZE])
+        docs.append(docnums[start:end][top])
+        tfs_of.append(tfs[start:end][top])
+    offsets = np.arange(len(terms) + 1, dtype=np.uint64) * HEAD_SIZE
+    if not docs:
+        return terms.astype(np.int64), offsets, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+    return terms.astype(np.int64), offsets, np.concatenate(docs), np.concatenate(tfs_of)
+
+
+def start_log(path, generation):
+    """Replaces the journal of the index file at `path` with an empty one for its `generation`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps({'generation': generation}).encode('utf-8') + b'\n')
+        os.replace(tmp_path, path + LOG_SUFFIX)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# index path -> [lock, depth] of its writer in this process, shared by every
+# SearchIndex of the file: flock() would block on a second descriptor.
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class IndexBusy(Exception):
+    """Raised by SearchIndex.writing(blocking=False) while another process writes the index."""
+
+
+def _intersect(found, docs):
+    """
+    (positions in `found`, positions in `docs`) of the documents in both
+    sorted arrays; binary searches go from the shorter array into the longer.
+    """
+    if len(docs) <= len(found):
+        at = np.minimum(np.searchsorted(found, docs), len(found) - 1)
+        hit = np.flatnonzero(found[at] == docs)
+        return at[hit], hit
+    at = np.minimum(np.searchsorted(docs, found), len(docs) - 1)
+    hit = np.flatnonzero(docs[at] == found)
+    return hit, at[hit]
+
+
+class SearchIndex:
+    """
+    A mapped index file plus the articles added or removed since it was
+    written, from its journal and this process's unsaved changes. Safe for
+    concurrent searches and updates from threads and processes; writers take
+    turns through writing().
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._load(None)
+
+    @property
+    def ready(self):
+        """True once the index file exists (or has been saved by this process)."""
+        return self._stamp is not None
+
+    @property
+    def dirty(self):
+        return bool(self._pending)
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _log_stamp(self):
+        try:
+            stat = os.stat(self.path + LOG_SUFFIX)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _load(self, stamp):
+        self._stamp = stamp
+        self._generation = None
+        self.synced_at = None  # when the index was last compared with the database (sync_index, update_index)
+        self._vocab = []
+        self._byte_offsets = self._post_offsets = np.zeros(1, dtype=np.uint64)
+        self._post_bytes = self._post_tfs = np.zeros(0, dtype=np.uint8)
+        self._base_pks = np.zeros(0, dtype=np.int64)
+        self._base_lengths = np.zeros(0, dtype=np.uint32)
+        self._head_terms = np.zeros(0, dtype=np.int64)
+        self._head_offsets = np.zeros(1, dtype=np.uint64)
+        self._head_docs, self._head_tfs = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        if stamp is not None:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a search index file")
+            size = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], 'little')
+            header = json.loads(mapped[len(MAGIC) + 8:len(MAGIC) + 8 + size])
+            if header.get('synced_at'):
+                self.synced_at = datetime.fromisoformat(header['synced_at'])
+            self._generation = header.get('generation')
+            start = (len(MAGIC) + 8 + size + 7) // 8 * 8
+            # Zero-copy views: pages are read on first use and shared with every process mapping the file.
+            views = {
+                name: np.frombuffer(mapped, dtype=np.dtype(dtype), count=count, offset=start + offset)
+                for name, (offset, count, dtype) in header['sections'].items()
+            }
+            self._vocab = views['vocab'].tobytes().decode('utf-8').split('\n') if header['terms'] else []
+            self._byte_offsets, self._post_offsets = views['byte_offsets'], views['post_offsets']
+            self._post_bytes, self._post_tfs = views['post_bytes'], views['post_tfs']
+            self._base_pks, self._base_lengths = views['doc_pks'], views['doc_lengths']
+            if 'head_terms' in views:  # files written before heads existed have none
+                self._head_terms, self._head_offsets = views['head_terms'], views['head_offsets']
+                self._head_docs, self._head_tfs = views['head_docs'], views['head_tfs']
+        self._new_pks, self._new_lengths = array('q'), array('I')
+        self._new_docs = {}      # pk -> document number, for documents added since the file was written
+        self._new_postings = {}  # term -> (array of document numbers, array of tfs)
+        self._deleted = set()    # document numbers of removed (or re-added) articles
+        self._pending = []       # unsaved changes, replayed over what other processes saved meanwhile
+        self._log_inode = None   # the journal read so far, and up to which byte
+        self._log_offset = 0
+        self._log_entries = 0    # changes applied from the journal
+        self._arrays = None
+
+    def refresh(self):
+        """
+        Maps the index file again if another process replaced it and applies
+        what was appended to its journal since, keeping this process's unsaved
+        changes. Returns True if anything changed.
+        """
+        stamp, log_stamp = self._file_stamp(), self._log_stamp()
+        if stamp == self._stamp and log_stamp in (None, (self._log_inode, self._log_offset)):
+            return False
+        with self._lock:
+            pending = self._pending
+            reloaded = stamp != self._stamp
+            if reloaded:
+                self._load(stamp)
+            read = self._read_log()
+            if (reloaded or read) and pending:
+                for change in pending:
+                    self._apply(*change)
+                self._pending = pending
+            return reloaded or read
+
+    def _read_log(self):
+        """Applies the journal entries written since the last read. Returns True if there were any."""
+        if self._generation is None:
+            return False  # not built yet, or written before journals existed
+        try:
+            with open(self.path + LOG_SUFFIX, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if self._log_offset and inode != self._log_inode:
+                    return False  # started over for a new index file, which the next refresh() maps
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        end = data.rfind(b'\n') + 1  # a line still being written is read next time
+        lines = data[:end].splitlines()
+        if not self._log_offset:
+            if not lines or json.loads(lines[0]).get('generation') != self._generation:
+                return False  # the journal of the file this one replaced, about to be started over
+            lines = lines[1:]
+        for line in lines:
+            entry = json.loads(line)
+            if entry[0] == 'synced':
+                self.synced_at = datetime.fromisoformat(entry[1])
+            else:
+                self._apply(*entry)
+                self._log_entries += 1
+        self._log_inode, self._log_offset = inode, self._log_offset + end
+        return bool(lines)
+
+    @contextmanager
+    def writing(self, blocking=True):
+        """
+        Makes the calling thread the index's only writer, in this process and
+        (through a lock file next to the index) every other. Reentrant.
+        With blocking=False, raises IndexBusy instead of waiting.
+        """
+        with _writers_lock:
+            writer = _writers.setdefault(self.path, [threading.RLock(), 0])
+        lock = writer[0]
+        if not lock.acquire(blocking=blocking):
+            raise IndexBusy(self.path)
+        try:
+            if writer[1] or fcntl is None:
+                writer[1] += 1
+                try:
+                    yield self
+                finally:
+                    writer[1] -= 1
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + LOCK_SUFFIX, 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    raise IndexBusy(self.path)
+                writer[1] += 1
+                try:
+                    yield self
+                finally:
+                    writer[1] -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock.release()
+
+    def __len__(self):
+        return int(self._snapshot()[2].sum())
+
+    def _docnum(self, pk):
+        if pk in self._new_docs:
+            return self._new_docs[pk]
+        i = int(np.searchsorted(self._base_pks, pk))
+        if i < len(self._base_pks) and self._base_pks[i] == pk:
+            return i
+        return None
+
+    def __contains__(self, pk):
+        docnum = self._docnum(pk)
+        return docnum is not None and docnum not in self._deleted
+
+    def add(self, pk, title='', summary='', content=''):
+        """Indexes (or re-indexes) the article `pk`."""
+        counts = term_counts(title, summary, content)
+        with self._lock:
+            self._apply('add', pk, counts)
+            self._pending.append(('add', pk, counts))
+
+    def remove(self, pk):
+        with self._lock:
+            if pk in self:
+                self._apply('remove', pk)
+                self._pending.append(('remove', pk))
+
+    def _apply(self, action, pk, counts=None):
+        docnum = self._docnum(pk)
+        if docnum is not None:
+            self._deleted.add(docnum)
+        self._new_docs.pop(pk, None)
+        if action == 'add':
+            docnum = len(self._base_pks) + len(self._new_pks)
+            self._new_pks.append(pk)
+            self._new_lengths.append(sum(counts.values()))
+            self._new_docs[pk] = docnum
+            for term, tf in counts.items():
+                docs, tfs = self._new_postings.setdefault(term, (array('q'), array('B')))
+                docs.append(docnum)
+                tfs.append(min(tf, MAX_TF))
+        self._arrays = None
+
+    def _snapshot(self):
+        """(pks, lengths, live, live count, average length) of all documents, rebuilt after changes."""
+        arrays = self._arrays
+        if arrays is None:
+            with self._lock:
+                pks = np.concatenate([self._base_pks, np.frombuffer(self._new_pks, dtype=np.int64)])
+                lengths = np.concatenate([self._base_lengths, np.frombuffer(self._new_lengths, dtype=np.uint32)]).astype(np.float32)
+                live = np.ones(len(pks), dtype=bool)
+                live[list(self._deleted)] = False
+                count = int(live.sum())
+                average = float(lengths[live].mean()) if count else 1.0
+                arrays = self._arrays = (pks, lengths, live, count, max(average, 1.0))
+        return arrays
+
+    def _postings(self, term):
+        """(document numbers, tfs) of `term` in the mapped and the in-memory segment."""
+        parts = []
+        i = bisect.bisect_left(self._vocab, term)
+        if i < len(self._vocab) and self._vocab[i] == term:
+            start, end = int(self._byte_offsets[i]), int(self._byte_offsets[i + 1])
+            docs = np.cumsum(decode_varints(self._post_bytes[start:end]))
+            parts.append((docs, self._post_tfs[int(self._post_offsets[i]):int(self._post_offsets[i + 1])]))
+        with self._lock:
+            new = self._new_postings.get(term)
+            if new is not None:
+                parts.append((np.array(new[0], dtype=np.int64), np.array(new[1], dtype=np.uint8)))
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def expand(self, prefix, limit=None):
+        """
+        Indexed terms starting with `prefix`, most frequent first: at most
+        `limit` (SEARCH_PREFIX_EXPANSIONS) and, after the first, only while
+        their postings fit in SEARCH_PREFIX_MAX_POSTINGS.
+        """
+        limit = limit or getattr(settings, 'SEARCH_PREFIX_EXPANSIONS', 10)
+        lo = bisect.bisect_left(self._vocab, prefix)
+        hi = bisect.bisect_left(self._vocab, prefix + '\U0010ffff')
+        df = np.diff(self._post_offsets[lo:hi + 1].astype(np.int64))
+        if len(df) > limit:
+            # Long tails of rare completions ("con..."): only the most frequent can make the cut.
+            top = np.argpartition(-df, limit - 1)[:limit]
+        else:
+            top = np.arange(len(df))
+        frequency = {self._vocab[lo + i]: int(df[i]) for i in top}
+        with self._lock:
+            for term, (docs, _) in self._new_postings.items():
+                if term.startswith(prefix):
+                    frequency[term] = frequency.get(term, 0) + len(docs)
+        terms, budget = [], getattr(settings, 'SEARCH_PREFIX_MAX_POSTINGS', 100_000)
+        for term in sorted(frequency, key=lambda term: (-frequency[term], term))[:limit]:
+            # Bounds the postings an unselective prefix ("sta") makes a query decode and score.
+            if terms and frequency[term] > budget:
+                break
+            terms.append(term)
+            budget -= frequency[term]
+        return terms
+
+    def search(self, query, limit=20, offset=0, pks=None):
+        """
+        BM25 search: articles containing every word of `query`, the last
+        word also matching as a prefix. Returns (total matches,
+        [(pk, score), ...] best first for `offset`:`offset + limit`, or all
+        of them with limit=None). `pks` (any iterable) restricts the search
+        to those articles, e.g. the ones a filtered queryset still allows.
+        """
+        terms, prefix = parse_query(query)
+        with self._lock:  # one consistent view, even if refresh() maps a new file meanwhile
+            self.refresh()
+            groups = [[term] for term in dict.fromkeys(terms)]
+            if prefix:
+                groups.append(self.expand(prefix))
+            if not groups or not all(groups):
+                return 0, []
+            allowed = None if pks is None else np.fromiter(pks, dtype=np.int64)
+            return self._search(groups, limit, offset, allowed)
+
+    def _search(self, groups, limit, offset, allowed=None):
+        pks, lengths, live, count, average = self._snapshot()
+        if allowed is None and limit is not None and len(groups) == 1 and len(groups[0]) == 1:
+            head = self._head(groups[0][0], offset + limit)
+            if head is not None:
+                total, found, scores = head
+                return total, self._ranked(pks, found, scores, limit, offset)
+        lists = []  # per group, the (sorted document numbers, tfs) of each of its terms
+        for group in groups:
+            postings = []
+            for term in group:
+                docs, tfs = self._postings(term)
+                if self._deleted:
+                    keep = live[docs]
+                    docs, tfs = docs[keep], tfs[keep]
+                if len(docs):
+                    postings.append((docs, tfs))
+            if not postings:
+                return 0, []
+            lists.append(postings)
+
+        # Candidates come from the most selective group; the others only need membership tests.
+        lists.sort(key=lambda postings: sum(len(docs) for docs, _ in postings))
+        first, rank = lists[0], None
+        if len(first) == 1:
+            found = first[0][0]
+        else:
+            union = np.zeros(len(pks), dtype=bool)
+            for docs, _ in first:
+                union[docs] = True
+            found = np.flatnonzero(union)
+            rank = np.empty(len(pks), dtype=np.int64)  # document number -> position in `found`, set for those only
+            rank[found] = np.arange(len(found))
+        if allowed is not None:
+            found, rank = found[np.isin(pks[found], allowed)], None
+            if not len(found):
+                return 0, []
+        for postings in lists[1:]:
+            member = np.zeros(len(found), dtype=bool)
+            for docs, _ in postings:
+                member[_intersect(found, docs)[0]] = True
+            found, rank = found[member], None
+            if not len(found):
+                return 0, []
+
+        scores = np.zeros(len(found), dtype=np.float32)
+        norms = K1 * (1 - B + B * lengths[found] / average)
+        for postings in lists:
+            for docs, tfs in postings:
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                if docs is found:
+                    at, tf = slice(None), tfs.astype(np.float32)
+                elif rank is not None and postings is first:
+                    at, tf = rank[docs], tfs.astype(np.float32)
+                else:
+                    at, positions = _intersect(found, docs)
+                    tf = tfs[positions].astype(np.float32)
+                scores[at] += idf * tf * (K1 + 1) / (tf + norms[at])
+
+        return len(found), self._ranked(pks, found, scores, limit, offset)
+
+    def _head(self, term, wanted):
+        """
+        (total, document numbers, scores) of a search for `term` alone, from
+        its head and the in-memory segment, when they hold its best `wanted`
+        documents; else None. Exact while the average document length is the
+        one the head was picked with: journaled changes barely move it
+        before the file is rewritten.
+        """
+        i = bisect.bisect_left(self._vocab, term)
+        if i == len(self._vocab) or self._vocab[i] != term:
+            return None
+        h = int(np.searchsorted(self._head_terms, i))
+        if h == len(self._head_terms) or self._head_terms[h] != i:
+            return None
+        pks, lengths, live, count, average = self._snapshot()
+        start, end = int(self._head_offsets[h]), int(self._head_offsets[h + 1])
+        docs, tfs = self._head_docs[start:end], self._head_tfs[start:end]
+        total = int(self._post_offsets[i + 1] - self._post_offsets[i])
+        if self._deleted and min(self._deleted) < len(self._base_pks):
+            keep = live[docs]
+            docs, tfs = docs[keep], tfs[keep]
+            listed = np.cumsum(decode_varints(self._post_bytes[int(self._byte_offsets[i]):int(self._byte_offsets[i + 1])]))
+            total = int(live[listed].sum())
+        if len(docs) < wanted:
+            return None  # the documents after the head may rank now
+        with self._lock:
+            new = self._new_postings.get(term, ((), ()))
+            new_docs, new_tfs = np.array(new[0], dtype=np.int64), np.array(new[1], dtype=np.uint8)
+        keep = live[new_docs]
+        docs, tfs = np.concatenate([docs, new_docs[keep]]), np.concatenate([tfs, new_tfs[keep]])
+        total += int(keep.sum())
+        idf = math.log(1 + (count - total + 0.5) / (total + 0.5))
+        tf = tfs.astype(np.float32)
+        norms = K1 * (1 - B + B * lengths[docs] / average)
+        return total, docs, idf * tf * (K1 + 1) / (tf + norms)
+
+    @staticmethod
+    def _ranked(pks, found, scores, limit, offset):
+        """[(pk, score)] of `found` (document numbers), best first, for `offset`:`offset + limit`."""
+        total = len(found)
+        wanted = total if limit is None else offset + limit
+        order = np.arange(total)
+        if wanted < total:
+            order = np.argpartition(-scores, wanted - 1)[:wanted]
+        order = order[np.argsort(-scores[order], kind='stable')][offset:wanted]
+        return [(int(pks[found[i]]), float(scores[i])) for i in order]
+
+    def save(self, replace=False, synced_at=None):
+        """
+        Persists this process's changes. They are appended to the journal,
+        unless it would then hold more than SEARCH_INDEX_MAX_LOG changes or
+        replace=True (a rebuild): the in-memory segment is then folded into a
+        new index file (live documents only, renumbered by pk) and the
+        journal starts over. Changes another process saved meanwhile are kept
+        unless replace=True. `synced_at` records a sync with the database.
+        Returns False when there was nothing to save.
+        """
+        with self.writing(), self._lock:
+            if not replace:
+                self.refresh()
+            if synced_at is not None:
+                self.synced_at = synced_at
+            if not self._pending and synced_at is None and self.ready and not replace:
+                return False
+            max_log = getattr(settings, 'SEARCH_INDEX_MAX_LOG', 5000)
+            if replace or self._log_inode is None or self._log_entries + len(self._pending) > max_log:
+                self._compact()
+            else:
+                self._append(synced_at)
+            return True
+
+    def _append(self, synced_at):
+        entries = [list(change) for change in self._pending]
+        if synced_at is not None:
+            entries.append(['synced', synced_at.isoformat()])
+        data = b''.join(json.dumps(entry).encode('utf-8') + b'\n' for entry in entries)
+        with open(self.path + LOG_SUFFIX, 'r+b') as f:
+            f.truncate(self._log_offset)  # drops a line a crashed writer left unfinished
+            f.seek(self._log_offset)
+            f.write(data)
+        self._log_offset += len(data)
+        self._log_entries += len(self._pending)
+        self._pending = []
+
+    def _compact(self):
+        with self._lock:
+            pks, lengths, live, _, _ = self._snapshot()
+
+            df = np.diff(self._post_offsets.astype(np.int64))
+            base_terms = np.repeat(np.arange(len(self._vocab)), df)
+            deltas = decode_varints(self._post_bytes)
+            running = np.cumsum(deltas)
+            starts = self._post_offsets[:-1].astype(np.int64)[df > 0]
+            restart = np.zeros(len(deltas), dtype=np.int64)
+            restart[starts[1:]] = running[starts[1:] - 1]  # each term's list restarts the running sum
+            base_docs = running - np.maximum.accumulate(restart)
+
+            vocab = sorted(set(self._vocab).union(self._new_postings))
+            position = {term: i for i, term in enumerate(vocab)}
+            remap = np.array([position[term] for term in self._vocab], dtype=np.int64)
+            new_terms, new_docs, new_tfs = [], [], []
+            for term, (docs, tfs) in self._new_postings.items():
+                new_terms.append(np.full(len(docs), position[term], dtype=np.int64))
+                new_docs.append(np.frombuffer(docs, dtype=np.int64))
+                new_tfs.append(np.frombuffer(tfs, dtype=np.uint8))
+            term_ids = np.concatenate([remap[base_terms]] + new_terms)
+            docnums = np.concatenate([base_docs] + new_docs)
+            tfs = np.concatenate([np.asarray(self._post_tfs)] + new_tfs)
+
+            keep = live[docnums]
+            order = np.flatnonzero(live)[np.argsort(pks[live], kind='stable')]
+            renumber = np.full(len(pks), -1, dtype=np.int64)
+            renumber[order] = np.arange(len(order))
+            used = np.zeros(len(vocab), dtype=bool)
+            used[term_ids[keep]] = True
+            compact = np.cumsum(used) - 1  # drops terms left without postings
+            generation = uuid.uuid4().hex
+            write_index(
+                self.path, [term for term, u in zip(vocab, used) if u], compact[term_ids[keep]],
+                renumber[docnums[keep]], tfs[keep], pks[order], lengths[order].astype(np.uint32),
+                synced_at=self.synced_at, generation=generation,
+            )
+            start_log(self.path, generation)
+            self._load(self._file_stamp())
+            self._read_log()
+            logger.info(f"Saved the search index: {len(order)} articles, {int(used.sum())} terms")
+
+
+def _fields(article):
+    return article.title, article.summary or '', article.content or ''
+
+
+def snippet(article, query, width=None):
+    """
+    The passage of the article's summary or content (whichever matches the
+    query first) with the most query words in `width` characters
+    (SEARCH_SNIPPET_CHARS), HTML-escaped with matches in <mark>.
+    """
+    width = width or getattr(settings, 'SEARCH_SNIPPET_CHARS', 200)
+    terms, prefix = parse_query(query)
+    terms = set(terms)
+
+    def matches(text):
+        return [
+            m for m in TOKEN_RE.finditer(text)
+            if m.group().lower() in terms or (prefix and m.group().lower().startswith(prefix))
+        ]
+    text, found = '', []
+    for candidate in (article.summary or '', article.content or ''):
+        found = matches(candidate)
+        if found:
+            text = candidate
+            break
+    text = text or article.summary or article.content or ''
+    if not found:
+        return escape(text[:width]) + ('…' if len(text) > width else '')
+
+    best = max(range(len(found)), key=lambda i: sum(1 for m in found[i:] if m.end() <= found[i].start() + width))
+    start = max(found[best].start() - width // 5, 0)
+    if start:
+        start = text.find(' ', start, found[best].start()) + 1 or found[best].start()
+    end = min(start + width, len(text))
+    pieces, at = [], start
+    for m in found:
+        if m.start() < start or m.end() > end:
+            continue
+        pieces.append(escape(text[at:m.start()]))
+        pieces.append(f"<mark>{escape(m.group())}</mark>")
+        at = m.end()
+    pieces.append(escape(text[at:end]))
+    return mark_safe(('…' if start else '') + ''.join(pieces).strip() + ('…' if end < len(text) else ''))
+
+
+def update_index(index=None, limit=None, batch_size=2000):
+    """
+    Catches the index up with the articles written since its last sync
+    (Article.updated_at, SEARCH_INDEX_SYNC_MARGIN seconds further back for
+    transactions that committed late): approved ones are indexed again and
+    the others removed. Returns the number of articles updated in the index,
+    or None when it has not been built or more than `limit` need updating
+    (left to build_bm25_index); unapproved articles it never held don't
+    count. With a `limit` (a search catching up), raises IndexBusy rather
+    than wait while another process writes the index.
+    """
+    from news.models import Article
+    index = index or get_search_index()
+    if not index.ready or index.synced_at is None:
+        return None
+    started = timezone.now()  # rows changed while this runs are picked up by the next update
+    since = index.synced_at - timedelta(seconds=getattr(settings, 'SEARCH_INDEX_SYNC_MARGIN', 60))
+    changed = Article.objects.filter(updated_at__gte=since).order_by().values_list('pk', 'approved')
+    approved, unpublished = [], []
+    for pk, ok in changed.iterator(batch_size):
+        if ok:
+            approved.append(pk)
+        elif pk in index:
+            unpublished.append(pk)
+    if limit is not None and len(approved) + len(unpublished) > limit:
+        return None
+    articles = []
+    for start in range(0, len(approved), batch_size):
+        batch = approved[start:start + batch_size]
+        articles.extend(Article.objects.filter(pk__in=batch).only('pk', 'title', 'summary', 'content'))
+    with index.writing(blocking=limit is None):
+        index.refresh()
+        if index.synced_at >= started:
+            return 0  # another process caught up meanwhile
+        for article in articles:
+            index.add(article.pk, *_fields(article))
+        for pk in unpublished:
+            index.remove(pk)
+        index.save(synced_at=started)
+    return len(articles) + len(unpublished)
+
+
+def current_index():
+    """
+    The process-wide index if it has been built, first caught up with the
+    articles written since its last sync (approved, unapproved or edited, in
+    the admin or any other way), so its counts and pages match the database.
+    None when it is not built, or when more than SEARCH_INDEX_CATCH_UP
+    articles need updating or the catch-up fails: search with the database
+    index meanwhile.
+    """
+    from news.models import Article
+    index = get_search_index()
+    if not index.ready:
+        return None
+    newest = Article.objects.aggregate(newest=Max('updated_at'))['newest']
+    if newest is None or (index.synced_at is not None and newest < index.synced_at):
+        return index
+    try:
+        if update_index(index, limit=getattr(settings, 'SEARCH_INDEX_CATCH_UP', 500)) is not None:
+            return index
+        logger.warning("The search index is far behind the database; searching the database until build_bm25_index runs.")
+    except IndexBusy:
+        pass  # another process is writing the index; the database answers this search
+    except Exception as e:
+        logger.error(f"Catching the search index up failed: {e}")
+    return None
+
+
+def sync_index(index=None, rebuild=False, batch_size=2000):
+    """
+    Brings the index in line with the database and saves it: adds approved
+    articles it is missing, re-indexes those whose text changed since the
+    last sync (Article.updated_at, compared with the stamp in the file) and
+    removes those no longer approved. rebuild=True re-indexes every approved
+    article. Returns (added, updated, removed).
+    """
+    from news.models import Article
+    index = index or get_search_index()
+    with index.writing():
+        index.refresh()
+        if rebuild:
+            index = SearchIndex(index.path)  # starts empty; the current file is replaced
+        started = timezone.now()  # rows changed while this runs are picked up by the next sync
+        approved = set(Article.objects.filter(approved=True).values_list('pk', flat=True))
+        pks, _, live, _, _ = index._snapshot()
+        indexed = {int(pk) for pk in pks[live]}
+        missing = approved - indexed
+        changed = set()
+        if index.synced_at is not None:
+            changed = set(
+                Article.objects.filter(approved=True, updated_at__gte=index.synced_at).values_list('pk', flat=True)
+            ) & indexed
+        stale = sorted(missing | changed)
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            for article in Article.objects.filter(pk__in=batch).only('pk', 'title', 'summary', 'content'):
+                index.add(article.pk, *_fields(article))
+        removed = indexed - approved
+        for pk in removed:
+            index.remove(pk)
+        index.save(replace=rebuild, synced_at=started)
+    if rebuild:
+        reset_search_index()
+    return len(missing), len(changed), len(removed)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """The process-wide index, mapped from settings.SEARCH_INDEX_PATH and refreshed when the file changes."""
+    global _index
+    with _index_lock:
+        path = str(getattr(settings, 'SEARCH_INDEX_PATH', os.path.join(settings.BASE_DIR, 'search_index', 'articles.idx')))
+        if _index is None or _index.path != path:
+            _index = SearchIndex(path)
+    _index.refresh()
+    return _index
+
+
+def reset_search_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,46 @@
+# Request coalescing ("single flight") for on-demand generation. The first
+# request for a key takes a RunLock lease named after it and does the work;
+# requests arriving meanwhile wait for it or are told the result is pending.
+# The lease is a database row, so it holds across every worker process and
+# node whatever the cache backend. Leases expire after a TTL, so a crashed
+# worker never blocks a key for good; released ones are deleted.
+import time
+import uuid
+
+from django.conf import settings
+
+from news.utils import locks
+
+KEY_PREFIX = 'singleflight:'
+
+
+def default_ttl():
+    return getattr(settings, 'SINGLEFLIGHT_TTL', 120)
+
+
+def claim(key, ttl=None):
+    """Takes the flight for `key`. Returns a token for release(), or None if another request holds it."""
+    token = uuid.uuid4().hex
+    if locks.acquire(KEY_PREFIX + key, token, ttl or default_ttl()):
+        return token
+    return None
+
+
+def release(key, token):
+    """Ends the flight if `token` still holds it (it may have expired and been claimed again)."""
+    locks.discard(KEY_PREFIX + key, token)
+
+
+def in_flight(key):
+    return locks.holder(KEY_PREFIX + key) is not None
+
+
+def wait(key, timeout, interval=0.2):
+    """Waits up to `timeout` seconds for the flight on `key` to end. Returns True if it did."""
+    deadline = time.monotonic() + timeout
+    while in_flight(key):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+    return True
@@ -0,0 +1,417 @@
+import logging
+import os
+import json
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import google.api_core.exceptions
+import google.generativeai as genai
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from news.utils import summary_cache
+from news.utils.extractive import extractive_summary
+from news.utils.ratelimit import RateLimiter, RateLimitTimeout, backoff_delay
+
+genai.configure(api_key=os.environ.get('YOUR API KEY'))
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = "Please act as a news editor. Summarize the following article concisely in a neutral, professional tone. The summary should be about 6-7 sentences long:\n\n---\n\n{content}"
+# Map-reduce prompts for articles over SUMMARY_INPUT_TOKEN_BUDGET.
+CHUNK_PROMPT = "Please act as a news editor. Summarize this part of a longer news article in 2-3 neutral sentences, keeping names, numbers and dates:\n\n---\n\n{content}"
+REDUCE_PROMPT = "Please act as a news editor. These are summaries of consecutive parts of one news article. Combine them into a single concise, neutral, professional summary of about 6-7 sentences:\n\n---\n\n{content}"
+# Several short articles packed into one request; the reply must be a JSON object keyed by article id.
+BATCH_PROMPT = "Please act as a news editor. Summarize each of the following news articles separately, concisely and in a neutral, professional tone, in about 6-7 sentences each. Reply with JSON only: one object that maps every article id to its summary, e.g. {{\"a1\": \"...\", \"a2\": \"...\"}}.\n\n{articles}"
+BATCH_ARTICLE = "=== ARTICLE {id} ===\n{content}"
+SUMMARY_OUTPUT_TOKENS = 300  # rough size of a 6-7 sentence answer, reserved against the TPM quota
+SUMMARY_PROMPT_VERSION = summary_cache.prompt_version(SUMMARY_PROMPT + CHUNK_PROMPT + REDUCE_PROMPT + BATCH_PROMPT)
+
+BOILERPLATE_RE = re.compile(
+    r'^(share this|share on|follow (us|bbc)|sign up|subscribe|related topics|more on this story|read more'
+    r'|image (source|caption)|getty images|copyright|advertisement|listen to|watch:|click here)',
+    re.IGNORECASE,
+)
+
+
+class SummaryError(Exception):
+    """Raised by get_summary_from_gemini(raise_on_failure=True) instead of returning a fallback message."""
+
+
+class SummaryBusy(SummaryError):
+    """The Gemini quota could not serve the request within the caller's max_wait."""
+
+
+class GeminiClient:
+    """Thin wrapper around google.generativeai so callers only see generate(prompt) -> text."""
+
+    def __init__(self, model_name=None):
+        self.model = genai.GenerativeModel(model_name or getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash-latest'))
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+
+_client = None
+_limiter = None
+_singleton_lock = threading.Lock()
+
+
+def get_model_client():
+    """
+    The process-wide model client, built from settings.GEMINI_CLIENT (a dotted
+    class path) with settings.GEMINI_CLIENT_OPTIONS as keyword arguments.
+    """
+    global _client
+    with _singleton_lock:
+        if _client is None:
+            client_class = import_string(getattr(settings, 'GEMINI_CLIENT', 'news.utils.summarizer.GeminiClient'))
+            _client = client_class(**getattr(settings, 'GEMINI_CLIENT_OPTIONS', {}))
+        return _client
+
+
+def get_rate_limiter():
+    """The process-wide limiter sized from settings.GEMINI_RATE_LIMIT."""
+    global _limiter
+    with _singleton_lock:
+        if _limiter is None:
+            config = getattr(settings, 'GEMINI_RATE_LIMIT', {})
+            _limiter = RateLimiter(
+                requests_per_minute=config.get('requests_per_minute', 15),
+                tokens_per_minute=config.get('tokens_per_minute', 1_000_000),
+                max_in_flight=config.get('max_in_flight', 4),
+                shared=config.get('shared', False),
+            )
+        return _limiter
+
+
+def reset_summarizer():
+    """Drops the cached client and limiter so they are rebuilt from the current settings."""
+    global _client, _limiter
+    with _singleton_lock:
+        _client = None
+        _limiter = None
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def model_stats():
+    """Process-wide {'calls', 'tokens_sent', 'rate_limited', 'errors'} for model requests since start-up."""
+    with _stats_lock:
+        return {name: _stats[name] for name in ('calls', 'tokens_sent', 'rate_limited', 'errors')}
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def model_name():
+    return getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash-latest')
+
+
+def _generate(prompt, client, limiter, deadline, output_tokens=SUMMARY_OUTPUT_TOKENS):
+    """
+    One model call under the limiter, retried with jittered backoff on quota
+    errors. Raises SummaryBusy when quota does not free up in time, SummaryError otherwise.
+    """
+    tokens = estimate_tokens(prompt) + output_tokens
+    max_retries = getattr(settings, 'GEMINI_MAX_RETRIES', 4)
+
+    for attempt in range(max_retries):
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+        try:
+            with limiter.slot(tokens, timeout=remaining):
+                _count('calls')
+                _count('tokens_sent', tokens - output_tokens)
+                return client.generate(prompt)
+
+        except RateLimitTimeout as e:
+            raise SummaryBusy(f"Gemini quota busy, not waiting another {e.wait:.0f}s") from e
+
+        except google.api_core.exceptions.ResourceExhausted:
+            # Pause everyone sharing the limiter, not just this thread.
+            delay = backoff_delay(
+                attempt,
+                base=getattr(settings, 'GEMINI_BACKOFF_BASE', 2.0),
+                cap=getattr(settings, 'GEMINI_BACKOFF_CAP', 60.0),
+            )
+            limiter.pause(delay)
+            _count('rate_limited')
+            logger.warning(f"Rate limit hit. Backing off {delay:.1f}s before retrying... (Attempt {attempt + 1}/{max_retries})")
+
+        except Exception as e:
+            _count('errors')
+            raise SummaryError(str(e)) from e
+
+    raise SummaryBusy("All retry attempts failed due to rate limiting.")
+
+
+def trim_boilerplate(text):
+    """
+    Drops share/follow/caption/newsletter lines and repeated paragraphs that
+    scrapers pick up around the story, so they don't cost input tokens.
+    """
+    kept = []
+    seen = set()
+    for paragraph in (text or '').splitlines():
+        paragraph = re.sub(r'\s+', ' ', paragraph).strip()
+        if not paragraph or BOILERPLATE_RE.search(paragraph):
+            continue
+        key = paragraph.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(paragraph)
+    return '\n\n'.join(kept)
+
+
+def split_into_chunks(text, budget):
+    """
+    Packs paragraphs into chunks of at most `budget` estimated tokens. A
+    paragraph that is too long on its own is split at sentence boundaries
+    (and, failing that, at a hard character limit).
+    """
+    max_chars = budget * 4
+    pieces = []
+    for paragraph in text.split('\n\n'):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+
+    chunks, current = [], ''
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if current and estimate_tokens(candidate) > budget:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _map_reduce(text, budget, client, limiter, deadline):
+    """Summarizes budget-sized chunks in parallel, then merges the partial summaries into one."""
+    chunks = split_into_chunks(text, budget)
+    max_chunks = getattr(settings, 'SUMMARY_MAX_CHUNKS', 6)
+    if len(chunks) > max_chunks:
+        # News is front-loaded; dropping the tail keeps cost and latency per article bounded.
+        logger.info(f"Article has {len(chunks)} chunks, summarizing the first {max_chunks}.")
+        chunks = chunks[:max_chunks]
+
+    with ThreadPoolExecutor(max_workers=min(len(chunks), limiter.max_in_flight), thread_name_prefix='summarize-chunk') as pool:
+        partials = list(pool.map(
+            lambda chunk: _generate(CHUNK_PROMPT.format(content=chunk), client, limiter, deadline), chunks
+        ))
+
+    combined = '\n\n'.join(partials)
+    if estimate_tokens(combined) > budget:
+        combined = split_into_chunks(combined, budget)[0]
+    return _generate(REDUCE_PROMPT.format(content=combined), client, limiter, deadline)
+
+
+def _summarize(text, client, limiter, deadline):
+    """Single-article summary: one call, or map-reduce when over SUMMARY_INPUT_TOKEN_BUDGET."""
+    budget = getattr(settings, 'SUMMARY_INPUT_TOKEN_BUDGET', 3000)
+    if estimate_tokens(text) <= budget:
+        return _generate(SUMMARY_PROMPT.format(content=text), client, limiter, deadline)
+    return _map_reduce(text, budget, client, limiter, deadline)
+
+
+def fallback_summary(content):
+    """Local extractive summary of `content` for when Gemini cannot be reached ('' if it has no usable sentences)."""
+    return extractive_summary(content)
+
+
+def get_summary_from_gemini(content, raise_on_failure=False, client=None, max_wait=None, use_cache=True, db_guard=nullcontext):
+    """
+    Generates a summary using Gemini under the shared rate limiter.
+
+    Summaries are read through the SummaryCache table, keyed by the hash of
+    the normalized text plus prompt version and model, so identical stories
+    (syndicated copies, re-triggered summaries) cost one LLM call.
+
+    Boilerplate is trimmed first; articles still longer than
+    SUMMARY_INPUT_TOKEN_BUDGET are summarized map-reduce style (chunks in
+    parallel, then one merge call) so no single prompt exceeds the budget.
+
+    Quota errors pause every caller of the limiter and are retried with
+    jittered exponential backoff. `max_wait` bounds the total time spent
+    waiting for quota, so web requests give up quickly instead of blocking a
+    worker. With raise_on_failure=True, errors raise SummaryError (SummaryBusy
+    when the quota is exhausted); otherwise a local extractive summary is
+    returned (see fallback_summary), never an error message. `db_guard` is
+    entered around the cache reads and writes, so concurrent callers can
+    serialize them.
+    """
+    if not content or len(content) < 200:
+        logger.warning("Content too short for Gemini summary, skipping.")
+        if raise_on_failure:
+            raise SummaryError("Content too short to summarize.")
+        return fallback_summary(content or '')
+
+    if use_cache:
+        with db_guard():
+            cached = summary_cache.lookup(content, SUMMARY_PROMPT_VERSION, model_name())
+        if cached:
+            logger.info("Summary served from the summary cache.")
+            return cached
+
+    client = client or get_model_client()
+    limiter = get_rate_limiter()
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+
+    try:
+        summary = _summarize(trim_boilerplate(content) or content, client, limiter, deadline)
+    except SummaryBusy as e:
+        logger.error(f"Gemini summary not generated: {e}")
+        if raise_on_failure:
+            raise
+        return fallback_summary(content)
+    except SummaryError as e:
+        # For any other error, we just log it and stop
+        logger.error(f"A non-rate-limit Gemini error occurred: {e}")
+        if raise_on_failure:
+            raise
+        return fallback_summary(content)
+
+    logger.info("Successfully generated summary with Gemini.")
+    if use_cache and summary:
+        with db_guard():
+            summary_cache.store(content, SUMMARY_PROMPT_VERSION, model_name(), summary)
+    return summary
+
+
+def _parse_batch_reply(reply, ids):
+    """
+    Extracts {article id: summary} from a batch reply. Tolerates code fences and
+    prose around the JSON object; raises ValueError when there is no usable object.
+    """
+    match = re.search(r'\{.*\}', reply or '', re.S)
+    if not match:
+        raise ValueError("no JSON object in batch reply")
+    data = json.loads(match.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("batch reply is not a JSON object")
+    return {
+        article_id: data[article_id].strip()
+        for article_id in ids
+        if isinstance(data.get(article_id), str) and data[article_id].strip()
+    }
+
+
+def _pack_batches(indexes, texts):
+    """Groups article indexes into batches bounded by SUMMARY_BATCH_SIZE and SUMMARY_BATCH_TOKEN_BUDGET."""
+    batch_size = getattr(settings, 'SUMMARY_BATCH_SIZE', 5)
+    budget = getattr(settings, 'SUMMARY_BATCH_TOKEN_BUDGET', 6000)
+    batches, current, used = [], [], 0
+    for index in indexes:
+        tokens = estimate_tokens(texts[index])
+        if current and (len(current) >= batch_size or used + tokens > budget):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def summarize_batch(contents, client=None, max_wait=None, use_cache=True, db_guard=nullcontext):
+    """
+    Summarizes several articles with as few requests as possible: short
+    articles are packed into one structured request per batch and the JSON
+    reply is mapped back by article id. Articles missing from the reply, or
+    from a reply that cannot be parsed, fall back to single-article calls;
+    articles over SUMMARY_BATCH_MAX_ARTICLE_TOKENS always go alone.
+
+    Returns one entry per input, in order: the summary, or None when no
+    summary could be generated (the caller decides whether to retry).
+    `db_guard` is entered around the cache reads and writes.
+    """
+    results = [None] * len(contents)
+    pending = []
+    for index, content in enumerate(contents):
+        if not content or len(content) < 200:
+            continue  # too short to summarize: None, like any other article without a summary
+        if use_cache:
+            with db_guard():
+                cached = summary_cache.lookup(content, SUMMARY_PROMPT_VERSION, model_name())
+            if cached:
+                results[index] = cached
+                continue
+        pending.append(index)
+    if not pending:
+        return results
+
+    client = client or get_model_client()
+    limiter = get_rate_limiter()
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+    texts = {index: trim_boilerplate(contents[index]) or contents[index] for index in pending}
+
+    def finish(index, summary):
+        results[index] = summary
+        if use_cache:
+            with db_guard():
+                summary_cache.store(contents[index], SUMMARY_PROMPT_VERSION, model_name(), summary)
+
+    max_article_tokens = getattr(settings, 'SUMMARY_BATCH_MAX_ARTICLE_TOKENS', 1500)
+    singles = [index for index in pending if estimate_tokens(texts[index]) > max_article_tokens]
+    batchable = [index for index in pending if index not in singles]
+
+    for batch in _pack_batches(batchable, texts):
+        if len(batch) == 1:
+            singles.extend(batch)
+            continue
+        ids = {f"a{position + 1}": index for position, index in enumerate(batch)}
+        prompt = BATCH_PROMPT.format(articles='\n\n'.join(
+            BATCH_ARTICLE.format(id=article_id, content=texts[index]) for article_id, index in ids.items()
+        ))
+        try:
+            reply = _generate(prompt, client, limiter, deadline, output_tokens=SUMMARY_OUTPUT_TOKENS * len(batch))
+            parsed = _parse_batch_reply(reply, ids)
+        except SummaryBusy as e:
+            logger.warning(f"Batch of {len(batch)} summaries not generated: {e}")
+            continue
+        except (SummaryError, ValueError) as e:
+            logger.warning(f"Batch summary reply unusable ({e}); falling back to single-article requests.")
+            parsed = {}
+        logger.info(f"Batch request summarized {len(parsed)}/{len(batch)} articles.")
+        for article_id, index in ids.items():
+            if article_id in parsed:
+                finish(index, parsed[article_id])
+            else:
+                singles.append(index)
+
+    for index in singles:
+        try:
+            finish(index, _summarize(texts[index], client, limiter, deadline))
+        except SummaryError as e:
+            logger.error(f"Single-article summary failed: {e}")
+    return results
+
+
+def summarize_many(contents, client=None, max_wait=None, use_cache=True):
+    """
+    Summarizes several texts concurrently, at most GEMINI_RATE_LIMIT['max_in_flight']
+    at a time and always within the shared RPM/TPM quota. Returns summaries in input order.
+    """
+    limiter = get_rate_limiter()
+    with ThreadPoolExecutor(max_workers=limiter.max_in_flight, thread_name_prefix='summarize') as pool:
+        futures = [pool.submit(get_summary_from_gemini, content, False, client, max_wait, use_cache) for content in contents]
+        return [future.result() for future in futures]
@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from news.models import SummaryCache
+
+logger = logging.getLogger(__name__)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    """Process-wide {'hits': n, 'misses': n, 'stores': n} since start-up."""
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses'], 'stores': _stats['stores']}
+
+
+def normalize_text(text):
+    """Unicode-normalized, lower-cased text with collapsed whitespace, so trivial copies hash the same."""
+    text = unicodedata.normalize('NFKC', text or '')
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def content_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def prompt_version(prompt_template):
+    """Short fingerprint of a prompt template; editing the prompt invalidates its cache entries."""
+    return hashlib.sha256(prompt_template.encode('utf-8')).hexdigest()[:12]
+
+
+def lookup(text, version, model_name):
+    """Returns the cached summary for text, or None. Counts a hit or a miss."""
+    entry = SummaryCache.objects.filter(
+        content_hash=content_hash(text), prompt_version=version, model_name=model_name
+    ).only('pk', 'summary').first()
+    if entry is None:
+        _count('misses')
+        return None
+    SummaryCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    _count('hits')
+    return entry.summary
+
+
+def store(text, version, model_name, summary):
+    """Saves a freshly generated summary. Failures are logged, never raised: the cache is best effort."""
+    try:
+        SummaryCache.objects.update_or_create(
+            content_hash=content_hash(text), prompt_version=version, model_name=model_name,
+            defaults={'summary': summary},
+        )
+        _count('stores')
+    except IntegrityError:
+        pass  # a concurrent caller stored the same summary first
+    except Exception as e:
+        logger.warning(f"Could not store summary in cache: {e}")
+
+
+def prune(current_version, current_model, older_than=None, dry_run=False):
+    """
+    Deletes entries made with another prompt version or model and, if
+    `older_than` (a timedelta) is given, entries unused for that long.
+    Returns the number of entries deleted (or that would be deleted).
+    """
+    stale = SummaryCache.objects.exclude(prompt_version=current_version, model_name=current_model)
+    if older_than is not None:
+        stale = stale | SummaryCache.objects.filter(last_used_at__lt=timezone.now() - older_than)
+    if dry_run:
+        return stale.count()
+    deleted, _ = stale.delete()
+    return deleted
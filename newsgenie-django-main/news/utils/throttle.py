@@ -0,0 +1,48 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+
+class HostThrottle:
+    """
+    Keeps at least `delay` seconds between two requests to the same host.
+    Each caller reserves the next free slot for its host under a lock and then
+    sleeps outside the lock, so different hosts never wait on each other.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        if not self.delay:
+            return
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class StageLimits:
+    """
+    One bounded semaphore per ingestion stage (feed, extract, summarize, tts, db).
+    A limit of None (or a missing stage) means the stage is not limited.
+    """
+
+    def __init__(self, limits=None):
+        self._semaphores = {
+            stage: threading.BoundedSemaphore(limit)
+            for stage, limit in (limits or {}).items()
+            if limit
+        }
+
+    @contextmanager
+    def stage(self, name):
+        semaphore = self._semaphores.get(name)
+        with semaphore if semaphore is not None else nullcontext():
+            yield
@@ -0,0 +1,324 @@
+# Text-to-speech off the request threads. gTTS calls go through a bounded
+# queue to a small pool of worker threads, and every MP3 is stored under the
+# sha256 of its cleaned text and voice settings, so identical summaries share
+# one file and are never voiced twice. The file on disk is the source of
+# truth: any process can tell whether a summary's audio exists.
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection
+from gtts import gTTS
+
+from news.utils import singleflight
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = 'news_audio'
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+MISSING = 'missing'
+
+
+class TTSBusy(Exception):
+    """The TTS queue is full; try again later."""
+
+
+def clean_text_for_speech(text):
+    """Clean text to improve speech synthesis."""
+    if not text:
+        return ""
+    text = re.sub(r'[\r\n]+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s,.!?\'"]', '', text)
+    return text.strip()
+
+
+def voice_settings():
+    return {
+        'lang': getattr(settings, 'TTS_LANG', 'en'),
+        'slow': getattr(settings, 'TTS_SLOW', False),
+    }
+
+
+def audio_key(cleaned_text, voice=None):
+    """sha256 of the cleaned text and the voice settings it is spoken with."""
+    payload = json.dumps({'text': cleaned_text, **(voice or voice_settings())}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def audio_name(key):
+    """Storage name (relative to MEDIA_ROOT) of the MP3 for `key`, as stored in Article.audio_file."""
+    return f"{AUDIO_DIR}/{key[:2]}/{key}.mp3"
+
+
+def _audio_path(name):
+    return os.path.join(str(settings.MEDIA_ROOT), *name.split('/'))
+
+
+def existing_audio(text):
+    """Storage name of the already generated audio for `text`, or None."""
+    cleaned = clean_text_for_speech(text)
+    if not cleaned:
+        return None
+    name = audio_name(audio_key(cleaned))
+    return name if os.path.exists(_audio_path(name)) else None
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def tts_stats():
+    """Process-wide {'synthesized', 'reused', 'errors'} for audio requests since start-up."""
+    with _stats_lock:
+        return {name: _stats[name] for name in ('synthesized', 'reused', 'errors')}
+
+
+def _synthesize(cleaned, voice):
+    """Runs in a pool worker: voices `cleaned` unless its file already exists. Returns the storage name."""
+    name = audio_name(audio_key(cleaned, voice))
+    path = _audio_path(name)
+    if os.path.exists(path):
+        _count('reused')
+        return name
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a concurrent reader (or a second worker voicing the same text) never sees a half-written file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        gTTS(text=cleaned, lang=voice['lang'], slow=voice['slow']).save(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        _count('errors')
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _count('synthesized')
+    logger.info(f"Audio saved at {path}")
+    return name
+
+
+class TTSPool:
+    """
+    A fixed number of worker threads fed from a bounded queue. Requests for
+    text that is already queued or being voiced share the same Future.
+    """
+
+    def __init__(self, workers, queue_size, remember_failures=500):
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._lock = threading.Lock()
+        self._pending = {}               # audio key -> Future
+        self._failures = OrderedDict()   # audio key -> error of its last attempt
+        self._remember_failures = remember_failures
+        self._threads = [
+            threading.Thread(target=self._work, name=f'tts-{n}', daemon=True) for n in range(max(workers, 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, text, block=True, timeout=None):
+        """
+        Queues `text` for voicing and returns a Future of its storage name.
+        Raises ValueError for text with nothing to say, and TTSBusy when the
+        queue stays full (at once when block=False).
+        """
+        cleaned = clean_text_for_speech(text)
+        if not cleaned:
+            raise ValueError("Nothing to voice after cleaning the text")
+        voice = voice_settings()
+        key = audio_key(cleaned, voice)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._pending[key] = Future()
+            self._failures.pop(key, None)
+        try:
+            self._queue.put((key, cleaned, voice, future), block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise TTSBusy("Too many audio summaries are queued")
+        return future
+
+    def state(self, text):
+        """(state, detail) of `text` in this process: PENDING, FAILED with the error, or MISSING."""
+        key = audio_key(clean_text_for_speech(text))
+        with self._lock:
+            if key in self._pending:
+                return PENDING, None
+            if key in self._failures:
+                return FAILED, self._failures[key]
+        return MISSING, None
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def in_worker(self):
+        """True when called from one of this pool's worker threads."""
+        return threading.current_thread() in self._threads
+
+    def shutdown(self):
+        """Cancels what is still queued and stops the workers once their current request is done."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[3].cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            key, cleaned, voice, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(_synthesize(cleaned, voice))
+            except Exception as e:
+                logger.error(f"Audio generation failed for {key[:12]}: {e}")
+                with self._lock:
+                    self._failures[key] = str(e)
+                    while len(self._failures) > self._remember_failures:
+                        self._failures.popitem(last=False)
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tts_pool():
+    """The process-wide TTS pool, sized by settings.TTS_WORKERS and TTS_QUEUE_SIZE."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TTSPool(getattr(settings, 'TTS_WORKERS', 2), getattr(settings, 'TTS_QUEUE_SIZE', 100))
+        return _pool
+
+
+def shutdown_tts_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+
+atexit.register(shutdown_tts_pool)
+
+
+def _flight(text):
+    """Single-flight key of the audio for `text`: identical summaries are voiced once across processes."""
+    return f"audio:{audio_key(clean_text_for_speech(text))}"
+
+
+def generate_audio(text):
+    """
+    Voices `text` through the pool and waits for it (ingestion). Returns the
+    storage name of the MP3, or None if there was nothing to say or TTS failed.
+    When another process is already voicing the same text, waits for its file;
+    if that flight outlasts the wait, returns None instead of voicing it again
+    (the file will appear under the shared name).
+    """
+    name = existing_audio(text)
+    if name:
+        _count('reused')
+        return name
+    if not clean_text_for_speech(text):
+        logger.warning("No text left for audio generation after cleaning")
+        return None
+    pool = get_tts_pool()
+    flight = _flight(text)
+    token = singleflight.claim(flight)
+    if token is None and pool.state(text)[0] != PENDING:
+        if not singleflight.wait(flight, singleflight.default_ttl()):
+            logger.warning("Audio for this text is still being voiced elsewhere; not voicing it twice")
+            return None
+        name = existing_audio(text)
+        if name:
+            _count('reused')
+            return name
+        # The other flight ended without a file (it failed): voice it here, under our own flight.
+        token = singleflight.claim(flight)
+        if token is None:
+            return None
+    try:
+        return pool.submit(text).result()
+    except Exception as e:
+        logger.error(f"Audio generation failed: {e}")
+    finally:
+        if token:
+            singleflight.release(flight, token)
+    return None
+
+
+def request_audio(article, retry_failed=True):
+    """
+    Non-blocking audio for the web views. Returns (state, detail): READY with
+    the audio URL (attaching an existing file to the article), PENDING while
+    it is being voiced here or in another process, or FAILED with the last
+    error (queued again unless retry_failed=False). Raises TTSBusy when the
+    queue is full. Polling calls this again until the file exists.
+    """
+    if article.audio_file:
+        return READY, article.audio_file.url
+    name = existing_audio(article.summary)
+    if name:
+        article.audio_file.name = name
+        article.save(update_fields=['audio_file'])
+        return READY, article.audio_file.url
+    if not clean_text_for_speech(article.summary):
+        return FAILED, "Nothing to voice after cleaning the text"
+    pool = get_tts_pool()
+    state, error = pool.state(article.summary)
+    if state == PENDING or (state == FAILED and not retry_failed):
+        return state, error
+    flight = _flight(article.summary)
+    token = singleflight.claim(flight)
+    if token is None:
+        return PENDING, None  # another request is voicing it; its file appears under the shared name
+    try:
+        future = pool.submit(article.summary, block=False)
+    except Exception:
+        singleflight.release(flight, token)
+        raise
+    # Runs in the pool worker that voiced it, or right here if the future is already done.
+    future.add_done_callback(lambda f: _release_flight(flight, token, close=pool.in_worker()))
+    return PENDING, None
+
+
+def _release_flight(flight, token, close):
+    """Ends a request_audio() flight; close=True (in a pool worker) also closes the connection opened for it."""
+    try:
+        singleflight.release(flight, token)
+    except Exception as e:  # the lease still expires after SINGLEFLIGHT_TTL
+        logger.warning(f"Could not release audio flight {flight}: {e}")
+    finally:
+        if close:
+            connection.close()  # the worker's own; never the request's, mid-transaction
@@ -0,0 +1,71 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from (BBC adds at_* to RSS links).
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ocid', 'ref', 'cmpid', 'igshid'}
+TRACKING_PREFIXES = ('utm_', 'at_')
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _clean_query(query):
+    return urlencode(sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if not _is_tracking_param(k)))
+
+
+def clean_url(url):
+    """
+    The URL we download and store: tracking parameters and the fragment removed,
+    everything else (scheme, host, path) exactly as the publisher gave it.
+    """
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    if parts.scheme.lower() not in ('http', 'https'):
+        return url.strip()
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, _clean_query(parts.query), ''))
+
+
+def normalize_url(url):
+    """
+    De-duplication key for an article URL: https scheme, lower-case host without
+    default port or "www.", no fragment, no tracking parameters, sorted query and
+    no trailing slash. Two links with the same key are treated as the same story.
+    """
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    if parts.scheme.lower() not in ('http', 'https'):
+        return url.strip()
+
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    return urlunsplit(('https', host, path, _clean_query(parts.query), ''))
+
+
+def url_variants(url):
+    """
+    The spellings under which an already stored article may have been saved
+    (raw link, cleaned link, http/https, with/without www and trailing slash),
+    so existing rows can be matched with a single `url__in` query.
+    """
+    variants = {url, clean_url(url)}
+    key = normalize_url(url)
+    parts = urlsplit(key)
+    if parts.scheme != 'https':
+        return variants | {key}
+    paths = {parts.path, parts.path + '/'} if parts.path != '/' else {'/'}
+    for scheme in ('https', 'http'):
+        for host in (parts.netloc, f"www.{parts.netloc}"):
+            for path in paths:
+                variants.add(urlunsplit((scheme, host, path, parts.query, '')))
+    return variants
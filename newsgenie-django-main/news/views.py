@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.views.generic import DetailView
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
@@ -6,18 +7,24 @@ from django.db.models import Q, Count
 # THIS LINE IS FIXED: I have removed the broken 'Profile' import.
 from .models import FAQ, Article, Category, UserPreference, ReadingHistory, SummaryFeedback, ArticleLike, Bookmark, Comment, UserArticleMetrics
 from .forms import UserPreferenceForm, SummaryFeedbackForm, CommentForm
-from news.utils.scraper import fetch_articles, get_full_article_text, get_summary_from_gemini, generate_audio_summary
+from news.utils.scraper import SummaryBusy, SummaryError
+from news.utils.generation import has_final_summary, provisional_summary, summarize_once, summary_flight
+from news.utils import search, search_index, singleflight, tts
+from news.utils.pipeline import queue_progress
+from news.utils.locks import LockHeld
+from news.utils.runs import run_status, start_background_run
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.conf import settings
 import os
 import logging
 import json
-from .models import CommentReaction 
+import time
+from .models import CommentReaction, IngestJob, IngestRun
 from datetime import datetime
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from .serializers import ArticleSerializer, UserPreferenceSerializer
 from rest_framework.views import APIView
@@ -41,27 +48,37 @@ def article_list(request):
     end_date_str = request.GET.get("end_date")
     min_likes_str = request.GET.get("min_likes")
     min_comments_str = request.GET.get("min_comments")
-    sort_by = request.GET.get("sort_by", "-published_at")
+    # NEW: searches are ordered by relevance unless another order is picked
+    sort_by = request.GET.get("sort_by") or ("relevance" if query else "-published_at")
 
     # THIS IS THE CORRECTED LINE
     articles = Article.objects.filter(approved=True)
+    filtered = False  # NEW: whether anything narrows the approved articles (the BM25 index holds all of them)
 
     if category_filter and category_filter != "All":
         articles = articles.filter(category__name__iexact=category_filter)
+        filtered = True
 
-    if query:
-        articles = articles.filter(Q(title__icontains=query) | Q(content__icontains=query))
+    # NEW: the BM25 index when it is built; otherwise the database full-text index
+    index = search.search_index_in_use() if query else None
+    if query and index is None:
+        # NEW: full-text index over title, summary and content instead of scanning every body
+        articles = search.search_articles(articles, query)
+    elif not query and sort_by == "relevance":
+        sort_by = "-published_at"
 
     if start_date_str:
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             articles = articles.filter(published_at__date__gte=start_date)
+            filtered = True
         except ValueError:
             pass
     if end_date_str:
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             articles = articles.filter(published_at__date__lte=end_date)
+            filtered = True
         except ValueError:
             pass
 
@@ -76,22 +93,33 @@ def article_list(request):
         try:
             min_likes = int(min_likes_str)
             articles = articles.filter(like_count__gte=min_likes)
+            filtered = True
         except (ValueError, TypeError):
             pass
     if min_comments_str:
         try:
             min_comments = int(min_comments_str)
             articles = articles.filter(comment_count__gte=min_comments)
+            filtered = True
         except (ValueError, TypeError):
             pass
 
     # Apply Sorting
     if sort_by == "most_popular_likes":
-        articles = articles.order_by('-like_count', '-published_at')
+        ordering = ('-like_count', '-published_at')
     elif sort_by == "most_popular_comments":
-        articles = articles.order_by('-comment_count', '-published_at')
+        ordering = ('-comment_count', '-published_at')
+    elif sort_by == "relevance":
+        ordering = ('-search_rank', '-published_at')
+    else:
+        ordering = (sort_by,)
+    if index is not None:
+        # NEW: matched and ranked in the index over every filtered article; only the shown page is loaded
+        articles = search.IndexResults(
+            articles, query, index, None if sort_by == "relevance" else ordering, filtered=filtered,
+        )
     else:
-        articles = articles.order_by(sort_by)
+        articles = articles.order_by(*ordering)
 
     paginator = Paginator(articles, 6)
     page_number = request.GET.get("page")
@@ -109,6 +137,11 @@ def article_list(request):
             article.is_liked_by_user = False
             article.is_bookmarked_by_user = False
 
+    if query:
+        # NEW: the passage that matched, with the query words highlighted
+        for article in page_obj:
+            article.search_snippet = search_index.snippet(article, query)
+
     categories = Category.objects.all()
     context = {
         "articles": page_obj,
@@ -131,6 +164,46 @@ class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Article.objects.filter(approved=True).order_by('-published_at')
     serializer_class = ArticleSerializer
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET /api/articles/search/?q=...&limit=20&offset=0: BM25-ranked
+        approved articles with a highlighted snippet each. The last word of
+        q also matches as a prefix.
+        """
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'detail': 'limit and offset must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not query:
+            return Response({'detail': 'The q parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        started = time.perf_counter()
+        index = search_index.current_index()
+        if index is not None:
+            total, hits = index.search(query, limit=limit, offset=offset)
+        else:
+            # Not built yet, or too far behind the database: rank with the database index instead.
+            ranked = search.search_articles(self.get_queryset(), query)
+            total = ranked.count()
+            hits = list(ranked.order_by('-search_rank', '-published_at').values_list('pk', 'search_rank')[offset:offset + limit])
+        took_ms = (time.perf_counter() - started) * 1000
+
+        articles = self.get_queryset().in_bulk([pk for pk, _ in hits])
+        results = []
+        for pk, score in hits:
+            article = articles.get(pk)
+            if article is None:
+                continue  # unpublished since it was indexed
+            results.append({
+                **self.get_serializer(article).data,
+                'score': round(score, 4),
+                'snippet': search_index.snippet(article, query),
+            })
+        return Response({'query': query, 'count': total, 'took_ms': round(took_ms, 2), 'results': results})
+
 class UserPreferenceViewSet(viewsets.ModelViewSet):
     queryset = UserPreference.objects.all()
     serializer_class = UserPreferenceSerializer
@@ -148,27 +221,61 @@ class GenerateAudioAPIView(APIView):
     def post(self, request, pk, format=None):
         article = get_object_or_404(Article, pk=pk)
         if not article.summary:
-            summary_text = get_summary_from_gemini(article.content)
-            if summary_text:
-                article.summary = summary_text
-                article.save()
-            else:
+            try:
+                summary_text = summarize_once(article)
+            except SummaryError as e:
+                # Voice the provisional summary now; upgrading it to the LLM summary clears this audio.
+                summary_text = provisional_summary(article)
+                if not summary_text and isinstance(e, SummaryBusy):
+                    return Response(
+                        {'detail': 'Summary service is busy. Please try again shortly.'},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS
+                    )
+                if not summary_text:
+                    return Response(
+                        {'detail': 'Could not generate summary for article.'},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
+            if not summary_text:
+                # Another request is summarizing it; poll here, the audio is queued once the summary exists.
                 return Response(
-                    {'detail': 'Could not generate summary for article.'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    {'status': tts.PENDING, 'poll_url': reverse('api_generate_audio', kwargs={'pk': article.pk})},
+                    status=status.HTTP_202_ACCEPTED
                 )
-        if article.audio_file:
-            return Response({'audio_url': article.audio_file.url}, status=status.HTTP_200_OK)
-        audio_url = generate_audio_summary(article.summary, article.id)
-        if audio_url:
-            article.audio_file.name = audio_url.replace(settings.MEDIA_URL, '', 1)
-            article.save()
-            return Response({'audio_url': audio_url}, status=status.HTTP_200_OK)
-        else:
+        return self._audio_response(article, retry_failed=True)
+
+    def get(self, request, pk, format=None):
+        """Poll URL of a pending POST: same answers, but never queues the audio again after a failure."""
+        article = get_object_or_404(Article, pk=pk)
+        if not article.summary:
+            if singleflight.in_flight(summary_flight(article)):
+                return Response(
+                    {'status': tts.PENDING, 'poll_url': reverse('api_generate_audio', kwargs={'pk': article.pk})},
+                    status=status.HTTP_202_ACCEPTED
+                )
+            return Response({'detail': 'Summary not available.'}, status=status.HTTP_404_NOT_FOUND)
+        return self._audio_response(article, retry_failed=False)
+
+    def _audio_response(self, article, retry_failed):
+        # NEW: audio is voiced by the TTS pool; answer at once and let the client poll
+        try:
+            state, detail = tts.request_audio(article, retry_failed=retry_failed)
+        except tts.TTSBusy:
             return Response(
-                {'detail': 'Failed to generate audio summary.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'detail': 'Audio service is busy. Please try again shortly.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
+        if state == tts.READY:
+            return Response({'status': state, 'audio_url': detail}, status=status.HTTP_200_OK)
+        if state == tts.PENDING:
+            return Response(
+                {'status': state, 'poll_url': reverse('api_generate_audio', kwargs={'pk': article.pk})},
+                status=status.HTTP_202_ACCEPTED
+            )
+        return Response(
+            {'status': state, 'detail': 'Failed to generate audio summary.'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 # --- END OF YOUR API CODE ---
 
 
@@ -252,53 +359,82 @@ def article_detail(request, pk):
 @require_POST
 def generate_summary_view(request, pk):
     article = get_object_or_404(Article, pk=pk)
-    if article.summary:
-        return JsonResponse({'status': 'success', 'summary': article.summary})
+    if has_final_summary(article):
+        return JsonResponse({'status': 'success', 'summary': article.summary, 'provisional': False})
 
     try:
-        full_content = article.content
-        if not full_content:
-            # This utility function is already imported at the top of your file
-            full_content = get_full_article_text(article.url)
-
-        if not full_content:
-            return JsonResponse({'status': 'error', 'message': 'Could not retrieve full article content to generate summary.'}, status=400)
-
-        # The function name has been corrected from 'generate_summary' to the imported 'get_summary_from_gemini'
-        # We assume your Gemini utility can handle the sentence_limit parameter.
-        # If not, you might need to remove it from the call.
-        summary_text = get_summary_from_gemini(full_content)
-
+        # NEW: one Gemini call per article however many readers ask at once
+        summary_text = summarize_once(article)
+    except SummaryError as e:
+        # NEW: Gemini is busy or failing: show the local extractive summary now, the LLM one replaces it later
+        logger.info(f"Serving a provisional summary for article {pk}: {e}")
+        summary_text = provisional_summary(article)
         if summary_text:
-            article.summary = summary_text
-            article.save()
-            return JsonResponse({'status': 'success', 'summary': summary_text})
-        else:
-            return JsonResponse({'status': 'error', 'message': 'Summary generation failed.'}, status=500)
-
+            return JsonResponse({'status': 'success', 'summary': summary_text, 'provisional': True})
+        if isinstance(e, SummaryBusy):
+            return JsonResponse({'status': 'error', 'message': 'Summary service is busy. Please try again in a minute.'}, status=429)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     except Exception as e:
         logger.error(f"Error generating summary for article {pk}: {e}")
         return JsonResponse({'status': 'error', 'message': f'An error occurred: {str(e)}'}, status=500)
 
+    if summary_text:
+        return JsonResponse({'status': 'success', 'summary': summary_text, 'provisional': False})
+    return _summary_pending(article)
+
+
+@login_required
+def summary_status_view(request, pk):
+    """Poll URL handed out by generate_summary_view while another request summarizes the article."""
+    article = get_object_or_404(Article, pk=pk)
+    if has_final_summary(article):
+        return JsonResponse({'status': 'success', 'summary': article.summary, 'provisional': False})
+    if singleflight.in_flight(summary_flight(article)):
+        return _summary_pending(article)
+    if article.summary:
+        return JsonResponse({'status': 'success', 'summary': article.summary, 'provisional': True})
+    return JsonResponse({'status': 'error', 'message': 'Summary generation failed. Please try again.'}, status=404)
+
+
+def _summary_pending(article):
+    # The provisional summary (if any) lets the page paint something while it polls.
+    return JsonResponse({
+        'status': 'pending',
+        'summary': provisional_summary(article),
+        'provisional': True,
+        'poll_url': reverse('news:summary_status', args=[article.pk]),
+    }, status=202)
+
 
 @login_required
 def generate_audio_view(request, pk):
     article = get_object_or_404(Article, pk=pk)
     if not article.summary:
         return JsonResponse({'status': 'error', 'message': 'Summary not available. Please generate summary first.'}, status=400)
-    if article.audio_file:
-        return JsonResponse({'status': 'success', 'audio_url': article.audio_file.url})
+    return _audio_json(article, retry_failed=True)
+
+
+@login_required
+def audio_status_view(request, pk):
+    """Poll URL handed out by generate_audio_view while the audio is being voiced."""
+    article = get_object_or_404(Article, pk=pk)
+    if not article.summary:
+        return JsonResponse({'status': 'error', 'message': 'Summary not available.'}, status=404)
+    return _audio_json(article, retry_failed=False)
+
+
+def _audio_json(article, retry_failed):
+    # NEW: gTTS runs in the TTS pool, never in the request; the page polls until the audio exists
     try:
-        audio_url = generate_audio_summary(article.summary, article.id)
-        if audio_url:
-            article.audio_file.name = audio_url.replace(settings.MEDIA_URL, '', 1)
-            article.save()
-            return JsonResponse({'status': 'success', 'audio_url': audio_url})
-        else:
-            return JsonResponse({'status': 'error', 'message': 'Audio generation failed.'}, status=500)
-    except Exception as e:
-        logger.error(f"Error generating audio for article {pk}: {e}")
-        return JsonResponse({'status': 'error', 'message': f'An error occurred: {str(e)}'}, status=500)
+        state, detail = tts.request_audio(article, retry_failed=retry_failed)
+    except tts.TTSBusy:
+        return JsonResponse({'status': 'error', 'message': 'Audio service is busy. Please try again in a minute.'}, status=503)
+    if state == tts.READY:
+        return JsonResponse({'status': 'success', 'audio_url': detail})
+    if state == tts.PENDING:
+        return JsonResponse({'status': 'pending', 'poll_url': reverse('news:audio_status', args=[article.pk])}, status=202)
+    logger.error(f"Audio generation failed for article {article.pk}: {detail}")
+    return JsonResponse({'status': 'error', 'message': 'Audio generation failed.'}, status=500)
 
 
 @login_required
@@ -430,8 +566,32 @@ def reading_history(request):
 
 @staff_member_required
 def run_scraper_view(request):
-    new_articles = fetch_articles()
-    return render(request, "news/scraper_status.html", {"new_articles": new_articles})
+    # POST starts a background run and returns at once; the page then polls scraper_status_api.
+    if request.method == 'POST':
+        try:
+            ingest_run = start_background_run(user=request.user)
+            messages.success(request, f"Ingestion run #{ingest_run.pk} started.")
+        except LockHeld:
+            messages.warning(request, "An ingestion run is already in progress.")
+        return redirect('news:scraper')
+
+    ingest_run = IngestRun.objects.first()
+    new_articles = Article.objects.filter(
+        ingest_jobs__stage=IngestJob.TTS, ingest_jobs__state=IngestJob.DONE
+    ).order_by('-ingest_jobs__finished_at')[:10]
+    return render(request, "news/scraper_status.html", {
+        "run": ingest_run,
+        "status": run_status(ingest_run) if ingest_run else None,
+        "progress": queue_progress(),
+        "new_articles": new_articles,
+    })
+
+
+@staff_member_required
+def scraper_status_api(request, run_id):
+    """JSON progress of one ingestion run plus the job queue, polled by scraper_status.html."""
+    ingest_run = get_object_or_404(IngestRun, pk=run_id)
+    return JsonResponse({"run": run_status(ingest_run), "queue": queue_progress()})
 
 # NEW FEATURE: View to generate and serve the word cloud image
 def generate_word_cloud_view(request, pk):